@@ -0,0 +1,210 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Batch Evaluation)
+
+Module Description
+==================
+
+This module contains functions that score many game states at once with NumPy, giving exactly the same
+scores as score_game in evaluation.py, and a LeafBatch class that collects the leaves of a game tree so that
+they can be scored together.
+
+A batch of game states is an (N, 6, 7) int8 array of boards, where boards[i] has the same layout as
+game.grid: boards[i][y][x] is PLAYER_ONE, PLAYER_TWO or UNOCCUPIED. Each board is flattened to 42 cells,
+and the four cells of all 69 windows are gathered at once with the (69, 4) array of window cell indices,
+which gives an (N, 69, 4) view of the windows of every board. As in score_game, each disc of the player
+counts as 1 and each disc of the opponent as 5, so summing the last axis gives the packed window counts,
+which are looked up in PACKED_WINDOW_SCORES all at once.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+import numpy as np
+from connect_four import ConnectFour
+from game_tree import GameTree
+from bitboard import COLUMN_HEIGHT
+from evaluation import WINDOW_CELL_INDICES, PACKED_WINDOW_SCORES, CENTER_SCORE
+from constant import GRID_WIDTH, GRID_HEIGHT, PLAYER_ONE, PLAYER_TWO, UNOCCUPIED
+
+# WINDOW_CELL_ARRAY[w] are the indices of the four cells of window w in a flattened board.
+WINDOW_CELL_ARRAY = np.array(WINDOW_CELL_INDICES, dtype=np.intp)
+
+# PACKED_WINDOW_SCORE_ARRAY[is_moving_next][player_count + 5 * opponent_count] is the score of a window.
+PACKED_WINDOW_SCORE_ARRAY = np.array(PACKED_WINDOW_SCORES, dtype=np.int32)
+
+# The indices of the cells of the center column in a flattened board.
+CENTER_CELL_ARRAY = np.arange(GRID_WIDTH // 2, GRID_WIDTH * GRID_HEIGHT, GRID_WIDTH)
+
+# CELL_BIT_SHIFTS[y * GRID_WIDTH + x] is the position of the bit of the cell (x, y) in a bitboard mask.
+CELL_BIT_SHIFTS = np.array([x * COLUMN_HEIGHT + y for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH)],
+                           dtype=np.uint64)
+
+# The number of leaves a LeafBatch collects before scoring them.
+DEFAULT_BATCH_SIZE = 4096
+
+
+def score_boards(boards: np.ndarray, player: int | np.ndarray, is_moving_next: bool | np.ndarray) -> np.ndarray:
+    """Return an array of N scores, where the i-th score is score_game of boards[i] for player, given
+    whether player is moving next.
+
+    player and is_moving_next can either be the same for every board, or arrays of N values with one value
+    for each board.
+
+    Preconditions:
+        - boards.shape == (N, GRID_HEIGHT, GRID_WIDTH) for some N >= 0
+        - every cell of boards is in {PLAYER_ONE, PLAYER_TWO, UNOCCUPIED}
+        - every value of player is in {PLAYER_ONE, PLAYER_TWO}
+
+    >>> game = ConnectFour()
+    >>> for column in [3, 3, 4]:
+    ...     game.record_player_move(column)
+    >>> boards = np.array([game.grid, game.grid], dtype=np.int8)
+    >>> score_boards(boards, PLAYER_ONE, np.array([False, True])).tolist()
+    [21, 30]
+    """
+    num_boards = boards.shape[0]
+    cells = boards.reshape(num_boards, GRID_WIDTH * GRID_HEIGHT)
+    players = np.broadcast_to(np.asarray(player, dtype=cells.dtype), (num_boards,))
+    moving_next = np.broadcast_to(np.asarray(is_moving_next, dtype=np.intp), (num_boards,))
+
+    player_cells = cells == players[:, np.newaxis]
+    opponent_cells = (cells != UNOCCUPIED) & ~player_cells
+    weights = player_cells.astype(np.int8) + 5 * opponent_cells.astype(np.int8)
+
+    # packed[i][w] is player_count + 5 * opponent_count of window w of boards[i].
+    packed = weights[:, WINDOW_CELL_ARRAY].sum(axis=2, dtype=np.intp)
+    window_scores = PACKED_WINDOW_SCORE_ARRAY[moving_next[:, np.newaxis], packed]
+
+    center_counts = player_cells[:, CENTER_CELL_ARRAY].sum(axis=1)
+    return window_scores.sum(axis=1) + CENTER_SCORE * center_counts
+
+
+def boards_from_masks(player_one_masks: np.ndarray, player_two_masks: np.ndarray) -> np.ndarray:
+    """Return the (N, 6, 7) int8 array of the boards whose discs are given by bitboard masks, where
+    player_one_masks[i] and player_two_masks[i] are the masks of boards[i] (see Bitboard in bitboard.py).
+
+    Preconditions:
+        - player_one_masks.shape == player_two_masks.shape == (N,) for some N >= 0
+        - player_one_masks.dtype == player_two_masks.dtype == np.uint64
+        - player_one_masks & player_two_masks is all zero
+
+    >>> game = ConnectFour()
+    >>> for column in [3, 3, 4]:
+    ...     game.record_player_move(column)
+    >>> masks = [np.array([mask], dtype=np.uint64) for mask in game.bitboard.masks]
+    >>> boards_from_masks(*masks)[0].tolist() == game.grid
+    True
+    """
+    player_one_cells = (player_one_masks[:, np.newaxis] >> CELL_BIT_SHIFTS) & np.uint64(1)
+    player_two_cells = (player_two_masks[:, np.newaxis] >> CELL_BIT_SHIFTS) & np.uint64(1)
+
+    boards = np.full(player_one_cells.shape, UNOCCUPIED, dtype=np.int8)
+    boards[player_one_cells.astype(bool)] = PLAYER_ONE
+    boards[player_two_cells.astype(bool)] = PLAYER_TWO
+    return boards.reshape(-1, GRID_HEIGHT, GRID_WIDTH)
+
+
+class LeafBatch:
+    """A batch of game tree leaves that are scored together with score_boards.
+
+    Only the bitboard masks of each leaf's game state are kept until the batch is scored, so adding a leaf
+    is cheap. The batch is scored when it is full, or when flush is called.
+
+    Instance Attributes:
+        - initial_player: The player the leaves are scored for.
+        - batch_size: The number of leaves collected before they are scored.
+
+    Private Instance Attributes:
+        - _trees: The leaves that have not been scored yet.
+        - _player_one_masks: _player_one_masks[i] is the bitboard mask of PLAYER_ONE for _trees[i].
+        - _player_two_masks: _player_two_masks[i] is the bitboard mask of PLAYER_TWO for _trees[i].
+        - _is_moving_next: _is_moving_next[i] is whether initial_player moves next in _trees[i].
+
+    Representation Invariants:
+        - self.initial_player in {PLAYER_ONE, PLAYER_TWO}
+        - self.batch_size > 0
+        - len(self._trees) == len(self._player_one_masks) == len(self._player_two_masks) \
+        == len(self._is_moving_next) < self.batch_size
+
+    >>> game = ConnectFour()
+    >>> for column in [3, 3, 4]:
+    ...     game.record_player_move(column)
+    >>> leaf = GameTree(4, PLAYER_ONE, PLAYER_ONE)
+    >>> batch = LeafBatch(PLAYER_ONE)
+    >>> batch.add(leaf, game, False)
+    >>> batch.flush()
+    >>> leaf.score
+    21
+    """
+    initial_player: int
+    batch_size: int
+    _trees: list[GameTree]
+    _player_one_masks: list[int]
+    _player_two_masks: list[int]
+    _is_moving_next: list[bool]
+
+    def __init__(self, initial_player: int, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """Initialize an empty batch of leaves scored for initial_player.
+
+        Preconditions:
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - batch_size > 0
+        """
+        self.initial_player = initial_player
+        self.batch_size = batch_size
+        self._trees = []
+        self._player_one_masks = []
+        self._player_two_masks = []
+        self._is_moving_next = []
+
+    def add(self, game_tree: GameTree, game: ConnectFour, is_moving_next: bool) -> None:
+        """Add game_tree, a leaf whose game state is game, to the batch.
+
+        game_tree.score is set to score_game(game, self.initial_player, is_moving_next) when the batch is
+        scored. Score the batch if it is full.
+        """
+        self._trees.append(game_tree)
+        self._player_one_masks.append(game.bitboard.masks[PLAYER_ONE])
+        self._player_two_masks.append(game.bitboard.masks[PLAYER_TWO])
+        self._is_moving_next.append(is_moving_next)
+        if len(self._trees) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Score every leaf in the batch, and empty the batch.
+
+        Only the leaves themselves are updated. The scores of their ancestors must be updated afterwards,
+        e.g. with GameTree.update_all_scores.
+        """
+        if not self._trees:
+            return
+
+        boards = boards_from_masks(np.array(self._player_one_masks, dtype=np.uint64),
+                                   np.array(self._player_two_masks, dtype=np.uint64))
+        scores = score_boards(boards, self.initial_player, np.array(self._is_moving_next))
+        for game_tree, score in zip(self._trees, scores.tolist()):
+            game_tree.score = score
+
+        self._trees = []
+        self._player_one_masks = []
+        self._player_two_masks = []
+        self._is_moving_next = []
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'numpy', 'connect_four', 'game_tree', 'bitboard', 'evaluation',
+                          'constant'],
+    })
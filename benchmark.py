@@ -0,0 +1,724 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Benchmark)
+
+Module Description
+==================
+
+This module contains functions that measure how fast our AI players search, so that we can tell
+whether a change to the search made things faster.
+
+The detailed benchmarks are run on the same fixed set of game states, BENCHMARK_POSITIONS, each written as
+the string of columns played from the empty board (see create_game_from_moves in connect_four.py).
+
+The benchmark suite, run_benchmark_suite, measures the search, the solver, game tree generation and every
+player of SUITE_PLAYERS on the categories of positions of SUITE_POSITIONS (opening, middlegame, endgame and
+forced wins), and returns its metrics by name, so that they can be saved as JSON and compared with a baseline
+by compare_with_baseline. Running this file runs the suite:
+
+    python benchmark.py --output results.json --baseline baseline.json --threshold 0.1
+
+which exits with status 1 if a metric regressed by more than the threshold. Running it with --detailed
+prints the results of every other benchmark instead.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Optional
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from connect_four import ConnectFour, create_game_from_moves, get_opposite_player
+from game_tree import GAME_START_MOVE
+from constant import GRID_WIDTH, GRID_HEIGHT, PLAYER_ONE
+from player import Player, generate_complete_tree_to_depth, generate_complete_tree_to_depth_batched
+from search_player import AlphaBetaPlayer, MCTSPlayer
+from search import AlphaBetaSearch
+from transposition import TranspositionTable
+from move_ordering import MoveOrdering
+from evaluation import IncrementalEvaluator, score_game
+from parallel import ParallelSearch, LazySMPSearch
+from mcts import MonteCarloTreeSearch, RootParallelMCTS
+from solver import Solver
+from tournament import create_player
+
+# Game states from the opening to the late middlegame, none of which is finished.
+BENCHMARK_POSITIONS = ['3536', '32442506', '0526545421', '115012041566', '01133424004330', '2222611653052461',
+                       '566262003330443103', '35625304104315060663', '134255525141500643033411',
+                       '0455632600265604054140213563']
+
+# The move orderings compared by benchmark_move_ordering, from no heuristic to all heuristics.
+MOVE_ORDERING_CONFIGURATIONS = {
+    'natural order': (False, False, False, False),
+    'center first': (True, False, False, False),
+    '+ hash column': (True, True, False, False),
+    '+ killers': (True, True, True, False),
+    '+ history': (True, True, True, True),
+}
+
+# The positions of the benchmark suite by category, each with the columns keeping its score with perfect play,
+# or None if it is too early to be solved quickly. The forced wins are won by the player moving next in 7 to
+# 13 moves, with a single best column.
+SUITE_POSITIONS: dict[str, list[tuple[str, Optional[list[int]]]]] = {
+    'opening': [('', [3]), ('3', None), ('3536', None), ('32442506', None)],
+    'middlegame': [('6363661214513244', [3]), ('1466262241033343', [1, 2]), ('6600353321225032', [0]),
+                   ('1441303354311043', [5]), ('1205102122331533', [3])],
+    'endgame': [('6363661214513244223044336624', [0, 1, 2]), ('6600353321225032052352636655', [0, 6]),
+                ('2135323325455222365356166660', [0]), ('3422103332234442403000420566', [6])],
+    'forced win': [('636366121451324422304433662420', [1]), ('1466262241033343644', [3]),
+                   ('1205102122331533325525', [3]), ('42522331034355055332220', [0]),
+                   ('213532332545522236535616', [6]), ('3422103332234442403000420', [5])]
+}
+
+# The player specs of the players measured by the benchmark suite (see tournament.parse_player_spec).
+SUITE_PLAYERS = ('greedy:depth=4', 'alphabeta:depth=6', 'mcts:iterations=1000')
+
+# The maximum depth of the searches, and the depth of the game trees, of the benchmark suite.
+SUITE_SEARCH_DEPTH = 7
+SUITE_TREE_DEPTH = 4
+
+# The measures for which a larger value is better, and the fraction by which a metric may get worse than its
+# baseline value before it counts as a regression.
+HIGHER_IS_BETTER_MEASURES = ('nodes per second', 'move agreement')
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+# Times shorter than this many seconds are too noisy to be compared with a baseline.
+MIN_COMPARED_SECONDS = 0.01
+
+
+def benchmark_move_ordering(d: int = 6) -> dict[str, tuple[int, float]]:
+    """Search every game state in BENCHMARK_POSITIONS to the depth d with each move ordering in
+    MOVE_ORDERING_CONFIGURATIONS, and return a mapping from the name of each ordering to the total number
+    of game states visited and the total time taken in seconds.
+
+    Every search uses a new transposition table, so that the hash column heuristic has something to use.
+    The best columns found are the same for every ordering; only the amount of work changes.
+
+    Preconditions:
+        - d >= 1
+    """
+    results = {}
+    for name, flags in MOVE_ORDERING_CONFIGURATIONS.items():
+        total_nodes, total_time = 0, 0.0
+        for moves in BENCHMARK_POSITIONS:
+            game = create_game_from_moves(moves)
+            engine = AlphaBetaSearch(score_game, TranspositionTable(1 << 20), MoveOrdering(*flags))
+
+            start = time.perf_counter()
+            engine.search(game, d, game.get_current_player())
+            total_time += time.perf_counter() - start
+            total_nodes += engine.nodes
+
+        results[name] = (total_nodes, total_time)
+    return results
+
+
+def benchmark_parallel_search(d: int = 8, worker_counts: tuple[int, ...] = (1, 2, 4, 8),
+                              split_depth: int = 2) -> dict[str, tuple[int, float]]:
+    """Search every game state in BENCHMARK_POSITIONS to the depth d with a serial AlphaBetaSearch and with a
+    ParallelSearch of each number of workers in worker_counts, and return a mapping from the name of each
+    engine to the total number of game states visited and the total time taken in seconds.
+
+    Every engine starts with empty transposition tables, and the time includes starting the worker processes.
+    Raise an AssertionError if a parallel search ever gives a different result from the serial search.
+
+    Preconditions:
+        - d >= split_depth >= 1
+        - all(num_workers >= 1 for num_workers in worker_counts)
+    """
+    serial_results, results = _benchmark_serial_search(d)
+
+    for num_workers in worker_counts:
+        engine = ParallelSearch(num_workers, split_depth)
+        total_nodes = 0
+        start = time.perf_counter()
+        for moves, serial_result in zip(BENCHMARK_POSITIONS, serial_results):
+            game = create_game_from_moves(moves)
+            assert engine.search(game, d, game.get_current_player()) == serial_result
+            total_nodes += engine.nodes
+        results[f'{num_workers} workers'] = (total_nodes, time.perf_counter() - start)
+        engine.close()
+    return results
+
+
+def benchmark_lazy_smp_search(d: int = 8, worker_counts: tuple[int, ...] = (1, 2, 4, 8)) \
+        -> dict[str, tuple[int, float]]:
+    """Search every game state in BENCHMARK_POSITIONS to the depth d with a serial AlphaBetaSearch and with a
+    LazySMPSearch of each number of workers in worker_counts, and return a mapping from the name of each
+    engine to the total number of game states visited (by all processes) and the total time taken in seconds.
+
+    Every engine starts with an empty transposition table, and the time includes starting the helper processes.
+    Raise an AssertionError if a Lazy SMP search ever gives a different result from the serial search.
+
+    Preconditions:
+        - d >= 1
+        - all(num_workers >= 1 for num_workers in worker_counts)
+    """
+    serial_results, results = _benchmark_serial_search(d)
+
+    for num_workers in worker_counts:
+        engine = LazySMPSearch(num_workers)
+        total_nodes = 0
+        start = time.perf_counter()
+        for moves, serial_result in zip(BENCHMARK_POSITIONS, serial_results):
+            game = create_game_from_moves(moves)
+            assert engine.search(game, d, game.get_current_player()) == serial_result
+            total_nodes += engine.nodes
+        results[f'{num_workers} workers'] = (total_nodes, time.perf_counter() - start)
+        engine.close()
+    return results
+
+
+def _benchmark_serial_search(d: int) -> tuple[list[tuple[int, list[int]]], dict[str, tuple[int, float]]]:
+    """Search every game state in BENCHMARK_POSITIONS to the depth d with an AlphaBetaSearch, and return a
+    tuple of the list of results and a mapping from 'serial' to the total number of game states visited and
+    the total time taken in seconds.
+
+    Preconditions:
+        - d >= 1
+    """
+    serial_results = []
+    serial_engine = AlphaBetaSearch(IncrementalEvaluator(), TranspositionTable())
+    total_nodes = 0
+    start = time.perf_counter()
+    for moves in BENCHMARK_POSITIONS:
+        game = create_game_from_moves(moves)
+        serial_results.append(serial_engine.search(game, d, game.get_current_player()))
+        total_nodes += serial_engine.nodes
+    return (serial_results, {'serial': (total_nodes, time.perf_counter() - start)})
+
+
+def benchmark_mcts_playouts(time_limit_ms: int = 1000, worker_counts: tuple[int, ...] = (1, 2, 4)) -> dict[str, float]:
+    """Search every game state in BENCHMARK_POSITIONS for time_limit_ms milliseconds with a MonteCarloTreeSearch
+    with random playouts, one with guided playouts and a RootParallelMCTS (with guided playouts) of each number
+    of workers in worker_counts, and return a mapping from the name of each engine to its number of playouts
+    per second.
+
+    The time of the parallel engines includes starting the worker processes.
+
+    Preconditions:
+        - time_limit_ms > 0
+        - all(num_workers >= 1 for num_workers in worker_counts)
+    """
+    engines = {'random playouts': MonteCarloTreeSearch(guided_playouts=False),
+               'guided playouts': MonteCarloTreeSearch()}
+    for num_workers in worker_counts:
+        engines[f'{num_workers} workers'] = RootParallelMCTS(num_workers)
+
+    results = {}
+    for name, engine in engines.items():
+        total_playouts = 0
+        start = time.perf_counter()
+        for moves in BENCHMARK_POSITIONS:
+            engine.search(create_game_from_moves(moves), time_limit_ms=time_limit_ms)
+            total_playouts += engine.playouts
+        results[name] = total_playouts / (time.perf_counter() - start)
+        if isinstance(engine, RootParallelMCTS):
+            engine.close()
+    return results
+
+
+def compare_mcts_with_greedy(num_games: int = 10, time_limit_ms: int = 500) -> tuple[int, int, int]:
+    """Play num_games games between an MCTSPlayer and an AlphaBetaPlayer searching by iterative deepening, both
+    taking time_limit_ms milliseconds per move, and return a tuple (mcts_wins, greedy_wins, draws).
+
+    The AlphaBetaPlayer chooses its moves like a GreedyPlayer of the depth it finishes searching in time, since a
+    GreedyPlayer has no time limit. The players take turns going first.
+
+    Preconditions:
+        - num_games >= 1
+        - time_limit_ms > 0
+    """
+    results = [0, 0, 0]
+    for i in range(num_games):
+        mcts_player_num = PLAYER_ONE if i % 2 == 0 else get_opposite_player(PLAYER_ONE)
+        mcts_player = MCTSPlayer(mcts_player_num, time_limit_ms=time_limit_ms)
+        greedy_player = AlphaBetaPlayer(get_opposite_player(mcts_player_num), GRID_WIDTH * GRID_HEIGHT,
+                                        time_limit_ms=time_limit_ms)
+        players = {mcts_player_num: mcts_player, get_opposite_player(mcts_player_num): greedy_player}
+
+        game = ConnectFour()
+        while game.get_winner() is None:
+            player: Player = players[game.get_current_player()]
+            game.record_player_move(player.choose_column(game))
+
+        if game.get_winner() == mcts_player_num:
+            results[0] += 1
+        elif game.get_winner() in players:
+            results[1] += 1
+        else:
+            results[2] += 1
+    return (results[0], results[1], results[2])
+
+
+def reference_score_game(game: ConnectFour, player: int, is_moving_next: bool) -> int:
+    """Return score_game(game, player, is_moving_next), computed the way score_game originally did it:
+    by slicing every window of four cells out of the grid and scoring it with its own score lists.
+
+    This is only used to check and measure the table-driven score_game in evaluation.py.
+
+    Preconditions:
+        - player in {PLAYER_ONE, PLAYER_TWO}
+    """
+    score_so_far = 0
+
+    # Score center column
+    center_array = [row[GRID_WIDTH // 2] for row in game.grid]
+    score_so_far += 6 * center_array.count(player)
+
+    # Score horizontal
+    for r in range(GRID_HEIGHT):
+        row_array = game.grid[r]
+        for c in range(GRID_WIDTH - 3):
+            score_so_far += _reference_score_slice(row_array[c: c + 4], player, is_moving_next)
+
+    # Score vertical
+    for c in range(GRID_WIDTH):
+        column_array = [row[c] for row in game.grid]
+        for r in range(GRID_HEIGHT - 3):
+            score_so_far += _reference_score_slice(column_array[r: r + 4], player, is_moving_next)
+
+    # Score positive and negative sloped diagonal
+    for r in range(GRID_HEIGHT - 3):
+        for c in range(GRID_WIDTH - 3):
+            grid_slice = [game.grid[r + i][c + i] for i in range(4)]
+            score_so_far += _reference_score_slice(grid_slice, player, is_moving_next)
+            grid_slice = [game.grid[r + 3 - i][c + i] for i in range(4)]
+            score_so_far += _reference_score_slice(grid_slice, player, is_moving_next)
+
+    return score_so_far
+
+
+def _reference_score_slice(grid_slice: list[int], player: int, player_go_next: bool) -> int:
+    """Score a slice of four discs the way _score_slice in evaluation.py originally did it."""
+    opponent = get_opposite_player(player)
+    player_count, opponent_count = grid_slice.count(player), grid_slice.count(opponent)
+
+    if player_count != 0 and opponent_count != 0:
+        return 0
+
+    go_next_player_score = [0, 0, 8, 90, 100]
+    go_next_opponent_score = [0, 0, -5, -60, -100]
+    not_next_player_score = [0, 0, 5, 60, 100]
+    not_next_opponent_score = [0, 0, -8, -90, 100]
+
+    if player_go_next:
+        return go_next_player_score[player_count] + go_next_opponent_score[opponent_count]
+    else:
+        return not_next_player_score[player_count] + not_next_opponent_score[opponent_count]
+
+
+def benchmark_evaluation(repeats: int = 200) -> dict[str, float]:
+    """Score every game state in BENCHMARK_POSITIONS repeats times for both players and both values of
+    is_moving_next, with reference_score_game and with score_game, and return a mapping from the name of
+    each function to the number of evaluations per second.
+
+    Raise an AssertionError if the two functions ever disagree.
+
+    Preconditions:
+        - repeats >= 1
+    """
+    games = [create_game_from_moves(moves) for moves in BENCHMARK_POSITIONS]
+    arguments = [(game, player, is_moving_next) for game in games for player in range(2)
+                 for is_moving_next in (False, True)]
+    for args in arguments:
+        assert score_game(*args) == reference_score_game(*args)
+
+    results = {}
+    for name, evaluate in (('reference_score_game', reference_score_game), ('score_game', score_game)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for args in arguments:
+                evaluate(*args)
+        results[name] = repeats * len(arguments) / (time.perf_counter() - start)
+    return results
+
+
+def benchmark_tree_generation(d: int = 5) -> dict[str, float]:
+    """Generate the complete game tree of the depth d of every game state in BENCHMARK_POSITIONS, with
+    generate_complete_tree_to_depth and with generate_complete_tree_to_depth_batched, and return a mapping
+    from the name of each function to the total time taken in seconds.
+
+    Raise an AssertionError if the two functions ever generate different trees.
+
+    Preconditions:
+        - d >= 1
+    """
+    results = {'generate_complete_tree_to_depth': 0.0, 'generate_complete_tree_to_depth_batched': 0.0}
+    for moves in BENCHMARK_POSITIONS:
+        game = create_game_from_moves(moves)
+        root_move, initial_player = int(moves[-1]), game.get_current_player()
+
+        start = time.perf_counter()
+        game_tree = generate_complete_tree_to_depth(root_move, game, d, initial_player)
+        middle = time.perf_counter()
+        batched_tree = generate_complete_tree_to_depth_batched(root_move, game, d, initial_player)
+        end = time.perf_counter()
+
+        assert str(game_tree) == str(batched_tree)
+        results['generate_complete_tree_to_depth'] += middle - start
+        results['generate_complete_tree_to_depth_batched'] += end - middle
+    return results
+
+
+def benchmark_tree_memory(d: int = 6) -> tuple[int, int, int]:
+    """Generate the complete game tree of the depth d of the empty board, and return a tuple
+    (num_nodes, tree_bytes, peak_bytes), where tree_bytes is the memory still allocated for the tree once it
+    is generated, and peak_bytes is the most memory allocated at once while generating it.
+
+    Memory is measured with tracemalloc, which only counts memory allocated by Python objects, so the
+    results do not depend on the rest of the process.
+
+    Preconditions:
+        - d >= 1
+    """
+    tracemalloc.start()
+    try:
+        game_tree = generate_complete_tree_to_depth(GAME_START_MOVE, ConnectFour(), d, PLAYER_ONE)
+        tree_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (len(game_tree), tree_bytes, peak_bytes)
+
+
+def run_benchmark_suite(players: tuple[str, ...] = SUITE_PLAYERS, search_depth: int = SUITE_SEARCH_DEPTH,
+                        tree_depth: int = SUITE_TREE_DEPTH, repeats: int = 3) -> dict[str, float]:
+    """Run the benchmark suite on every category of SUITE_POSITIONS, and return a mapping from the name of each
+    metric to its value.
+
+    The names of the metrics are paths of the form 'section/category/.../measure', where the last part tells
+    whether a larger value is better (see compare_with_baseline). The sections are:
+        - search: an AlphaBetaSearch deepening one depth at a time up to search_depth, with the total time and
+        the total number of game states visited once each depth is searched, and the overall nodes per second.
+        - solver: a Solver solving the positions of the categories whose best columns are all known.
+        - tree: generate_complete_tree_to_depth to the depth tree_depth, with the number of nodes, nodes per
+        second and peak memory, which covers score_game and ConnectFour.record_player_move.
+        - player: every player spec of players (see tournament.parse_player_spec), choosing a column in every
+        position, with the time per move, the peak memory and the move agreement: the share of the positions
+        whose best columns are known where the player chooses one of them.
+
+    Every time is the shortest of repeats runs, to leave out as much noise from the rest of the machine as
+    possible. Peak memory is measured with tracemalloc in a separate run, so that it does not slow down the
+    timed runs.
+
+    Preconditions:
+        - all players are valid player specs
+        - search_depth >= 1
+        - tree_depth >= 1
+        - repeats >= 1
+    """
+    metrics = {}
+    for category, positions in SUITE_POSITIONS.items():
+        _benchmark_suite_search(metrics, category, positions, search_depth, repeats)
+        if all(best_columns is not None for _, best_columns in positions):
+            _benchmark_suite_solver(metrics, category, positions, repeats)
+        _benchmark_suite_tree(metrics, category, positions, tree_depth, repeats)
+        for spec in players:
+            _benchmark_suite_player(metrics, category, positions, spec, repeats)
+    return metrics
+
+
+def _benchmark_suite_search(metrics: dict[str, float], category: str, positions: list[tuple[str, Any]],
+                            search_depth: int, repeats: int) -> None:
+    """Add the search metrics of positions, the positions of category, to metrics (see run_benchmark_suite)."""
+    seconds = [math.inf] * (search_depth + 1)
+    nodes = [0] * (search_depth + 1)
+    for _ in range(repeats):
+        repeat_seconds = [0.0] * (search_depth + 1)
+        nodes = [0] * (search_depth + 1)
+        for moves, _ in positions:
+            game = create_game_from_moves(moves)
+            engine = AlphaBetaSearch(IncrementalEvaluator(), TranspositionTable(1 << 20))
+            total_nodes = 0
+            start = time.perf_counter()
+            for d in range(1, search_depth + 1):
+                engine.search(game, d, game.get_current_player())
+                total_nodes += engine.nodes
+                repeat_seconds[d] += time.perf_counter() - start
+                nodes[d] += total_nodes
+        seconds = [min(old, new) for old, new in zip(seconds, repeat_seconds)]
+
+    for d in range(1, search_depth + 1):
+        metrics[f'search/{category}/depth {d}/seconds'] = seconds[d]
+        metrics[f'search/{category}/depth {d}/nodes'] = nodes[d]
+    metrics[f'search/{category}/nodes per second'] = nodes[search_depth] / seconds[search_depth]
+
+
+def _benchmark_suite_solver(metrics: dict[str, float], category: str, positions: list[tuple[str, Any]],
+                            repeats: int) -> None:
+    """Add the solver metrics of positions, the positions of category, to metrics (see run_benchmark_suite)."""
+    def solve_positions() -> int:
+        """Analyze every position with a new Solver, and return the total number of game states visited."""
+        total_nodes = 0
+        for moves, _ in positions:
+            solver = Solver()
+            solver.analyze(create_game_from_moves(moves))
+            total_nodes += solver.nodes
+        return total_nodes
+
+    total_nodes, seconds = _time_function(solve_positions, repeats)
+    metrics[f'solver/{category}/seconds'] = seconds
+    metrics[f'solver/{category}/nodes'] = total_nodes
+    metrics[f'solver/{category}/nodes per second'] = total_nodes / seconds
+
+
+def _benchmark_suite_tree(metrics: dict[str, float], category: str, positions: list[tuple[str, Any]],
+                          tree_depth: int, repeats: int) -> None:
+    """Add the tree metrics of positions, the positions of category, to metrics (see run_benchmark_suite)."""
+    def generate_trees() -> int:
+        """Generate the game tree of every position, and return the total number of nodes."""
+        total_nodes = 0
+        for moves, _ in positions:
+            game = create_game_from_moves(moves)
+            root_move = int(moves[-1]) if moves else GAME_START_MOVE
+            total_nodes += len(generate_complete_tree_to_depth(root_move, game, tree_depth,
+                                                               game.get_current_player()))
+        return total_nodes
+
+    total_nodes, seconds = _time_function(generate_trees, repeats)
+    metrics[f'tree/{category}/seconds'] = seconds
+    metrics[f'tree/{category}/nodes'] = total_nodes
+    metrics[f'tree/{category}/nodes per second'] = total_nodes / seconds
+    metrics[f'tree/{category}/peak bytes'] = _measure_peak_bytes(generate_trees)
+
+
+def _benchmark_suite_player(metrics: dict[str, float], category: str, positions: list[tuple[str, Any]],
+                            spec: str, repeats: int) -> None:
+    """Add the metrics of the player given by spec on positions, the positions of category, to metrics (see
+    run_benchmark_suite).
+
+    Each column is chosen by a new player, after seeding the random module, so that the same column is chosen
+    in every run as long as the player has no time limit.
+    """
+    def choose_columns() -> list[int]:
+        """Return the column the player chooses in every position."""
+        columns = []
+        for moves, _ in positions:
+            game = create_game_from_moves(moves)
+            random.seed(0)
+            player = create_player(spec, game.get_current_player(), seed=0)
+            columns.append(player.choose_column(game))
+        return columns
+
+    chosen_columns, seconds = _time_function(choose_columns, repeats)
+    metrics[f'player/{spec}/{category}/seconds per move'] = seconds / len(positions)
+    metrics[f'player/{spec}/{category}/peak bytes'] = _measure_peak_bytes(choose_columns)
+
+    known = [(column, best_columns) for column, (_, best_columns) in zip(chosen_columns, positions)
+             if best_columns is not None]
+    if known:
+        agreement = sum(1 for column, best_columns in known if column in best_columns) / len(known)
+        metrics[f'player/{spec}/{category}/move agreement'] = agreement
+
+
+def _time_function(function: Callable[[], Any], repeats: int) -> tuple[Any, float]:
+    """Call function repeats times, and return a tuple of the value it returned the last time and the shortest
+    time it took in seconds.
+
+    Preconditions:
+        - repeats >= 1
+    """
+    value, seconds = None, math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        value = function()
+        seconds = min(seconds, time.perf_counter() - start)
+    return (value, seconds)
+
+
+def _measure_peak_bytes(function: Callable[[], Any]) -> int:
+    """Call function, and return the most memory allocated at once by Python objects while it ran, measured
+    with tracemalloc."""
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak_bytes
+
+
+def compare_with_baseline(metrics: dict[str, float], baseline: dict[str, float],
+                          threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> list[tuple[str, float, float]]:
+    """Return the metrics of metrics that regressed from baseline by more than the fraction threshold of their
+    baseline value, as tuples (name, baseline_value, value).
+
+    A larger value is better for the metrics named '.../nodes per second' and '.../move agreement', and a
+    smaller value is better for every other metric. Times below MIN_COMPARED_SECONDS in the baseline are too
+    noisy to compare, and metrics missing from either mapping are ignored.
+
+    Preconditions:
+        - threshold >= 0
+
+    >>> baseline = {'search/opening/depth 6/seconds': 1.0, 'search/opening/nodes per second': 1000.0,
+    ...             'solver/endgame/seconds': 0.001}
+    >>> metrics = {'search/opening/depth 6/seconds': 1.05, 'search/opening/nodes per second': 800.0,
+    ...            'solver/endgame/seconds': 0.01}
+    >>> compare_with_baseline(metrics, baseline, 0.1)
+    [('search/opening/nodes per second', 1000.0, 800.0)]
+    """
+    regressions = []
+    for name, value in metrics.items():
+        if name not in baseline:
+            continue
+        baseline_value = baseline[name]
+        measure = name.rsplit('/', 1)[-1]
+        if measure in HIGHER_IS_BETTER_MEASURES:
+            regressed = value < baseline_value * (1 - threshold)
+        elif measure.startswith('seconds') and baseline_value < MIN_COMPARED_SECONDS:
+            regressed = False
+        else:
+            regressed = value > baseline_value * (1 + threshold)
+        if regressed:
+            regressions.append((name, baseline_value, value))
+    return regressions
+
+
+def print_tree_benchmark(d: int = 5) -> None:
+    """Print the results of benchmark_tree_generation(d)."""
+    results = benchmark_tree_generation(d)
+    baseline = results['generate_complete_tree_to_depth']
+    print(f'Game tree generation, depth {d}')
+    for name, seconds in results.items():
+        print(f'{name:<42}{seconds:>8.2f} s{baseline / seconds:>8.2f}x')
+
+
+def print_tree_memory_benchmark(d: int = 6) -> None:
+    """Print the results of benchmark_tree_memory(d)."""
+    num_nodes, tree_bytes, peak_bytes = benchmark_tree_memory(d)
+    print(f'Game tree memory, depth {d}')
+    print(f'{num_nodes} nodes, {tree_bytes / 2 ** 20:.1f} MB ({tree_bytes / num_nodes:.0f} bytes/node), '
+          f'peak {peak_bytes / 2 ** 20:.1f} MB')
+
+
+def print_evaluation_benchmark(repeats: int = 200) -> None:
+    """Print the results of benchmark_evaluation(repeats)."""
+    results = benchmark_evaluation(repeats)
+    print('Static evaluation')
+    for name, evaluations_per_second in results.items():
+        speedup = evaluations_per_second / results['reference_score_game']
+        print(f'{name:<24}{evaluations_per_second:>12.0f} evaluations/s{speedup:>8.2f}x')
+
+
+def print_parallel_benchmark(d: int = 8) -> None:
+    """Print the results of benchmark_parallel_search(d) as a table."""
+    results = benchmark_parallel_search(d)
+    one_worker_time = results['1 workers'][1]
+
+    print(f'Parallel search, depth {d}, {len(BENCHMARK_POSITIONS)} positions, {os.cpu_count()} cores')
+    print(f'{"engine":<16}{"nodes":>12}{"seconds":>10}{"vs 1 worker":>14}')
+    for name, (nodes, seconds) in results.items():
+        print(f'{name:<16}{nodes:>12}{seconds:>10.2f}{one_worker_time / seconds:>13.2f}x')
+
+
+def print_lazy_smp_benchmark(d: int = 8) -> None:
+    """Print the results of benchmark_lazy_smp_search(d) as a table."""
+    results = benchmark_lazy_smp_search(d)
+    one_worker_time = results['1 workers'][1]
+
+    print(f'Lazy SMP search, depth {d}, {len(BENCHMARK_POSITIONS)} positions, {os.cpu_count()} cores')
+    print(f'{"engine":<16}{"nodes":>12}{"seconds":>10}{"vs 1 worker":>14}')
+    for name, (nodes, seconds) in results.items():
+        print(f'{name:<16}{nodes:>12}{seconds:>10.2f}{one_worker_time / seconds:>13.2f}x')
+
+
+def print_mcts_benchmark(time_limit_ms: int = 1000, num_games: int = 10) -> None:
+    """Print the results of benchmark_mcts_playouts(time_limit_ms) and compare_mcts_with_greedy(num_games)."""
+    results = benchmark_mcts_playouts(time_limit_ms)
+    print(f'Monte Carlo tree search, {time_limit_ms} ms per position, {os.cpu_count()} cores')
+    for name, playouts_per_second in results.items():
+        print(f'{name:<24}{playouts_per_second:>12.0f} playouts/s')
+
+    mcts_wins, greedy_wins, draws = compare_mcts_with_greedy(num_games)
+    print(f'MCTSPlayer against AlphaBetaPlayer at equal time: {mcts_wins} wins, {greedy_wins} losses, {draws} draws')
+
+
+def print_move_ordering_benchmark(d: int = 6) -> None:
+    """Print the results of benchmark_move_ordering(d) as a table."""
+    results = benchmark_move_ordering(d)
+    baseline_nodes = results['natural order'][0]
+
+    print(f'Move ordering, depth {d}, {len(BENCHMARK_POSITIONS)} positions')
+    print(f'{"ordering":<16}{"nodes":>12}{"vs natural":>12}{"seconds":>10}')
+    for name, (nodes, seconds) in results.items():
+        print(f'{name:<16}{nodes:>12}{nodes / baseline_nodes:>12.2f}{seconds:>10.2f}')
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    """Run the benchmark suite as given by the command line arguments args (or sys.argv if args is None), and
+    return the exit status: 1 if a metric regressed from the baseline, or 0 otherwise.
+
+    The results are written as JSON to the output file, or printed if there is none, and the regressions are
+    printed to standard error. With --detailed, every other benchmark of this file is printed instead.
+    """
+    parser = argparse.ArgumentParser(description='Run the benchmark suite, and compare it with a baseline.')
+    parser.add_argument('-o', '--output', default=None, help='the JSON file to write the results to')
+    parser.add_argument('-b', '--baseline', default=None,
+                        help='a JSON file written by an earlier run to compare the results with')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='the fraction by which a metric may get worse than the baseline '
+                             f'(default: {DEFAULT_REGRESSION_THRESHOLD})')
+    parser.add_argument('-r', '--repeats', type=int, default=3,
+                        help='the number of runs each time is the shortest of (default: 3)')
+    parser.add_argument('--detailed', action='store_true', help='print every other benchmark instead')
+    options = parser.parse_args(args)
+
+    if options.detailed:
+        print_evaluation_benchmark()
+        print_tree_benchmark()
+        print_tree_memory_benchmark()
+        print_move_ordering_benchmark()
+        print_parallel_benchmark()
+        print_lazy_smp_benchmark()
+        print_mcts_benchmark()
+        return 0
+
+    metrics = run_benchmark_suite(repeats=options.repeats)
+    results = {'python': platform.python_version(), 'cpu_count': os.cpu_count(), 'metrics': metrics}
+    if options.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if options.baseline is None:
+        return 0
+    with open(options.baseline, 'r') as file:
+        baseline = json.load(file)
+    regressions = compare_with_baseline(metrics, baseline['metrics'], options.threshold)
+    for name, baseline_value, value in regressions:
+        print(f'Regression: {name} went from {baseline_value:.6g} to {value:.6g}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'argparse', 'json', 'math', 'os', 'platform', 'random', 'sys',
+                          'time', 'tracemalloc', 'connect_four', 'game_tree', 'constant', 'player', 'search_player',
+                          'search', 'transposition', 'move_ordering', 'evaluation', 'parallel', 'mcts', 'solver',
+                          'tournament'],
+        'allowed-io': ['print_move_ordering_benchmark', 'print_evaluation_benchmark',
+                       'print_tree_benchmark', 'print_tree_memory_benchmark',
+                       'print_parallel_benchmark', 'print_lazy_smp_benchmark',
+                       'print_mcts_benchmark', 'main']
+    })
+
+    sys.exit(main())
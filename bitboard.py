@@ -0,0 +1,300 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Bitboard)
+
+Module Description
+==================
+
+This module contains a Bitboard class that stores a Connect 4 position as two integer bit masks,
+one for each player, together with the height of every column.
+It is the fast representation behind ConnectFour: playing and undoing a move only flips one bit,
+and checking for four connected discs only takes a few shifts and bitwise ANDs.
+
+Each column is stored in GRID_HEIGHT + 1 consecutive bits, from the bottom row to the top row,
+followed by one sentinel bit that is always empty. For the 7x6 board the bit indices are:
+
+    .  .  .  .  .  .  .     <- sentinel row
+    5 12 19 26 33 40 47
+    4 11 18 25 32 39 46
+    3 10 17 24 31 38 45
+    2  9 16 23 30 37 44
+    1  8 15 22 29 36 43
+    0  7 14 21 28 35 42
+
+The sentinel row guarantees that shifting a mask by one column (or one diagonal step) never lets
+discs of the top row of a column "wrap around" into the bottom row of the next column.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from constant import GRID_WIDTH, GRID_HEIGHT, PLAYER_ONE, PLAYER_TWO
+
+# Number of bits used by one column, including the sentinel bit.
+COLUMN_HEIGHT = GRID_HEIGHT + 1
+
+# The number of cells of the grid.
+NUM_CELLS = GRID_WIDTH * GRID_HEIGHT
+
+# A mask with one bit set at the bottom of each column, and a mask with every playable cell set.
+BOTTOM_MASK = sum(1 << (x * COLUMN_HEIGHT) for x in range(GRID_WIDTH))
+BOARD_MASK = BOTTOM_MASK * ((1 << GRID_HEIGHT) - 1)
+
+# Bit shifts for the four orientations: vertical, horizontal, and two diagonal.
+WIN_SHIFTS = (1, COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1)
+
+
+def cell_bit(x: int, y: int) -> int:
+    """Return the mask with only the cell at column x and row y set.
+
+    Preconditions:
+        - 0 <= x < GRID_WIDTH
+        - 0 <= y < GRID_HEIGHT
+
+    >>> cell_bit(0, 0)
+    1
+    >>> cell_bit(1, 0) == 1 << COLUMN_HEIGHT
+    True
+    """
+    return 1 << (x * COLUMN_HEIGHT + y)
+
+
+def column_mask(x: int) -> int:
+    """Return the mask with every playable cell of column x set.
+
+    Preconditions:
+        - 0 <= x < GRID_WIDTH
+
+    >>> bin(column_mask(0))
+    '0b111111'
+    """
+    return ((1 << GRID_HEIGHT) - 1) << (x * COLUMN_HEIGHT)
+
+
+def _column_block(x: int) -> int:
+    """Return the mask of all COLUMN_HEIGHT bits of column x, including its sentinel bit."""
+    return ((1 << COLUMN_HEIGHT) - 1) << (x * COLUMN_HEIGHT)
+
+
+# For each column x left of the center, the mask of its bits and how far they move when mirrored.
+_MIRROR_STEPS = tuple((_column_block(x), (GRID_WIDTH - 1 - 2 * x) * COLUMN_HEIGHT) for x in range(GRID_WIDTH // 2))
+_CENTER_BLOCK = _column_block(GRID_WIDTH // 2) if GRID_WIDTH % 2 == 1 else 0
+
+
+def mirror_mask(mask: int) -> int:
+    """Return mask flipped left to right, i.e. with the bits of column x moved to column GRID_WIDTH - 1 - x.
+
+    The sentinel bits are moved with their columns, so this also works for keys (see Bitboard.get_key):
+    the key of the mirror image of a position is the mirror of its key.
+
+    Each pair of columns x and GRID_WIDTH - 1 - x is swapped with two shifts, so this only loops over half
+    the columns.
+
+    >>> mirror_mask(cell_bit(0, 2)) == cell_bit(GRID_WIDTH - 1, 2)
+    True
+    >>> mirror_mask(BOTTOM_MASK) == BOTTOM_MASK
+    True
+    """
+    mirrored = mask & _CENTER_BLOCK
+    for block, distance in _MIRROR_STEPS:
+        mirrored |= ((mask & block) << distance) | ((mask >> distance) & block)
+    return mirrored
+
+
+def mirror_column(column: int) -> int:
+    """Return the column that column becomes when the board is flipped left to right.
+
+    This translates a column of the mirror image of a position back to the position itself, and the
+    other way around.
+
+    >>> mirror_column(0)
+    6
+    >>> mirror_column(3)
+    3
+    """
+    return GRID_WIDTH - 1 - column
+
+
+def has_four_connected(mask: int) -> bool:
+    """Return whether the discs in mask contain four connected discs in any orientation.
+
+    For each orientation, m & (m >> shift) keeps the discs that have a neighbour in that direction,
+    and doing it again with twice the shift keeps the discs that start a run of four.
+
+    >>> has_four_connected(cell_bit(0, 0) | cell_bit(1, 0) | cell_bit(2, 0))
+    False
+    >>> has_four_connected(cell_bit(0, 0) | cell_bit(1, 0) | cell_bit(2, 0) | cell_bit(3, 0))
+    True
+    >>> has_four_connected(cell_bit(0, 3) | cell_bit(1, 2) | cell_bit(2, 1) | cell_bit(3, 0))
+    True
+    >>> has_four_connected(cell_bit(0, 3) | cell_bit(0, 4) | cell_bit(0, 5) | cell_bit(1, 0))
+    False
+    """
+    for shift in WIN_SHIFTS:
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class Bitboard:
+    """A Connect 4 position stored as bit masks.
+
+    Instance Attributes:
+        - masks: A list of two ints, where masks[PLAYER_ONE] and masks[PLAYER_TWO] are the cells occupied
+        by each player.
+        - heights: A list of int representing the number of discs in each column.
+        - moves: A list of int representing the columns played so far, in order.
+
+    Representation Invariants:
+        - len(self.masks) == 2 and self.masks[PLAYER_ONE] & self.masks[PLAYER_TWO] == 0
+        - len(self.heights) == GRID_WIDTH and all(0 <= h <= GRID_HEIGHT for h in self.heights)
+        - sum(self.heights) == len(self.moves)
+    """
+    masks: list[int]
+    heights: list[int]
+    moves: list[int]
+
+    def __init__(self) -> None:
+        """Initialize an empty board."""
+        self.masks = [0, 0]
+        self.heights = [0] * GRID_WIDTH
+        self.moves = []
+
+    def get_current_player(self) -> int:
+        """Return the player who should make the next move."""
+        if len(self.moves) % 2 == 0:
+            return PLAYER_ONE
+        return PLAYER_TWO
+
+    def get_occupied_mask(self) -> int:
+        """Return the mask of all occupied cells."""
+        return self.masks[PLAYER_ONE] | self.masks[PLAYER_TWO]
+
+    def can_play(self, column: int) -> bool:
+        """Return whether column is not filled up to the top.
+
+        Preconditions:
+            - 0 <= column < GRID_WIDTH
+        """
+        return self.heights[column] < GRID_HEIGHT
+
+    def legal_moves_mask(self) -> int:
+        """Return the mask of the cells where the next disc of each column would land.
+
+        Adding BOTTOM_MASK carries one bit into the lowest empty cell of each column, and full columns
+        carry into the sentinel row, which is then cleared by BOARD_MASK.
+
+        >>> board = Bitboard()
+        >>> board.legal_moves_mask() == BOTTOM_MASK
+        True
+        >>> board.play(0)
+        >>> board.legal_moves_mask() & column_mask(0) == cell_bit(0, 1)
+        True
+        """
+        return (self.get_occupied_mask() + BOTTOM_MASK) & BOARD_MASK
+
+    def play(self, column: int) -> None:
+        """Drop a disc of the current player into column.
+
+        Preconditions:
+            - self.can_play(column)
+        """
+        self.masks[len(self.moves) % 2] |= 1 << (column * COLUMN_HEIGHT + self.heights[column])
+        self.heights[column] += 1
+        self.moves.append(column)
+
+    def undo(self) -> int:
+        """Remove the last disc played and return its column.
+
+        Preconditions:
+            - self.moves != []
+
+        >>> board = Bitboard()
+        >>> board.play(3)
+        >>> board.undo()
+        3
+        >>> board.masks, board.heights[3]
+        ([0, 0], 0)
+        """
+        column = self.moves.pop()
+        self.heights[column] -= 1
+        self.masks[len(self.moves) % 2] ^= 1 << (column * COLUMN_HEIGHT + self.heights[column])
+        return column
+
+    def has_won(self, player: int) -> bool:
+        """Return whether player has four connected discs on the board.
+
+        Preconditions:
+            - player in {PLAYER_ONE, PLAYER_TWO}
+
+        >>> board = Bitboard()
+        >>> for column in [0, 1, 0, 1, 0, 1]:
+        ...     board.play(column)
+        >>> board.has_won(PLAYER_ONE)
+        False
+        >>> board.play(0)
+        >>> board.has_won(PLAYER_ONE)
+        True
+        """
+        return has_four_connected(self.masks[player])
+
+    def get_key(self) -> int:
+        """Return an integer that uniquely identifies this position.
+
+        Within each column, adding BOTTOM_MASK to the occupied cells leaves a single bit just above the
+        top disc, which marks the height of the column. Player one's discs all lie below that bit, so the
+        sum can never be the same for two different positions. The key fits in GRID_WIDTH * COLUMN_HEIGHT
+        bits and is never 0.
+
+        >>> Bitboard().get_key() == BOTTOM_MASK
+        True
+        """
+        return self.get_occupied_mask() + self.masks[PLAYER_ONE] + BOTTOM_MASK
+
+    def get_canonical_key(self) -> tuple[int, bool]:
+        """Return a tuple (key, mirrored), where key is the smaller of the keys of this position and of its
+        mirror image, and mirrored is whether it is the key of the mirror image.
+
+        A position and its mirror image have the same canonical key, so anything stored under the canonical
+        key is shared by both. Columns stored with it should be in the orientation of the canonical key,
+        i.e. passed through mirror_column first when mirrored is True (and again when they are read back).
+
+        >>> board, mirrored_board = Bitboard(), Bitboard()
+        >>> board.play(0)
+        >>> mirrored_board.play(6)
+        >>> board.get_canonical_key()[0] == mirrored_board.get_canonical_key()[0]
+        True
+        >>> board.get_canonical_key()[1] != mirrored_board.get_canonical_key()[1]
+        True
+        """
+        key = self.get_key()
+        mirrored_key = mirror_mask(key)
+        if mirrored_key < key:
+            return (mirrored_key, True)
+        return (key, False)
+
+    def copy(self) -> Bitboard:
+        """Return a copy of this board."""
+        new_board = Bitboard()
+        new_board.masks = list(self.masks)
+        new_board.heights = list(self.heights)
+        new_board.moves = list(self.moves)
+        return new_board
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'constant'],
+    })
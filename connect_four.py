@@ -23,8 +23,10 @@ which is also Copyright (c) 2023 Mario Badr, David Liu, and Angela Zavaleta Bern
 """
 from __future__ import annotations
 from typing import Optional
+from bisect import insort
 
-from constant import UNOCCUPIED, PLAYER_ONE, PLAYER_TWO, GRID_WIDTH, GRID_HEIGHT, ORIENTATIONS
+from constant import UNOCCUPIED, PLAYER_ONE, PLAYER_TWO, GRID_WIDTH, GRID_HEIGHT
+from bitboard import Bitboard
 
 
 class ConnectFour:
@@ -32,9 +34,12 @@ class ConnectFour:
     Representing state of game of a ConnectFour game.
 
     Instance Attributes:
+    - bitboard: A Bitboard storing the same board as two bit masks. This is the representation used to
+        find possible columns and to detect four connected discs.
     - grid
         A list of list of int that forms a grid of size 7x6 to represent the current gaming board.
         In each spot of the grid, it is either filled with UNOCCUPIED, PLAYER_ONE, or PLAYER_TWO.
+        The grid is kept in sync with self.bitboard so that the interface and scoring functions can read it.
     - player_one_moves: A list of tuples representing moves made by the first player.
     - player_two_moves: A list of tuples representing moves made by the second player.
 
@@ -50,7 +55,9 @@ class ConnectFour:
     - all(0 <= move[0] < GRID_WIDTH and 0 <= move[1] < GRID_HEIGHT for move in self.player_two_moves)
     - all(0 <= move < GRID_WIDTH for move in self._possible_columns)
     - self._winner in {None, UNOCCUPIED, PLAYER_ONE, PLAYER_TWO}
+    - self.bitboard.heights[x] == sum(1 for y in range(GRID_HEIGHT) if self.grid[y][x] != UNOCCUPIED)
     """
+    bitboard: Bitboard
     grid: list[list[int]]
     player_one_moves: list[tuple[int, int]]
     player_two_moves: list[tuple[int, int]]
@@ -59,6 +66,7 @@ class ConnectFour:
 
     def __init__(self) -> None:
         """Initialize a new Connect 4 game."""
+        self.bitboard = Bitboard()
         self.grid = [[UNOCCUPIED] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
         self.player_one_moves = []
         self.player_two_moves = []
@@ -108,7 +116,7 @@ class ConnectFour:
 
     def record_player_move(self, move_column: int) -> None:
         """
-        Record the given move made by the current player.
+        Record the given move made by the current player. This is the same as self.play(move_column).
 
         Preconditions:
         - move_column in self._possible_columns
@@ -125,92 +133,85 @@ class ConnectFour:
         >>> connect_four.player_two_moves
         [(3, 1)]
         """
-        # Get an (x, y) representation of the move.
-        move_position = self.get_move_position_by_column(move_column)
+        self.play(move_column)
 
-        self._update_grid(move_position)
-        self._update_possible_columns()
-        self._update_winner(move_position)
-
-        # These lines must be at the end because we determine the current player by comparing
-        # the length of self.player_one_moves and self.player_two_moves.
-        if self.get_current_player() == PLAYER_ONE:
-            self.player_one_moves.append(move_position)
-        else:
-            self.player_two_moves.append(move_position)
+    def play(self, move_column: int) -> None:
+        """
+        Record the given move made by the current player by mutating this game state in place.
 
-    def _update_grid(self, move_position: tuple[int, int]) -> None:
-        """ Update self.grid by inserting the current player's number into the grid according to move_position.
+        Unlike copy_and_record_player_move, no new game state is created, so a search can explore a whole
+        game tree on a single ConnectFour object by calling play before visiting a child and undo after.
 
         Preconditions:
-        - move_position[0] in self._possible_columns
-        - move_position[1] == 0 or move[move_position[1] - 1][move_position[0]] != UNOCCUPIED
-        """
-        self.grid[move_position[1]][move_position[0]] = self.get_current_player()
+        - move_column in self.get_possible_columns()
 
-    def _update_possible_columns(self) -> None:
+        >>> connect_four = ConnectFour()
+        >>> for column in [3, 4, 3, 4, 3, 4]:
+        ...     connect_four.play(column)
+        >>> connect_four.play(3)
+        >>> connect_four.get_winner() == PLAYER_ONE
+        True
+        >>> connect_four.undo()
+        3
+        >>> connect_four.get_winner() is None
+        True
         """
-        Update the possible columns from which the players can choose.
+        player = self.get_current_player()
+        move_y = self.bitboard.heights[move_column]
 
-        A column is considered to be a possible column if it is not filled up to the top.
-        """
-        self._possible_columns = []
-        for x in range(GRID_WIDTH):
-            if any(self.grid[y][x] == UNOCCUPIED for y in range(GRID_HEIGHT)):
-                self._possible_columns.append(x)
+        self.grid[move_y][move_column] = player
+        self.bitboard.play(move_column)
+        if move_y == GRID_HEIGHT - 1:
+            # The column is now filled up to the top.
+            self._possible_columns.remove(move_column)
 
-    def _update_winner(self, move_position: tuple[int, int]) -> None:
-        """
-        Update self._winner by checking if current player's move at move_position would result in him winning.
+        if self._winner is None:
+            if self.bitboard.has_won(player):
+                self._winner = player
+            elif not self._possible_columns:
+                # Update self._winner when game draws
+                self._winner = UNOCCUPIED
 
-        Set self._winner to be UNOCCUPIED if there's a draw (when there is no possible columns).
+        # These lines must be at the end because we determine the current player by comparing
+        # the length of self.player_one_moves and self.player_two_moves.
+        if player == PLAYER_ONE:
+            self.player_one_moves.append((move_column, move_y))
+        else:
+            self.player_two_moves.append((move_column, move_y))
 
-        Preconditions:
-        - move_position[0] in self._possible_columns
-        - move_position[1] == 0 or move[move_position[1] - 1][move_position[0]] != UNOCCUPIED
+    def undo(self) -> int:
         """
-        if self._winner is not None:
-            return
-
-        if not self._possible_columns:
-            # Update self._winner when game draws
-            self._winner = UNOCCUPIED
-
-        current_player = self.get_current_player()
-        if self._is_four_connected(move_position):
-            self._winner = current_player
-
-    def _is_four_connected(self, move_position: tuple[int, int]) -> bool:
-        """ Checks whether player placing a move at this position will result in four connected discs.
+        Revert the last move recorded by play (or record_player_move) and return its column.
 
         Preconditions:
-        - move_position[0] in self._possible_columns
-        - move_position[1] == 0 or move[move_position[1] - 1][move_position[0]] != UNOCCUPIED
-        """
-        player = self.get_current_player()
-
-        for i in range(4):
-            # Check for four orientations (horizontal, vertical, two diagonal) for connected discs.
-            orientation_x, orientation_y = ORIENTATIONS[i]
-            connected_so_far = 1  # a disc is at least connected to itself
-
-            # Check for opposite directions. For example, left & right are two
-            # opposite directions for the horizontal orientation.
-            for direction_x, direction_y in ((orientation_x, orientation_y), (-orientation_x, -orientation_y)):
+        - len(self.player_one_moves) > 0
+        - the game was not over before the last move was recorded
 
-                pos_x, pos_y = move_position[0] + direction_x, move_position[1] + direction_y
-
-                while 0 <= pos_x < GRID_WIDTH and 0 <= pos_y < GRID_HEIGHT \
-                        and self.grid[pos_y][pos_x] == player and connected_so_far < 4:
+        >>> connect_four = ConnectFour()
+        >>> for column in [0] * GRID_HEIGHT:
+        ...     connect_four.play(column)
+        >>> 0 in connect_four.get_possible_columns()
+        False
+        >>> connect_four.undo()
+        0
+        >>> connect_four.get_possible_columns()
+        [0, 1, 2, 3, 4, 5, 6]
+        >>> connect_four.grid[GRID_HEIGHT - 1][0] == UNOCCUPIED
+        True
+        """
+        if len(self.player_one_moves) == len(self.player_two_moves):
+            move_column, move_y = self.player_two_moves.pop()
+        else:
+            move_column, move_y = self.player_one_moves.pop()
 
-                    connected_so_far += 1
-                    # Update the next position to check
-                    pos_x += direction_x
-                    pos_y += direction_y
+        self.grid[move_y][move_column] = UNOCCUPIED
+        self.bitboard.undo()
+        if move_y == GRID_HEIGHT - 1:
+            # The column was full, so put it back in order.
+            insort(self._possible_columns, move_column)
 
-                if connected_so_far >= 4:
-                    return True
-        return False
+        self._winner = None
+        return move_column
 
     def copy_and_record_player_move(self, move_column: int) -> ConnectFour:
         """ Return a copy of this game state with the given move recorded.
@@ -218,20 +219,46 @@ class ConnectFour:
         Preconditions:
         - move_column in self._possible_columns
         """
-        new_game = self._copy()
+        new_game = self.copy()
         new_game.record_player_move(move_column)
         return new_game
 
-    def _copy(self) -> ConnectFour:
-        """ Return a copy of this game state."""
+    def copy(self) -> ConnectFour:
+        """ Return a copy of this game state, which can be changed without changing this one."""
         new_game = ConnectFour()
+        new_game.bitboard = self.bitboard.copy()
         new_game.grid = [[self.grid[y][x] for x in range(GRID_WIDTH)] for y in range(GRID_HEIGHT)]
         new_game.player_one_moves.extend(self.player_one_moves)
         new_game.player_two_moves.extend(self.player_two_moves)
-        new_game._possible_columns.extend(self._possible_columns)
+        new_game._possible_columns = list(self._possible_columns)
         new_game._winner = self._winner
         return new_game
 
+    def get_canonical_key(self) -> tuple[int, bool]:
+        """ Return a tuple (key, mirrored), where key identifies this game state and its mirror image (the
+        grid flipped left to right), and mirrored is whether key is the key of the mirror image.
+
+        A game state and its mirror image have the same value, so caches (like a transposition table or an
+        opening book) store them together under this key. A column stored with the key must be translated
+        with mirror_column in bitboard.py when mirrored is True. See Bitboard.get_canonical_key.
+
+        >>> game, mirrored_game = create_game_from_moves('01'), create_game_from_moves('65')
+        >>> game.get_canonical_key()[0] == mirrored_game.get_canonical_key()[0]
+        True
+        """
+        return self.bitboard.get_canonical_key()
+
+    def get_move_string(self) -> str:
+        """ Return the columns played so far as a string of column digits, so that
+        create_game_from_moves(self.get_move_string()) is the same game state.
+
+        This is a compact way of sending a game state to another process.
+
+        >>> create_game_from_moves('3344').get_move_string()
+        '3344'
+        """
+        return ''.join(str(column) for column in self.bitboard.moves)
+
     def get_move_position_by_column(self, move_column: int) -> Optional[tuple[int, int]]:
         """ Find the position of a disc in the grid if it is placed at move_column.
 
@@ -248,9 +275,9 @@ class ConnectFour:
         Precondition:
         - move_column in self._possible_columns
         """
-        for y in range(GRID_HEIGHT):
-            if self.grid[y][move_column] == UNOCCUPIED:
-                return (move_column, y)
+        y = self.bitboard.heights[move_column]
+        if y < GRID_HEIGHT:
+            return (move_column, y)
         return None
 
     def get_last_move(self) -> tuple[int, tuple[int, int]] | None:
@@ -286,6 +313,30 @@ class ConnectFour:
         return self._winner
 
 
+def create_game_from_moves(moves: str) -> ConnectFour:
+    """
+    Return a new game where the columns in moves have been played in order, starting with PLAYER_ONE.
+
+    moves is a string of column digits, which is a compact way of writing down a game state.
+
+    Preconditions:
+    - moves describes a sequence of valid moves
+
+    >>> print(create_game_from_moves('344'))
+    |   | 0 | 1 | 2 | 3 | 4 | 5 | 6 |
+    | 5 | - | - | - | - | - | - | - |
+    | 4 | - | - | - | - | - | - | - |
+    | 3 | - | - | - | - | - | - | - |
+    | 2 | - | - | - | - | - | - | - |
+    | 1 | - | - | - | - | O | - | - |
+    | 0 | - | - | - | O | X | - | - |
+    """
+    game = ConnectFour()
+    for move in moves:
+        game.play(int(move))
+    return game
+
+
 def get_opposite_player(player: int) -> int:
     """
     Return the opposite player.
@@ -307,5 +358,6 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 120,
         'max-nested-blocks': 4,
-        'extra-imports': ['__future__', 'typing', 'random', 'connect_four', 'game_tree', 'constant'],
+        'extra-imports': ['__future__', 'typing', 'bisect', 'random', 'connect_four', 'game_tree', 'constant',
+                          'bitboard'],
     })
@@ -7,6 +7,10 @@ This module contains all the constants defined that are essential for implementi
 the Connect 4 game. These are the constants defined for all the functions we created
 including the implementation of the game itself and the pygame interface.
 
+This module does not import pygame, so that the game and the AI players can be imported without it (for
+example by the tournament runner and the benchmarks). The fonts of the interface are created lazily by
+interface.get_font, once pygame has been initialized.
+
 Copyright and Usage Information
 ===============================
 
@@ -17,7 +21,6 @@ expressly prohibited.
 
 This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
 """
-import pygame
 
 # Representations
 GAME_START_MOVE = "*"
@@ -28,6 +31,12 @@ GRID_WIDTH, GRID_HEIGHT = 7, 6
 
 ORIENTATIONS = ((0, 1), (1, 0), (1, 1), (1, -1))    # Horizontal, vertical, two diagonal
 
+# Scores of a finished game, from the point of view of the AI player
+WIN_SCORE, LOSE_SCORE, DRAW_SCORE = 1000, -500, 0
+
+# Bound types of a searched score: the exact score, or a lower or upper bound of it
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
 # Window sizes
 # We try to compute all sizes and coordinates according to SQUARESIZE, so that we can modify
 # the size of the window if we want to.
@@ -43,16 +52,10 @@ DARK_RED, DARK_YELLOW = (178, 49, 49), (178, 137, 0)
 BLUE, WHITE, BLACK, GREY = (65, 108, 234), (255, 255, 255), (0, 0, 0), (192, 192, 192)
 LIGHT_BLUE, DARK_BLUE, DARK_GREY = (97, 162, 255), (45, 75, 163), (134, 134, 134)
 
-pygame.init()
-# We disabled python_ta's 'forbidden-top-level-code' error, because we need pygame.init() to be able to
-# define the fonts as global variables, due to the constraints of pygame.
-# Also, python_ta can't recognize that pygame has and init function, so we also disabled 'no-member'.
-
-# Fonts
-FONT_WORDS = pygame.font.SysFont("Courier", SQUARESIZE // 3)
-FONT_WIN_STATUS = pygame.font.SysFont("Courier", int(SQUARESIZE / 1.5))
+# Font sizes
+FONT_WORDS_SIZE = SQUARESIZE // 3
+FONT_WIN_STATUS_SIZE = int(SQUARESIZE / 1.5)
 FONT_SIZE = int(SQUARESIZE / 2.5)
-FONT_BUTTON = pygame.font.Font(None, FONT_SIZE)
 
 if __name__ == '__main__':
     import doctest
@@ -62,6 +65,4 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 120,
         'max-nested-blocks': 4,
-        'extra-imports': ['pygame'],
-        'disable': ['no-member', 'forbidden-top-level-code'],
     })
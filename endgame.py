@@ -0,0 +1,317 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Endgame Tablebase)
+
+Module Description
+==================
+
+This module contains an EndgameTablebase class that looks up the exact scores of game states close to the
+end of a game, and a generate_endgame_tablebase function that computes them and writes them to a file.
+
+Once only a few cells are empty, there are few enough game states left that all of them can be solved
+exactly. An endgame tablebase stores the score of every game state with at most max_empty_cells empty cells
+that can be reached from a set of seed game states, so that a search engine (or a game tree) reaching one of
+them can stop searching right away instead of expanding its whole subtree.
+
+The scores are the same as the scores of Solver in solver.py: from the point of view of the player moving
+next, 0 for a draw, and positive for a win (higher for sooner wins) or negative for a loss. They are computed
+by a plain negamax search of every game state, remembering the score of each one, so every game state is
+only solved once however many ways it can be reached. A game state and its mirror image have the same score,
+so they are stored once under their canonical key.
+
+File Format
+===========
+
+A tablebase file is a header followed by a hash table of slots, so that a game state can be found with
+about one read. The file is memory-mapped rather than read, so opening a tablebase is instant and only the
+pages that are looked up are ever loaded.
+
+    - Header (16 bytes): the 4 bytes TABLEBASE_MAGIC, the version and max_empty_cells (one byte each), two
+      padding bytes, the number of records and the number of slots (4 bytes each).
+    - Slot (9 bytes): the canonical key of a game state (8 bytes), or 0 for an empty slot, and its score
+      (1 byte, signed).
+
+The number of slots is a power of two at least twice the number of records. A game state is stored in the
+slot given by the top bits of its key times _HASH_MULTIPLIER (like in TranspositionTable), or in the next
+empty slot after it. All numbers are little-endian.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import BinaryIO, Iterable, Optional
+import mmap
+import struct
+from connect_four import ConnectFour
+from bitboard import NUM_CELLS, BOTTOM_MASK, BOARD_MASK, column_mask, has_four_connected, mirror_mask
+from constant import GRID_WIDTH, WIN_SCORE, LOSE_SCORE, DRAW_SCORE
+
+# The first bytes of every tablebase file, and the version of the file format.
+TABLEBASE_MAGIC = b'C4EG'
+TABLEBASE_VERSION = 1
+
+DEFAULT_MAX_EMPTY_CELLS = 10
+
+_HEADER = struct.Struct('<4sBBxxII')
+_SLOT = struct.Struct('<Qb')
+_WORD_MASK = (1 << 64) - 1
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# column_mask(x) for every column x.
+_COLUMN_MASKS = tuple(column_mask(x) for x in range(GRID_WIDTH))
+
+
+def get_tablebase_key(current: int, occupied: int) -> int:
+    """Return the canonical key of the game state with the discs current of the player moving next and the
+    discs occupied: the smaller of its key (see get_position_key in solver.py) and the key of its mirror
+    image.
+    """
+    key = current + occupied + BOTTOM_MASK
+    mirrored_key = mirror_mask(key)
+    return mirrored_key if mirrored_key < key else key
+
+
+def _slot_index(key: int, index_shift: int) -> int:
+    """Return the first slot to look for key in, in a table of 2 ** (64 - index_shift) slots."""
+    return ((key * _HASH_MULTIPLIER) & _WORD_MASK) >> index_shift
+
+
+class EndgameTablebase:
+    """An endgame tablebase file, opened for lookups.
+
+    Instance Attributes:
+        - max_empty_cells: The largest number of empty cells of the game states in the tablebase.
+
+    Private Instance Attributes:
+        - _file: The open tablebase file.
+        - _data: The memory-mapped contents of the tablebase file.
+        - _num_records: The number of game states in the tablebase.
+        - _slot_mask: The number of slots minus one.
+        - _index_shift: The number of bits to drop from a 64-bit hash to get a slot index.
+
+    Representation Invariants:
+        - self._num_records * 2 <= self._slot_mask + 1
+        - len(self._data) == _HEADER.size + (self._slot_mask + 1) * _SLOT.size
+
+    >>> import os
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'tablebase.bin')
+    >>> from connect_four import create_game_from_moves
+    >>> seed = create_game_from_moves('0441104201113554136222055566542433')
+    >>> generate_endgame_tablebase(path, [seed], 8)
+    266
+    >>> tablebase = EndgameTablebase(path)
+    >>> tablebase.lookup(seed)
+    0
+    >>> game = create_game_from_moves('04411042011135541362220555665424330')
+    >>> tablebase.lookup(game)
+    4
+    >>> tablebase.lookup_outcome_score(game, game.get_current_player()) == WIN_SCORE
+    True
+    >>> tablebase.lookup(create_game_from_moves('33')) is None
+    True
+    >>> tablebase.close()
+    """
+    max_empty_cells: int
+    _file: BinaryIO
+    _data: mmap.mmap
+    _num_records: int
+    _slot_mask: int
+    _index_shift: int
+
+    def __init__(self, path: str) -> None:
+        """Open the tablebase file at path.
+
+        Raise a ValueError if the file is not a tablebase of this version.
+        """
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.max_empty_cells, self._num_records, num_slots = _HEADER.unpack_from(self._data, 0)
+        if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION or num_slots & (num_slots - 1) != 0 \
+                or len(self._data) != _HEADER.size + num_slots * _SLOT.size:
+            self.close()
+            raise ValueError(f'{path} is not a valid endgame tablebase')
+
+        self._slot_mask = num_slots - 1
+        self._index_shift = 64 - (num_slots.bit_length() - 1)
+
+    def __len__(self) -> int:
+        """Return the number of game states stored in the tablebase (not counting mirror images)."""
+        return self._num_records
+
+    def close(self) -> None:
+        """Close the tablebase file. The tablebase cannot be used afterwards."""
+        self._data.close()
+        self._file.close()
+
+    def lookup(self, game: ConnectFour) -> Optional[int]:
+        """Return the exact score of game for the player moving next, or None if game is not in the tablebase.
+
+        Preconditions:
+            - game.get_winner() is None
+        """
+        occupied = game.bitboard.get_occupied_mask()
+        current = game.bitboard.masks[game.get_current_player()]
+        return self.lookup_position(current, occupied, len(game.bitboard.moves))
+
+    def lookup_position(self, current: int, occupied: int, num_moves: int) -> Optional[int]:
+        """Return the exact score of the game state (current, occupied, num_moves) for the player moving
+        next, or None if it is not in the tablebase. The game state is given as in Solver.
+
+        Game states with more than max_empty_cells empty cells are rejected without reading the file.
+        """
+        if NUM_CELLS - num_moves > self.max_empty_cells:
+            return None
+
+        key = get_tablebase_key(current, occupied)
+        slot = _slot_index(key, self._index_shift)
+        slot_key, score = _SLOT.unpack_from(self._data, _HEADER.size + slot * _SLOT.size)
+        while slot_key != key:
+            if slot_key == 0:
+                return None
+            slot = (slot + 1) & self._slot_mask
+            slot_key, score = _SLOT.unpack_from(self._data, _HEADER.size + slot * _SLOT.size)
+        return score
+
+    def lookup_outcome_score(self, game: ConnectFour, initial_player: int) -> Optional[int]:
+        """Return WIN_SCORE, LOSE_SCORE or DRAW_SCORE if initial_player wins, loses or draws game with perfect
+        play, or None if game is not in the tablebase.
+
+        These are the scores generate_complete_tree_to_depth in player.py gives to finished games, so a game
+        state found in the tablebase can be scored as if the game was already over.
+
+        Preconditions:
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        score = self.lookup(game)
+        if score is None:
+            return None
+        elif score == 0:
+            return DRAW_SCORE
+        elif (score > 0) == (game.get_current_player() == initial_player):
+            return WIN_SCORE
+        else:
+            return LOSE_SCORE
+
+
+def generate_endgame_tablebase(path: str, seeds: Iterable[ConnectFour],
+                               max_empty_cells: int = DEFAULT_MAX_EMPTY_CELLS) -> int:
+    """Write a tablebase of every unfinished game state with at most max_empty_cells empty cells that can be
+    reached from the game states in seeds to the file at path, and return the number of game states written.
+
+    Game states with more empty cells are only walked through, once each, to reach the ones with few enough.
+    So the time taken grows quickly with the number of empty cells of the seeds.
+
+    Preconditions:
+        - 0 <= max_empty_cells < 128
+        - every seed in seeds has fewer than 2 ** 32 game states with at most max_empty_cells empty cells
+        that can be reached from it
+    """
+    scores = {}
+    walked = set()
+    for seed in seeds:
+        if seed.get_winner() is None:
+            occupied = seed.bitboard.get_occupied_mask()
+            current = seed.bitboard.masks[seed.get_current_player()]
+            _walk(current, occupied, len(seed.bitboard.moves), max_empty_cells, walked, scores)
+
+    num_slots = 1
+    while num_slots < 2 * len(scores):
+        num_slots *= 2
+    index_shift = 64 - (num_slots.bit_length() - 1)
+
+    table = bytearray(num_slots * _SLOT.size)
+    for key, score in scores.items():
+        slot = _slot_index(key, index_shift)
+        while _SLOT.unpack_from(table, slot * _SLOT.size)[0] != 0:
+            slot = (slot + 1) & (num_slots - 1)
+        _SLOT.pack_into(table, slot * _SLOT.size, key, score)
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, max_empty_cells, len(scores), num_slots))
+        file.write(table)
+    return len(scores)
+
+
+def _walk(current: int, occupied: int, num_moves: int, max_empty_cells: int, walked: set[int],
+          scores: dict[int, int]) -> None:
+    """Solve every game state with at most max_empty_cells empty cells that can be reached from the game
+    state (current, occupied, num_moves), and add their scores to scores.
+
+    walked is the set of canonical keys of the game states with more empty cells already walked through.
+
+    Preconditions:
+        - (current, occupied, num_moves) is not finished
+    """
+    if NUM_CELLS - num_moves <= max_empty_cells:
+        _solve_exhaustively(current, occupied, num_moves, scores)
+        return
+
+    key = get_tablebase_key(current, occupied)
+    if key in walked:
+        return
+    walked.add(key)
+
+    playable = (occupied + BOTTOM_MASK) & BOARD_MASK
+    for mask in _COLUMN_MASKS:
+        move = playable & mask
+        if move and not has_four_connected(current | move):
+            # The board cannot be full yet, since there are more than max_empty_cells empty cells.
+            _walk(current ^ occupied, occupied | move, num_moves + 1, max_empty_cells, walked, scores)
+
+
+def _solve_exhaustively(current: int, occupied: int, num_moves: int, scores: dict[int, int]) -> int:
+    """Return the score of the game state (current, occupied, num_moves) for the player moving next, and add
+    the scores of it and of every game state that can be reached from it to scores.
+
+    Unlike Solver, every move is searched, since the score of every game state is needed anyway.
+
+    Preconditions:
+        - (current, occupied, num_moves) is not finished
+    """
+    key = get_tablebase_key(current, occupied)
+    if key in scores:
+        return scores[key]
+
+    best_score = -NUM_CELLS
+    playable = (occupied + BOTTOM_MASK) & BOARD_MASK
+    for mask in _COLUMN_MASKS:
+        move = playable & mask
+        if not move:
+            continue
+        elif has_four_connected(current | move):
+            score = (NUM_CELLS + 1 - num_moves) // 2
+        elif num_moves + 1 == NUM_CELLS:
+            score = 0
+        else:
+            # After the move, the opponent moves next.
+            score = -_solve_exhaustively(current ^ occupied, occupied | move, num_moves + 1, scores)
+        best_score = max(best_score, score)
+
+    scores[key] = best_score
+    return best_score
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    # We disabled python_ta's 'consider-using-with' error, because an EndgameTablebase keeps its file open (and
+    # memory-mapped) until it is closed, so the file cannot be opened in a with statement. _walk also needs
+    # one argument more than python_ta allows, so we disabled 'too-many-arguments' as well.
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'mmap', 'struct', 'connect_four', 'bitboard', 'constant',
+                          'os', 'tempfile'],
+        'allowed-io': ['EndgameTablebase.__init__', 'generate_endgame_tablebase'],
+        'disable': ['consider-using-with', 'too-many-arguments'],
+    })
@@ -0,0 +1,268 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Evaluation)
+
+Module Description
+==================
+
+This module contains the score_game function that scores game states, the precomputed tables it uses, and
+an IncrementalEvaluator class that computes the same scores as score_game, but updates them one disc at a time
+instead of scanning the whole grid.
+
+score_game adds up a score for each of the 69 windows of four cells in a row (24 horizontal,
+21 vertical and 24 diagonal), plus a bonus for the discs in the center column. A window's score only
+depends on how many discs each player has in it, so it can be looked up in a table instead of being
+computed. Also, a disc only belongs to a few windows, so when a disc is dropped (or removed), only the
+windows through its cell have to be rescored.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Optional
+from connect_four import ConnectFour, get_opposite_player
+from constant import GRID_WIDTH, GRID_HEIGHT, PLAYER_ONE, PLAYER_TWO, UNOCCUPIED, ORIENTATIONS
+
+# The score of a window when a party has 0/1/2/3/4 discs in it. See _score_slice.
+GO_NEXT_PLAYER_SCORE = (0, 0, 8, 90, 100)
+GO_NEXT_OPPONENT_SCORE = (0, 0, -5, -60, -100)
+NOT_NEXT_PLAYER_SCORE = (0, 0, 5, 60, 100)
+NOT_NEXT_OPPONENT_SCORE = (0, 0, -8, -90, 100)
+
+# The score of each disc of the player in the center column.
+CENTER_SCORE = 6
+
+
+def _generate_windows() -> list[tuple[tuple[int, int], ...]]:
+    """Return every window of four cells in a row, as tuples of (x, y) positions."""
+    windows = []
+    for orientation_y, orientation_x in ORIENTATIONS:
+        for y in range(GRID_HEIGHT):
+            for x in range(GRID_WIDTH):
+                cells = tuple((x + i * orientation_x, y + i * orientation_y) for i in range(4))
+                if all(0 <= cell_x < GRID_WIDTH and 0 <= cell_y < GRID_HEIGHT for cell_x, cell_y in cells):
+                    windows.append(cells)
+    return windows
+
+
+# WINDOWS[w] is the tuple of the four (x, y) cells of window w.
+WINDOWS = _generate_windows()
+
+# WINDOW_CELL_INDICES[w] is the tuple of the four cells of window w, where the cell (x, y) has index
+# y * GRID_WIDTH + x, i.e. its index in the grid flattened row by row.
+WINDOW_CELL_INDICES = [tuple(y * GRID_WIDTH + x for x, y in cells) for cells in WINDOWS]
+
+# CELL_WINDOWS[y][x] is the tuple of the indices of the windows containing the cell (x, y).
+CELL_WINDOWS = [[tuple(w for w in range(len(WINDOWS)) if (x, y) in WINDOWS[w]) for x in range(GRID_WIDTH)]
+                for y in range(GRID_HEIGHT)]
+
+# WINDOW_SCORES[is_moving_next][player_count][opponent_count] is the score of a window for a player.
+WINDOW_SCORES = [[[0 if player_count != 0 and opponent_count != 0
+                   else player_scores[player_count] + opponent_scores[opponent_count]
+                   for opponent_count in range(5)]
+                  for player_count in range(5)]
+                 for player_scores, opponent_scores in ((NOT_NEXT_PLAYER_SCORE, NOT_NEXT_OPPONENT_SCORE),
+                                                        (GO_NEXT_PLAYER_SCORE, GO_NEXT_OPPONENT_SCORE))]
+
+# The same table, indexed by player_count + 5 * opponent_count instead:
+# PACKED_WINDOW_SCORES[is_moving_next][player_count + 5 * opponent_count] is the score of a window for a player.
+PACKED_WINDOW_SCORES = [[scores[packed % 5][packed // 5] for packed in range(25)] for scores in WINDOW_SCORES]
+
+
+def score_game(game: ConnectFour, player: int, is_moving_next: bool) -> int:
+    """ Score how favorable the game state is to this player, given whether he is moving next.
+
+    is_moving_next means whether this player will make the next move. This variable is included
+    because this function can be called when player is moving next or when his opponent is moving next.
+
+    This function evaluates the whole game grid by iterating through all possible 4-in-a-row slices in
+    horizontal, vertical, and two diagonal. The total score returned is the sum of the score of each slice.
+
+    The center column is also scored and added to the total score since taking up the central column
+    is very crucial to winning the game. This is because any horizontal or slanted 4 connected discs
+    on the grid must have at least one disc in the central column.
+
+    The slices are precomputed in WINDOW_CELL_INDICES. Each disc of player is counted as 1 and each disc of
+    the opponent as 5, so that adding up the four cells of a slice gives player_count + 5 * opponent_count,
+    which is looked up in PACKED_WINDOW_SCORES (see _score_slice).
+
+    Preconditions:
+        - player in {PLAYER_ONE, PLAYER_TWO}
+
+    >>> game = ConnectFour()
+    >>> for column in [3, 3, 4]:
+    ...     game.record_player_move(column)
+    >>> score_game(game, PLAYER_ONE, False)
+    21
+    """
+    weights = {player: 1, get_opposite_player(player): 5, UNOCCUPIED: 0}
+    cells = [weights[cell] for row in game.grid for cell in row]
+    window_scores = PACKED_WINDOW_SCORES[is_moving_next]
+
+    # Score center column
+    center_count = [row[GRID_WIDTH // 2] for row in game.grid].count(player)
+    score_so_far = CENTER_SCORE * center_count
+
+    # Score horizontal, vertical, and two diagonal slices
+    for a, b, c, d in WINDOW_CELL_INDICES:
+        score_so_far += window_scores[cells[a] + cells[b] + cells[c] + cells[d]]
+
+    return score_so_far
+
+
+def _score_slice(grid_slice: list[int], player: int, player_go_next: bool) -> int:
+    """ Score a slice of four discs with respective to the player, given whether he is moving next.
+
+    If the slice contains both player's discs and opponent's discs, we give it a 0, because
+    both parties can't connect four in this slice.
+
+    Otherwise, we give positive scores if player is occupying this slice, and negative scores if opponent is
+    occupying this slice. We give a higher score if more discs are connected. The specific score scheme is
+    stored in the four tuples GO_NEXT_PLAYER_SCORE, GO_NEXT_OPPONENT_SCORE, NOT_NEXT_PLAYER_SCORE and
+    NOT_NEXT_OPPONENT_SCORE, and the resulting score of every slice is precomputed in
+    WINDOW_SCORES.
+
+    Based on whether player goes next, we value player and opponent's discs differently. If the player
+    goes next, we think attacking is more important. Thus, the absolute value of go_next_player_score is larger
+    than that of go_next_opponent_score. This means that the player's connected discs influence the
+    overall score to a larger extent. If the opponent goes next, we think defending is more important. The
+    scoring scheme is thus opposite to the other case.
+
+    Preconditions:
+        - len(grid_slice) = 4
+        - player in {PLAYER_ONE, PLAYER_TWO}
+
+    >>> _score_slice([PLAYER_ONE, PLAYER_TWO, UNOCCUPIED, UNOCCUPIED], PLAYER_ONE, True)
+    0
+    >>> _score_slice([PLAYER_ONE, PLAYER_ONE, UNOCCUPIED, PLAYER_ONE], PLAYER_ONE, True)
+    90
+    >>> _score_slice([PLAYER_ONE, PLAYER_ONE, UNOCCUPIED, PLAYER_ONE], PLAYER_TWO, True)
+    -60
+    >>> _score_slice([UNOCCUPIED, PLAYER_ONE, UNOCCUPIED, PLAYER_ONE], PLAYER_ONE, False)
+    5
+    """
+    opponent = get_opposite_player(player)
+    player_count, opponent_count = grid_slice.count(player), grid_slice.count(opponent)
+    return WINDOW_SCORES[player_go_next][player_count][opponent_count]
+
+
+class IncrementalEvaluator:
+    """A running score_game of a game state, updated as discs are added and removed.
+
+    An IncrementalEvaluator can be called like score_game: evaluator(game, player, is_moving_next).
+    In that case game must be the game state the evaluator has been kept up to date with.
+
+    Private Instance Attributes:
+        - _counts: _counts[player][w] is the number of discs of player in window w.
+        - _totals: _totals[player][is_moving_next] is the current value of
+        score_game(game, player, is_moving_next).
+
+    Representation Invariants:
+        - all(0 <= self._counts[p][w] <= 4 for p in {PLAYER_ONE, PLAYER_TWO} for w in range(len(WINDOWS)))
+
+    >>> game = ConnectFour()
+    >>> evaluator = IncrementalEvaluator(game)
+    >>> for column in [3, 3, 4]:
+    ...     game.play(column)
+    ...     evaluator.add_disc(column, game.bitboard.heights[column] - 1, game.get_last_move()[0])
+    >>> evaluator.score(PLAYER_ONE, False)
+    21
+    >>> evaluator.remove_disc(4, 0, PLAYER_ONE)
+    >>> evaluator.score(PLAYER_TWO, True)
+    6
+    """
+    _counts: list[list[int]]
+    _totals: list[list[int]]
+
+    def __init__(self, game: Optional[ConnectFour] = None) -> None:
+        """Initialize an evaluator for game, or for an empty game if game is None."""
+        self._counts = [[0] * len(WINDOWS), [0] * len(WINDOWS)]
+        self._totals = [[0, 0], [0, 0]]
+        if game is not None:
+            self.reset(game)
+
+    def __call__(self, game: ConnectFour, player: int, is_moving_next: bool) -> int:
+        """Return score_game(game, player, is_moving_next).
+
+        Preconditions:
+            - this evaluator is up to date with game
+            - player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        return self._totals[player][is_moving_next]
+
+    def score(self, player: int, is_moving_next: bool) -> int:
+        """Return how favorable the current game state is to player, like score_game.
+
+        Preconditions:
+            - player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        return self._totals[player][is_moving_next]
+
+    def reset(self, game: ConnectFour) -> None:
+        """Set this evaluator to the game state of game."""
+        self._counts = [[0] * len(WINDOWS), [0] * len(WINDOWS)]
+        self._totals = [[0, 0], [0, 0]]
+        for y in range(GRID_HEIGHT):
+            for x in range(GRID_WIDTH):
+                if game.grid[y][x] != UNOCCUPIED:
+                    self.add_disc(x, y, game.grid[y][x])
+
+    def add_disc(self, x: int, y: int, player: int) -> None:
+        """Update the scores after a disc of player is placed at (x, y).
+
+        Preconditions:
+            - the cell (x, y) was empty
+            - player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        self._update_windows(x, y, player, 1)
+
+    def remove_disc(self, x: int, y: int, player: int) -> None:
+        """Update the scores after the disc of player at (x, y) is removed.
+
+        Preconditions:
+            - the cell (x, y) had a disc of player
+        """
+        self._update_windows(x, y, player, -1)
+
+    def _update_windows(self, x: int, y: int, player: int, change: int) -> None:
+        """Add change to the disc count of player in every window through (x, y), and update the totals."""
+        counts_one, counts_two = self._counts[PLAYER_ONE], self._counts[PLAYER_TWO]
+        totals_one, totals_two = self._totals[PLAYER_ONE], self._totals[PLAYER_TWO]
+        not_next_scores, go_next_scores = WINDOW_SCORES
+        player_counts = self._counts[player]
+
+        for w in CELL_WINDOWS[y][x]:
+            count_one, count_two = counts_one[w], counts_two[w]
+            totals_one[0] -= not_next_scores[count_one][count_two]
+            totals_one[1] -= go_next_scores[count_one][count_two]
+            totals_two[0] -= not_next_scores[count_two][count_one]
+            totals_two[1] -= go_next_scores[count_two][count_one]
+
+            player_counts[w] += change
+
+            count_one, count_two = counts_one[w], counts_two[w]
+            totals_one[0] += not_next_scores[count_one][count_two]
+            totals_one[1] += go_next_scores[count_one][count_two]
+            totals_two[0] += not_next_scores[count_two][count_one]
+            totals_two[1] += go_next_scores[count_two][count_one]
+
+        if x == GRID_WIDTH // 2:
+            self._totals[player][0] += CENTER_SCORE * change
+            self._totals[player][1] += CENTER_SCORE * change
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'connect_four', 'constant'],
+    })
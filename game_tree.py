@@ -23,15 +23,24 @@ which is also Copyright (c) 2023 Mario Badr, David Liu, and Isaac Waller.
 """
 from __future__ import annotations
 from typing import Optional
-from constant import GAME_START_MOVE, PLAYER_ONE
+from constant import GAME_START_MOVE, PLAYER_ONE, GRID_WIDTH, EXACT
 from connect_four import get_opposite_player
 
+# The depth of a game tree whose score has not been computed by search_lazy_tree in player.py, and the depth
+# of a game tree whose score is the final result of the game, which is the same at every depth.
+UNSEARCHED_DEPTH = -1
+FINAL_DEPTH = 1 << 30
+
 
 class GameTree:
     """A decision tree for ConnectFour column.
 
     Each node in the tree stores a possible ConnectFour column.
 
+    A complete tree of depth 6 has over a hundred thousand nodes, so nodes are kept small: they have
+    __slots__ instead of a __dict__, and the subtrees are kept in a list with one slot per column, which is
+    only created when the first subtree is added. Most nodes are leaves, which then need no container at all.
+
     Instance Attributes:
         - move_column: An int representing the current move (of either PLAYER_ONE or PLAYER_TWO),
         or a str '*' if this node represents the start of a game.
@@ -39,21 +48,42 @@ class GameTree:
         - current_player: The player that will choose a move in GameTree's subtree. In other words, current_player
         is the opposite of the player who make the move that is stored in move_column.
         - score: An integer representing how this move is favorable to the initial_player.
+        - depth: The depth of the search that computed score in a lazily expanded tree (see search_lazy_tree in
+        player.py), FINAL_DEPTH if score is the final result of the game, or UNSEARCHED_DEPTH if score was not
+        computed that way.
+        - bound: Whether score is the EXACT score of that search, or only a LOWER_BOUND or an UPPER_BOUND of
+        it (see transposition.py).
 
     Private Instance Attributes:
-        - _subtrees: A mapping of a move columnt to its corresponding GameTree objects representing the
-        subtrees of this game tree.
+        - _subtrees: A list of GRID_WIDTH slots where _subtrees[column] is the subtree of the move column,
+        or None if there is no such subtree, or None instead of the list if this game tree has no subtrees.
 
     Representation Invariants:
         - self.move_column == GAME_START_MOVE or 0 <= self.column < 7
         - self.move_column == GAME_START_MOVE or self.current_player in {PLAYER_ONE, PLAYER_TWO}
         - self.initial_player in {PLAYER_ONE, PLAYER_TWO}
+        - self._subtrees is None or (len(self._subtrees) == GRID_WIDTH and any(self._subtrees))
+        - self._subtrees is None or all(t is None or t.move_column == x for x, t in enumerate(self._subtrees))
+
+    >>> game_tree = GameTree(GAME_START_MOVE, PLAYER_ONE, get_opposite_player(PLAYER_ONE))
+    >>> game_tree.add_subtree(GameTree(4, PLAYER_ONE, PLAYER_ONE, score=2))
+    >>> game_tree.add_subtree(GameTree(2, PLAYER_ONE, PLAYER_ONE, score=5))
+    >>> [subtree.move_column for subtree in game_tree.get_subtrees()]
+    [2, 4]
+    >>> game_tree.get_subtree_by_column(3) is None
+    True
+    >>> len(game_tree), game_tree.score
+    (3, 5)
     """
+    __slots__: tuple[str, ...] = ('move_column', 'initial_player', 'current_player', 'score', 'depth', 'bound',
+                                  '_subtrees')
     move_column: int | str
     initial_player: int
     current_player: Optional[int]
     score: int
-    _subtrees: dict[int, GameTree]
+    depth: int
+    bound: int
+    _subtrees: Optional[list[Optional[GameTree]]]
 
     def __init__(self, move_column: str | int, initial_player: int, current_player: Optional[int],
                  score: Optional[int] = 0) -> None:
@@ -69,7 +99,9 @@ class GameTree:
         self.initial_player = initial_player
         self.current_player = current_player
         self.score = score
-        self._subtrees = {}
+        self.depth = UNSEARCHED_DEPTH
+        self.bound = EXACT
+        self._subtrees = None
 
     def __str__(self) -> str:
         """Return a string representation of this tree.
@@ -93,17 +125,19 @@ class GameTree:
             turn_desc = "Player Two"
         move_desc = f'{self.move_column}: {self.score} -> {turn_desc}\n'
         str_so_far = '  ' * depth + move_desc
-        for subtree in self._subtrees.values():
+        for subtree in self.get_subtrees():
             str_so_far += subtree._str_indented(depth + 1)
         return str_so_far
 
     def __len__(self) -> int:
         """Return the number of items in this tree."""
-        return 1 + sum(subtree.__len__() for subtree in self._subtrees.values())
+        return 1 + sum(subtree.__len__() for subtree in self.get_subtrees())
 
     def get_subtrees(self) -> list[GameTree]:
-        """Return the subtrees of this game tree."""
-        return list(self._subtrees.values())
+        """Return the subtrees of this game tree, in the order of their columns."""
+        if self._subtrees is None:
+            return []
+        return [subtree for subtree in self._subtrees if subtree is not None]
 
     def get_subtree_by_column(self, column: int) -> Optional[GameTree]:
         """Return the subtree corresponding to the given column.
@@ -113,10 +147,9 @@ class GameTree:
         Preconditions:
             - 0 <= move_column < 7
         """
-        if column in self._subtrees:
-            return self._subtrees[column]
-        else:
+        if self._subtrees is None:
             return None
+        return self._subtrees[column]
 
     def get_next_player(self) -> int:
         """Return the player who should move next."""
@@ -126,10 +159,31 @@ class GameTree:
             return get_opposite_player(self.current_player)
 
     def add_subtree(self, subtree: GameTree) -> None:
-        """Add a subtree to this game tree."""
+        """Add a subtree to this game tree, replacing the subtree of the same column if there is one.
+
+        Preconditions:
+            - 0 <= subtree.move_column < GRID_WIDTH
+        """
+        if self._subtrees is None:
+            self._subtrees = [None] * GRID_WIDTH
         self._subtrees[subtree.move_column] = subtree
         self.update_score()
 
+    def get_or_add_subtree(self, column: int) -> GameTree:
+        """Return the subtree corresponding to the given column, adding a new unscored leaf for it if there is
+        none. The score of this tree is not updated, since the new leaf has no score yet.
+
+        Preconditions:
+            - 0 <= column < GRID_WIDTH
+        """
+        if self._subtrees is None:
+            self._subtrees = [None] * GRID_WIDTH
+        subtree = self._subtrees[column]
+        if subtree is None:
+            subtree = GameTree(column, self.initial_player, self.get_next_player())
+            self._subtrees[column] = subtree
+        return subtree
+
     def update_score(self) -> None:
         """ Update the score for each new move.
 
@@ -143,7 +197,7 @@ class GameTree:
         by us) will make the best move by maximizing intial player's score, so self's score is the maximum of
         its subtree's score.
         """
-        if len(self._subtrees) == 0:
+        if self._subtrees is None:
             return
 
         if self.initial_player != self.current_player:
@@ -153,6 +207,16 @@ class GameTree:
             min_subtree_score = min(subtree.score for subtree in self.get_subtrees())
             self.score = min_subtree_score
 
+    def update_all_scores(self) -> None:
+        """ Update the score of every node of this tree from the scores of its leaves.
+
+        The subtrees are updated before the tree itself, so this is needed when leaf scores are changed
+        after the tree was built, e.g. when the leaves are scored in batches.
+        """
+        for subtree in self.get_subtrees():
+            subtree.update_all_scores()
+        self.update_score()
+
 
 if __name__ == '__main__':
     import doctest
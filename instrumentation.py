@@ -0,0 +1,262 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Instrumentation)
+
+Module Description
+==================
+
+This module contains the optional instrumentation of the searches of our AI players, which tells why a move
+took as long as it did.
+
+A SearchStats object counts the work of the search of one move. The search functions of player.py
+(generate_complete_tree_to_depth, update_complete_tree_to_depth and search_lazy_tree) and AlphaBetaSearch
+take one as an optional argument or attribute, and fill it in while searching. When none is given, each of
+them only checks once per game state that there is none, so the instrumentation costs next to nothing when
+it is disabled.
+
+A SearchInstrumentation object is given to a GreedyPlayer or an AlphaBetaPlayer to keep the SearchStats of
+every move the player chooses. It can also profile every move with cProfile, writing one file per move that
+can be read with pstats, and append the stats of every move to a JSON lines trace file as soon as the move is
+chosen.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Optional
+import cProfile
+import json
+import os
+import time
+from connect_four import ConnectFour
+
+
+class SearchStats:
+    """The counters of the search of one move.
+
+    The ply of a game state is the number of moves made from the game state the search started from, so the
+    root of the search is at ply 0.
+
+    Instance Attributes:
+        - root_num_moves: The number of moves made in the game when the search started.
+        - nodes_generated: The number of game states searched (or added to a game tree), including the root.
+        - leaves_evaluated: The number of game states scored by the evaluation function.
+        - terminal_hits: The number of finished game states, and game states found in an endgame tablebase.
+        - cache_hits: The number of game states whose score was reused from an earlier search instead of
+        being searched again: the hits of a transposition table, or the nodes of a lazily expanded game tree
+        already searched to the same depth.
+        - nodes_by_ply: The number of game states searched at each ply, which is only known for the searches
+        made in this process.
+        - expanded_by_ply: The number of game states at each ply whose children were searched.
+        - evaluation_seconds: The time spent in the evaluation function.
+        - total_seconds: The time the whole search of the move took.
+
+    Representation Invariants:
+        - sum(self.nodes_by_ply) <= self.nodes_generated
+        - len(self.expanded_by_ply) <= len(self.nodes_by_ply)
+        - 0 <= self.evaluation_seconds
+    """
+    root_num_moves: int
+    nodes_generated: int
+    leaves_evaluated: int
+    terminal_hits: int
+    cache_hits: int
+    nodes_by_ply: list[int]
+    expanded_by_ply: list[int]
+    evaluation_seconds: float
+    total_seconds: float
+
+    def __init__(self, root_num_moves: int = 0) -> None:
+        """Initialize empty counters for a search starting after root_num_moves moves."""
+        self.root_num_moves = root_num_moves
+        self.nodes_generated = 0
+        self.leaves_evaluated = 0
+        self.terminal_hits = 0
+        self.cache_hits = 0
+        self.nodes_by_ply = []
+        self.expanded_by_ply = []
+        self.evaluation_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def count_node(self, game: ConnectFour) -> None:
+        """Count game as a searched game state.
+
+        Preconditions:
+            - len(game.bitboard.moves) >= self.root_num_moves
+        """
+        ply = len(game.bitboard.moves) - self.root_num_moves
+        while len(self.nodes_by_ply) <= ply:
+            self.nodes_by_ply.append(0)
+        self.nodes_by_ply[ply] += 1
+        self.nodes_generated += 1
+
+    def count_expansion(self, game: ConnectFour) -> None:
+        """Count game as a game state whose children are searched.
+
+        Preconditions:
+            - len(game.bitboard.moves) >= self.root_num_moves
+        """
+        ply = len(game.bitboard.moves) - self.root_num_moves
+        while len(self.expanded_by_ply) <= ply:
+            self.expanded_by_ply.append(0)
+        self.expanded_by_ply[ply] += 1
+
+    def evaluate(self, evaluate: Callable[[ConnectFour, int, bool], int], game: ConnectFour, player: int,
+                 is_moving_next: bool) -> int:
+        """Return evaluate(game, player, is_moving_next), counting game as an evaluated leaf and adding the time
+        it took to the evaluation time.
+
+        >>> stats = SearchStats()
+        >>> stats.evaluate(lambda game, player, is_moving_next: 42, ConnectFour(), 0, True)
+        42
+        >>> stats.leaves_evaluated
+        1
+        """
+        start = time.perf_counter()
+        score = evaluate(game, player, is_moving_next)
+        self.evaluation_seconds += time.perf_counter() - start
+        self.leaves_evaluated += 1
+        return score
+
+    def get_branching_factors(self) -> list[float]:
+        """Return the average number of children searched for the game states expanded at each ply, from the
+        root to the last ply with an expanded game state, or 0.0 for a ply with no expanded game state (like
+        ply 0 when a GreedyPlayer only updates the subtree of the column it has chosen).
+
+        >>> stats = SearchStats()
+        >>> stats.nodes_by_ply, stats.expanded_by_ply = [1, 7, 20], [1, 5]
+        >>> stats.get_branching_factors()
+        [7.0, 4.0]
+        """
+        return [self.nodes_by_ply[ply + 1] / expanded if expanded > 0 else 0.0
+                for ply, expanded in enumerate(self.expanded_by_ply) if ply + 1 < len(self.nodes_by_ply)]
+
+    def get_move_generation_seconds(self) -> float:
+        """Return the time of the search not spent in the evaluation function: generating and making moves,
+        building game trees and everything else."""
+        return max(self.total_seconds - self.evaluation_seconds, 0.0)
+
+    def add(self, other: SearchStats) -> None:
+        """Add the counters of other to the counters of self, ply by ply."""
+        self.nodes_generated += other.nodes_generated
+        self.leaves_evaluated += other.leaves_evaluated
+        self.terminal_hits += other.terminal_hits
+        self.cache_hits += other.cache_hits
+        self.evaluation_seconds += other.evaluation_seconds
+        self.total_seconds += other.total_seconds
+        for counts, other_counts in ((self.nodes_by_ply, other.nodes_by_ply),
+                                     (self.expanded_by_ply, other.expanded_by_ply)):
+            counts.extend([0] * (len(other_counts) - len(counts)))
+            for ply, count in enumerate(other_counts):
+                counts[ply] += count
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the counters of self as a dictionary that can be written as JSON."""
+        return {'root_num_moves': self.root_num_moves, 'nodes_generated': self.nodes_generated,
+                'leaves_evaluated': self.leaves_evaluated, 'terminal_hits': self.terminal_hits,
+                'cache_hits': self.cache_hits, 'nodes_by_ply': self.nodes_by_ply,
+                'branching_factors': self.get_branching_factors(), 'evaluation_seconds': self.evaluation_seconds,
+                'move_generation_seconds': self.get_move_generation_seconds(), 'total_seconds': self.total_seconds}
+
+    def __str__(self) -> str:
+        """Return a report of the counters of self.
+
+        >>> stats = SearchStats()
+        >>> stats.nodes_generated, stats.leaves_evaluated, stats.terminal_hits = 28, 20, 1
+        >>> stats.nodes_by_ply, stats.expanded_by_ply = [1, 7, 20], [1, 5]
+        >>> stats.total_seconds, stats.evaluation_seconds = 0.25, 0.1
+        >>> print(stats)
+        28 nodes, 20 leaves evaluated, 1 terminal hits, 0 cache hits
+        0.250 s: 0.100 s evaluating, 0.150 s generating moves
+        branching factor by ply: 7.00 4.00
+        """
+        branching_factors = ' '.join(f'{factor:.2f}' for factor in self.get_branching_factors())
+        return (f'{self.nodes_generated} nodes, {self.leaves_evaluated} leaves evaluated, '
+                f'{self.terminal_hits} terminal hits, {self.cache_hits} cache hits\n'
+                f'{self.total_seconds:.3f} s: {self.evaluation_seconds:.3f} s evaluating, '
+                f'{self.get_move_generation_seconds():.3f} s generating moves\n'
+                f'branching factor by ply: {branching_factors}')
+
+
+class SearchInstrumentation:
+    """The instrumentation of the moves chosen by a player, keeping the SearchStats of every move.
+
+    Instance Attributes:
+        - moves: The SearchStats of every move measured so far, in order.
+        - profile_dir: The directory where the cProfile statistics of every move are written, or None if the
+        moves are not profiled.
+        - trace_path: The JSON lines file the stats of every move are appended to, or None if there is none.
+    """
+    moves: list[SearchStats]
+    profile_dir: Optional[str]
+    trace_path: Optional[str]
+
+    def __init__(self, profile_dir: Optional[str] = None, trace_path: Optional[str] = None) -> None:
+        """Initialize the instrumentation with no measured moves.
+
+        If profile_dir is not None, every move is profiled with cProfile (which makes it several times slower),
+        and its statistics are written to the file move_<n>.prof of profile_dir, where n counts the measured
+        moves from 1. If trace_path is not None, the stats of every move are appended to that file as one line
+        of JSON.
+        """
+        self.moves = []
+        self.profile_dir = profile_dir
+        self.trace_path = trace_path
+
+    def measure_move(self, game: ConnectFour, choose_column: Callable[[SearchStats], int]) -> int:
+        """Return choose_column(stats), where stats is a new SearchStats for the search of the next move of game,
+        which is then timed, profiled and traced, and added to self.moves.
+
+        >>> instrumentation = SearchInstrumentation()
+        >>> instrumentation.measure_move(ConnectFour(), lambda stats: 3)
+        3
+        >>> len(instrumentation.moves)
+        1
+        """
+        stats = SearchStats(len(game.bitboard.moves))
+        profile_dir = self.profile_dir
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        if profile_dir is not None:
+            profiler.enable()
+        try:
+            column = choose_column(stats)
+        finally:
+            if profile_dir is not None:
+                profiler.disable()
+            stats.total_seconds = time.perf_counter() - start
+        self.moves.append(stats)
+
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, f'move_{len(self.moves)}.prof'))
+        if self.trace_path is not None:
+            with open(self.trace_path, 'a') as file:
+                file.write(json.dumps({'move': len(self.moves), 'column': column, **stats.to_dict()}) + '\n')
+        return column
+
+    def get_total(self) -> SearchStats:
+        """Return the sum of the stats of all the measured moves."""
+        total = SearchStats()
+        for stats in self.moves:
+            total.add(stats)
+        return total
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['__future__', 'typing', 'cProfile', 'json', 'os', 'time', 'connect_four'],
+        'allowed-io': ['SearchInstrumentation.measure_move'],
+        # A SearchStats is a record with one attribute per counter
+        'disable': ['too-many-instance-attributes']
+    })
@@ -21,17 +21,40 @@ This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Jo
 """
 from __future__ import annotations
 from typing import Optional
+import functools
 import pygame
 from pygame import gfxdraw
 from constant import UNOCCUPIED, PLAYER_ONE, PLAYER_TWO, HINT, \
     GRID_WIDTH, GRID_HEIGHT, SQUARESIZE, RADIUS, BORDER_RADIUS, \
-    BUTTON_WIDTH, BUTTON_HEIGHT, FONT_BUTTON,\
+    BUTTON_WIDTH, BUTTON_HEIGHT, FONT_WORDS_SIZE, FONT_WIN_STATUS_SIZE, FONT_SIZE, \
     RED, DARK_RED, YELLOW, DARK_YELLOW, BLUE, DARK_BLUE, WHITE, GREY, DARK_GREY
 
 # We did not import WINDOW_WIDTH, WINDOW_HEIGHT from constant because python-ta detected it as unused-import
 # But we used WINDOW_WIDTH, WINDOW_HEIGHT in docstrings as a part of Preconditions.
 # So, if you want to @check_contract, you may need to import these two constants.
 
+# The fonts of the interface, as (font family, font size), where a family of None is pygame's default font.
+# A font can only be created after pygame has been initialized, so they are created by get_font the first time
+# they are used instead of when a module is imported.
+FONT_WORDS, FONT_WIN_STATUS, FONT_BUTTON = 'words', 'win status', 'button'
+FONT_SPECS = {FONT_WORDS: ('Courier', FONT_WORDS_SIZE),
+              FONT_WIN_STATUS: ('Courier', FONT_WIN_STATUS_SIZE),
+              FONT_BUTTON: (None, FONT_SIZE)}
+
+
+@functools.lru_cache
+def get_font(font_name: str) -> pygame.font.Font:
+    """Return the font of the interface called font_name, creating it the first time it is used.
+
+    Preconditions:
+        - font_name in FONT_SPECS
+    """
+    pygame.font.init()
+    family, size = FONT_SPECS[font_name]
+    if family is None:
+        return pygame.font.Font(None, size)
+    return pygame.font.SysFont(family, size)
+
 
 class Button:
     """A class represents a circle buttons.
@@ -91,7 +114,7 @@ class Button:
                           filled_color, int(BORDER_RADIUS * 0.8))
 
         # draw word
-        text = FONT_BUTTON.render(self.word, True, WHITE)
+        text = get_font(FONT_BUTTON).render(self.word, True, WHITE)
         w, h = text.get_size()
         text_x, text_y = int(self.center[0] - w / 2), int(self.center[1] - h / 2)
         surface.blit(text, (text_x, text_y))
@@ -371,5 +394,5 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 120,
         'max-nested-blocks': 4,
-        'extra-imports': ['__future__', 'typing', 'pygame', 'constant'],
+        'extra-imports': ['__future__', 'typing', 'functools', 'pygame', 'constant'],
     })
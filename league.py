@@ -0,0 +1,451 @@
+"""CSC111 Winter 2023 Project: Connect 4 (League)
+
+Module Description
+==================
+
+This module contains a round-robin league between a roster of AI players given by player specs (see
+tournament.parse_player_spec), which computes Elo ratings with error bars from the results.
+
+Every pair of players of the roster plays the same number of games, on a pool of worker processes. The games
+are scheduled so that every pair has played about as many games as the others at any point, and each finished
+game is appended to a checkpoint file right away, so an interrupted league resumes where it stopped when it is
+run again with the same checkpoint file. Players can also be added to the roster, or games to every pair,
+before resuming, and only the missing games are played.
+
+The ratings are the maximum likelihood Elo ratings of the players relative to the first player of the roster,
+with one virtual draw added to every pair so that a player winning every game gets a finite rating. If the
+roster is listed from the cheapest player to the most expensive, get_cheapest_player picks the cheapest player
+meeting a target rating. A league can also be run from the command line, for example:
+
+    python league.py random scoring greedy:depth=2 greedy:depth=4 --games 20 --checkpoint league.jsonl
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import math
+import os
+import zlib
+import numpy as np
+from tournament import GameRecord, MatchResult, play_match_game, parse_player_spec, WIN_SCORE, LOSS_SCORE, \
+    DEFAULT_Z
+
+# The number of virtual draws added to every pair of players who played each other when computing ratings.
+PRIOR_DRAWS = 1
+
+# The number of Elo rating points by which a player is expected to score 10 times more than another.
+ELO_SCALE = 400
+
+
+def compute_elo_ratings(scores: list[list[float]], games: list[list[int]], z: float = DEFAULT_Z,
+                        prior_draws: int = PRIOR_DRAWS) -> list[tuple[float, float]]:
+    """Return the Elo rating of each player and the margin of error of that rating with z-score z, given the
+    total score scores[i][j] of player i against player j over their games[i][j] games, counting a draw as
+    half a win.
+
+    The ratings maximize the likelihood of the scores (with prior_draws virtual draws added to every pair of
+    players who played each other), where player i is expected to score 1 / (1 + 10 ** ((r_j - r_i) / 400))
+    against player j. They are relative to player 0, whose rating is 0 with no margin of error.
+
+    Preconditions:
+        - len(scores) == len(games) and all(len(row) == len(games) for row in scores + games)
+        - all(games[i][j] == games[j][i] for i in range(len(games)) for j in range(len(games)))
+        - all(scores[i][j] + scores[j][i] == games[i][j] for i in range(len(games)) for j in range(len(games)))
+        - every player played, directly or through other players, against player 0
+
+    >>> ratings = compute_elo_ratings([[0, 2.5], [7.5, 0]], [[0, 10], [10, 0]])
+    >>> [(round(rating), round(margin)) for rating, margin in ratings]
+    [(0, 0), (170, 231)]
+    """
+    n = len(games)
+    totals = [[games[i][j] + prior_draws if games[i][j] > 0 else 0 for j in range(n)] for i in range(n)]
+    wins = [sum(scores[i][j] + prior_draws / 2 for j in range(n) if games[i][j] > 0) for i in range(n)]
+    ratings = [ELO_SCALE * math.log10(strength) for strength in _compute_strengths(wins, totals)]
+    variances = _compute_rating_variances(ratings, totals)
+    return [(rating, z * math.sqrt(variance)) for rating, variance in zip(ratings, variances)]
+
+
+def _compute_strengths(wins: list[float], totals: list[list[int]]) -> list[float]:
+    """Return the strength 10 ** (rating / 400) of each player, given the total score wins[i] of player i
+    over all their games and the number of games totals[i][j] between players i and j.
+
+    The strengths are found by the minorization-maximization algorithm for the Bradley-Terry model, keeping
+    the strength of player 0 at 1.
+
+    >>> [round(strength, 2) for strength in _compute_strengths([3.0, 9.0], [[0, 12], [12, 0]])]
+    [1.0, 3.0]
+    """
+    n = len(wins)
+    strengths = [1.0] * n
+    for _ in range(10000):
+        new_strengths = [wins[i] / sum(totals[i][j] / (strengths[i] + strengths[j]) for j in range(n))
+                         if wins[i] > 0 else strengths[i] for i in range(n)]
+        new_strengths = [strength / new_strengths[0] for strength in new_strengths]
+        change = max(abs(new - old) / old for new, old in zip(new_strengths, strengths))
+        strengths = new_strengths
+        if change < 1e-12:
+            break
+    return strengths
+
+
+def _compute_rating_variances(ratings: list[float], totals: list[list[int]]) -> list[float]:
+    """Return the variance of each rating of ratings, given the number of games totals[i][j] between players
+    i and j.
+
+    The variances come from the inverse of the Fisher information of the ratings other than the rating of
+    player 0, which is fixed.
+    """
+    n = len(ratings)
+    k = math.log(10) / ELO_SCALE
+    information = np.zeros((n, n))
+    for i in range(n):
+        for j in range(n):
+            if i != j and totals[i][j] > 0:
+                expected = 1 / (1 + 10 ** ((ratings[j] - ratings[i]) / ELO_SCALE))
+                weight = totals[i][j] * expected * (1 - expected) * k * k
+                information[i, i] += weight
+                information[i, j] -= weight
+    return [0.0] + list(np.diag(np.linalg.inv(information[1:, 1:]))) if n > 1 else [0.0]
+
+
+class League:
+    """A round-robin league between the players of a roster.
+
+    Instance Attributes:
+        - roster: The player specs of the players of the league.
+        - games_per_pair: The number of games every pair of players plays.
+        - seed: The seed the games of the league are played from.
+        - random_opening_moves: The number of random moves every game starts from.
+        - checkpoint_path: The path of the file every finished game is appended to, or None.
+        - results: The results of every pair of players (i, j) with i < j, from the point of view of player i.
+
+    Private Instance Attributes:
+        - _finished: The indices of the finished games of every pair of players in results.
+
+    Representation Invariants:
+        - len(set(self.roster)) == len(self.roster)
+        - self.games_per_pair >= 0
+        - self.random_opening_moves >= 0
+        - all(self.results[pair].get_num_games() == len(self._finished[pair]) for pair in self.results)
+    """
+    roster: list[str]
+    games_per_pair: int
+    seed: int
+    random_opening_moves: int
+    checkpoint_path: Optional[str]
+    results: dict[tuple[int, int], MatchResult]
+    _finished: dict[tuple[int, int], set[int]]
+
+    def __init__(self, roster: list[str], games_per_pair: int, seed: int = 0, random_opening_moves: int = 0,
+                 checkpoint_path: Optional[str] = None) -> None:
+        """Initialize a league between the players given by roster, where every pair plays games_per_pair
+        games, from seed and random_opening_moves random moves (see tournament.play_game).
+
+        If checkpoint_path is the path of an existing checkpoint file, the games recorded in it between players
+        of the roster are loaded as finished games. The games of players no longer in the roster, and the games
+        beyond games_per_pair, are ignored, but kept in the file.
+
+        Raise a ValueError if a player spec of roster is not valid, or if the checkpoint file was written by a
+        league with another seed or number of random opening moves.
+
+        Preconditions:
+            - len(set(roster)) == len(roster)
+            - games_per_pair >= 0
+            - random_opening_moves >= 0
+        """
+        for spec in roster:
+            parse_player_spec(spec)
+
+        self.roster = list(roster)
+        self.games_per_pair = games_per_pair
+        self.seed = seed
+        self.random_opening_moves = random_opening_moves
+        self.checkpoint_path = checkpoint_path
+        self.results = {}
+        self._finished = {}
+        for i in range(len(roster)):
+            for j in range(i + 1, len(roster)):
+                self.results[(i, j)] = MatchResult(roster[i], roster[j])
+                self._finished[(i, j)] = set()
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self._load_checkpoint(checkpoint_path)
+
+    def _load_checkpoint(self, path: str) -> None:
+        """Load the finished games of the checkpoint file at path.
+
+        A last line cut short (without its newline), by an interruption while it was written, is removed from
+        the file, so that the games appended when the league is resumed start on a line of their own. Its game
+        is played again.
+
+        >>> import tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'league.jsonl')
+        >>> League(['random', 'scoring'], 2, seed=111, checkpoint_path=path).run(num_workers=1)
+        >>> with open(path, 'a') as file:
+        ...     _ = file.write('{"a": "random", "b": "sco')
+        >>> league = League(['random', 'scoring'], 3, seed=111, checkpoint_path=path)
+        >>> league.run(num_workers=1)
+        >>> with open(path, 'a') as file:
+        ...     _ = file.write('{"a": "ran')
+        >>> league = League(['random', 'scoring'], 4, seed=111, checkpoint_path=path)
+        >>> league.get_remaining_games()
+        [(0, 1, 3)]
+        """
+        indices = {spec: i for i, spec in enumerate(self.roster)}
+        with open(path, 'r') as file:
+            lines = file.read().splitlines(keepends=True)
+
+        if lines and not lines[-1].endswith('\n'):
+            lines.pop()
+            with open(path, 'r+') as file:
+                file.truncate(len(''.join(lines)))
+
+        for line_number, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f'invalid checkpoint file {path!r}: line {line_number + 1} is '
+                                 f'not valid') from None
+
+            if line_number == 0:
+                if entry != self._get_checkpoint_header():
+                    raise ValueError(f'the checkpoint file {path!r} was written by a league with '
+                                     f'other settings: {entry}')
+            elif entry['a'] in indices and entry['b'] in indices:
+                record = GameRecord(entry['index'], entry['a_first'], entry['score'], entry['moves'])
+                self._add_game(indices[entry['a']], indices[entry['b']], record)
+
+    def _get_checkpoint_header(self) -> dict[str, int]:
+        """Return the first entry of a checkpoint file of this league, with the settings that must be the same
+        when it is resumed."""
+        return {'seed': self.seed, 'random_opening_moves': self.random_opening_moves}
+
+    def _add_game(self, a: int, b: int, record: GameRecord) -> None:
+        """Add the finished game of record, between players a and b of the roster from the point of view of
+        player a, to the results, unless it is beyond games_per_pair or already added.
+
+        Preconditions:
+            - 0 <= a < len(self.roster) and 0 <= b < len(self.roster) and a != b
+        """
+        if a > b:
+            a, b = b, a
+            record = GameRecord(record.index, not record.a_first, WIN_SCORE + LOSS_SCORE - record.score,
+                                record.moves)
+        if record.index < self.games_per_pair and record.index not in self._finished[(a, b)]:
+            self._finished[(a, b)].add(record.index)
+            self.results[(a, b)].add_game(record)
+
+    def get_remaining_games(self) -> list[tuple[int, int, int]]:
+        """Return the pair of players (a, b) and the index of every game that is not finished yet, as
+        (a, b, index), in the order they are played: the first game of every pair, then the second, and so on.
+
+        >>> League(['random', 'scoring', 'greedy:depth=2'], 2).get_remaining_games()
+        [(0, 1, 0), (0, 2, 0), (1, 2, 0), (0, 1, 1), (0, 2, 1), (1, 2, 1)]
+        """
+        return [(a, b, index) for index in range(self.games_per_pair) for a, b in self.results
+                if index not in self._finished[(a, b)]]
+
+    def _get_pair_seed(self, a: int, b: int) -> int:
+        """Return the seed of the match between players a and b of the roster, which only depends on self.seed
+        and their player specs, so it stays the same when the roster changes."""
+        return self.seed * (1 << 32) + zlib.crc32(f'{self.roster[a]} {self.roster[b]}'.encode())
+
+    def run(self, num_workers: Optional[int] = None,
+            on_game_finished: Optional[Callable[[str, str, GameRecord], None]] = None) -> None:
+        """Play the remaining games of the league on num_workers worker processes, or one per core if
+        num_workers is None, appending each game to the checkpoint file as soon as it is finished.
+
+        If on_game_finished is not None, it is called with the player specs of players A and B and the record
+        of each game as soon as that game is finished. With one worker, the games are played in this process.
+
+        Preconditions:
+            - num_workers is None or num_workers >= 1
+
+        >>> league = League(['random', 'scoring'], 4, seed=111)
+        >>> league.run(num_workers=1)
+        >>> league.results[(0, 1)].losses
+        3
+        """
+        remaining = self.get_remaining_games()
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        checkpoint_file = None
+        if self.checkpoint_path is not None:
+            is_new = not os.path.exists(self.checkpoint_path) or os.path.getsize(self.checkpoint_path) == 0
+            checkpoint_file = open(self.checkpoint_path, 'a')
+            if is_new:
+                checkpoint_file.write(json.dumps(self._get_checkpoint_header()) + '\n')
+
+        executor = ProcessPoolExecutor(num_workers) if num_workers > 1 and remaining else None
+        try:
+            if executor is None:
+                finished = ((x, y, play_match_game(self.roster[x], self.roster[y], index, self._get_pair_seed(x, y),
+                                                   self.random_opening_moves)) for x, y, index in remaining)
+            else:
+                pairs = {executor.submit(play_match_game, self.roster[x], self.roster[y], index,
+                                         self._get_pair_seed(x, y), self.random_opening_moves): (x, y)
+                         for x, y, index in remaining}
+                finished = (pairs[future] + (future.result(),) for future in as_completed(pairs))
+
+            for a, b, record in finished:
+                self._add_game(a, b, record)
+                if checkpoint_file is not None:
+                    checkpoint_file.write(json.dumps({'a': self.roster[a], 'b': self.roster[b], 'index': record.index,
+                                                      'a_first': record.a_first, 'score': record.score,
+                                                      'moves': record.moves}) + '\n')
+                    checkpoint_file.flush()
+                if on_game_finished is not None:
+                    on_game_finished(self.roster[a], self.roster[b], record)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if checkpoint_file is not None:
+                checkpoint_file.close()
+
+    def get_ratings(self, z: float = DEFAULT_Z) -> list[tuple[float, float]]:
+        """Return the Elo rating of every player of the roster relative to the first one, and the margin of
+        error of that rating with z-score z (see compute_elo_ratings).
+
+        Preconditions:
+            - every pair of players played at least one game
+
+        >>> league = League(['random', 'scoring'], 4, seed=111)
+        >>> league.run(num_workers=1)
+        >>> [round(rating) for rating, _ in league.get_ratings()]
+        [0, 147]
+        """
+        n = len(self.roster)
+        scores = [[0.0] * n for _ in range(n)]
+        games = [[0] * n for _ in range(n)]
+        for (a, b), result in self.results.items():
+            games[a][b] = games[b][a] = result.get_num_games()
+            scores[a][b] = result.wins + result.draws / 2
+            scores[b][a] = result.losses + result.draws / 2
+        return compute_elo_ratings(scores, games, z)
+
+    def get_cheapest_player(self, target_rating: float, z: float = DEFAULT_Z) -> Optional[str]:
+        """Return the first player spec of the roster whose rating is at least target_rating with the confidence
+        of z-score z (that is, whose rating minus its margin of error is at least target_rating), or None if
+        there is none. This is the cheapest such player if the roster is listed from the cheapest player to the
+        most expensive.
+
+        Preconditions:
+            - every pair of players played at least one game
+        """
+        for spec, (rating, margin) in zip(self.roster, self.get_ratings(z)):
+            if rating - margin >= target_rating:
+                return spec
+        return None
+
+    def __str__(self) -> str:
+        """Return the standings of the league, with the Elo ratings and their 95% margins of error.
+
+        Preconditions:
+            - every pair of players played at least one game
+
+        >>> league = League(['random', 'scoring'], 4, seed=111)
+        >>> league.run(num_workers=1)
+        >>> print(league)
+        Rank  Player                     Games   Score    Elo
+        1     scoring                        4   75.0%   +147 +/- 332
+        2     random                         4   25.0%     +0 +/- 0
+        """
+        ratings = self.get_ratings()
+        num_games = [0] * len(self.roster)
+        scores = [0.0] * len(self.roster)
+        for (a, b), result in self.results.items():
+            num_games[a] += result.get_num_games()
+            num_games[b] += result.get_num_games()
+            scores[a] += result.wins + result.draws / 2
+            scores[b] += result.losses + result.draws / 2
+
+        lines = [f'{"Rank":<6}{"Player":<25}{"Games":>7}{"Score":>8}{"Elo":>7}']
+        order = sorted(range(len(self.roster)), key=lambda player: ratings[player][0], reverse=True)
+        for rank, i in enumerate(order, 1):
+            score = scores[i] / num_games[i] if num_games[i] > 0 else 0.0
+            rating, margin = ratings[i]
+            lines.append(f'{rank:<6}{self.roster[i]:<25}{num_games[i]:>7}{score:>8.1%}{rating:>+7.0f} +/- {margin:.0f}')
+        return '\n'.join(lines)
+
+
+def main(args: Optional[list[str]] = None) -> League:
+    """Run a league given by the command line arguments args (or sys.argv if args is None), print the result
+    of each game as it is finished unless --quiet is given, print the standings, and return the league.
+    """
+    parser = argparse.ArgumentParser(description='Play a round-robin league between AI players on several '
+                                                 'processes and rate them by Elo.',
+                                     epilog='Players are given by player specs, as for tournament.py. List them '
+                                            'from the cheapest to the most expensive to use --target.')
+    parser.add_argument('roster', nargs='+', help='the player specs of the players')
+    parser.add_argument('-n', '--games', type=int, default=20,
+                        help='the number of games every pair of players plays (default: 20)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='the number of worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the league (default: 0)')
+    parser.add_argument('--random-opening-moves', type=int, default=0,
+                        help='the number of random moves each game starts from (default: 0)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='the file finished games are appended to, and loaded from to resume the league')
+    parser.add_argument('--target', type=float, default=None,
+                        help='print the cheapest player rated at least this much above the first one')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only print the standings')
+    options = parser.parse_args(args)
+
+    if len(set(options.roster)) != len(options.roster) or len(options.roster) < 2:
+        parser.error('the roster must have at least two players, all different')
+    if options.games < 1 or (options.workers is not None and options.workers < 1) \
+            or options.random_opening_moves < 0:
+        parser.error('there must be at least one game and one worker, and the number of random opening moves must '
+                     'not be negative')
+    try:
+        league = League(options.roster, options.games, options.seed, options.random_opening_moves,
+                        options.checkpoint)
+    except ValueError as error:
+        parser.error(str(error))
+
+    def print_game(spec_a: str, spec_b: str, record: GameRecord) -> None:
+        """Print the result of the game of record between spec_a and spec_b."""
+        print(f'{spec_a} vs {spec_b}, {record}')
+
+    num_remaining = len(league.get_remaining_games())
+    print(f'{num_remaining} games to play, '
+          f'{len(league.results) * options.games - num_remaining} already finished.')
+    league.run(options.workers, None if options.quiet else print_game)
+    print(league)
+
+    if options.target is not None:
+        cheapest = league.get_cheapest_player(options.target)
+        if cheapest is None:
+            print(f'No player is rated at least {options.target:+.0f} with 95% confidence.')
+        else:
+            print(f'The cheapest player rated at least {options.target:+.0f} with 95% confidence is {cheapest}.')
+    return league
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['typing', 'concurrent.futures', 'argparse', 'json', 'math', 'os', 'zlib', 'numpy',
+                          'tournament'],
+        'allowed-io': ['League._load_checkpoint', 'League.run', 'main'],
+        # The checkpoint file stays open while the games of League.run are played, and is closed in its
+        # finally clause
+        'disable': ['consider-using-with']
+    })
+
+    main()
@@ -57,9 +57,12 @@ if __name__ == '__main__':
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                game_runner.close()
                 sys.exit()
             game_runner.handle_event(event, screen)
 
+        # The AI thinks on a background thread, so the window keeps being drawn at 50 frames per second.
+        game_runner.update()
         game_runner.draw(screen)
         pygame.display.update()
         clock.tick(50)
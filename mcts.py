@@ -0,0 +1,422 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Monte Carlo Tree Search)
+
+Module Description
+==================
+
+This module contains a MonteCarloTreeSearch class, a search engine that chooses columns by playing many
+games to the end at random (playouts) instead of scoring game states with an evaluation function.
+
+Each iteration of the search walks down its tree from the root, choosing at each node the child with the
+best UCT value: its average result plus an exploration bonus that grows for children visited less often
+(UCB1 applied to trees). When it reaches a node with a column not tried yet, it adds a child for that column,
+plays a game to the end from there, and adds the result (1 for a win, 0.5 for a draw and 0 for a loss) to
+every node on the way back up, each from the point of view of the player who moved into it. The most visited
+column of the root is the best one.
+
+Playouts are played on the two integer masks of a game state, like the Solver does, so that a random game
+only takes a few bitwise operations per move. Lightly guided playouts play a winning move whenever there is
+one, and otherwise block the opponent's winning move if there is one, which makes their results much closer
+to the real value of a game state than purely random moves.
+
+The tree is kept between searches. When the next search is for a game state further down the same game, its
+subtree becomes the new root, so the playouts already made below it are reused.
+
+RootParallelMCTS runs a separate MonteCarloTreeSearch on each of several processes (root parallelization),
+and adds up the visits and results of the columns of their roots.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+import math
+import os
+import random
+import time
+from connect_four import ConnectFour, create_game_from_moves
+from bitboard import NUM_CELLS, BOTTOM_MASK, BOARD_MASK, column_mask, cell_bit
+from solver import compute_winning_cells, get_position
+from constant import GRID_WIDTH, GRID_HEIGHT
+
+# The weight of the exploration bonus in the UCT value, about sqrt(2) for results between 0 and 1.
+DEFAULT_EXPLORATION = 1.4
+
+# The results of a playout for the player it is counted for.
+WIN_RESULT, DRAW_RESULT, LOSS_RESULT = 1.0, 0.5, 0.0
+
+# column_mask(x) and the bit of the top cell of column x, for every column x.
+_COLUMN_MASKS = tuple(column_mask(x) for x in range(GRID_WIDTH))
+_TOP_CELLS = tuple(cell_bit(x, GRID_HEIGHT - 1) for x in range(GRID_WIDTH))
+
+
+class _Node:
+    """A node of the tree of a MonteCarloTreeSearch, for the game state after a move.
+
+    Instance Attributes:
+        - column: The column of the move leading to this node, or -1 for a root.
+        - visits: The number of iterations that went through this node.
+        - total_result: The sum of the results of those iterations for the player who made the move leading
+        to this node.
+        - children: The nodes of the columns tried so far.
+        - untried_columns: The possible columns without a child yet.
+        - final_result: The result of the game for the player who made the move leading to this node if
+        that move ended the game, or None otherwise.
+
+    Representation Invariants:
+        - 0 <= self.total_result <= self.visits
+        - self.final_result is None or (self.children == [] and self.untried_columns == [])
+    """
+    __slots__: tuple[str, ...] = ('column', 'visits', 'total_result', 'children', 'untried_columns', 'final_result')
+    column: int
+    visits: int
+    total_result: float
+    children: list[_Node]
+    untried_columns: list[int]
+    final_result: Optional[float]
+
+    def __init__(self, column: int, untried_columns: list[int], final_result: Optional[float] = None) -> None:
+        """Initialize an unvisited node."""
+        self.column = column
+        self.visits = 0
+        self.total_result = 0.0
+        self.children = []
+        self.untried_columns = untried_columns
+        self.final_result = final_result
+
+
+class MonteCarloTreeSearch:
+    """A Monte Carlo tree search engine using UCT, which keeps its tree between searches.
+
+    Instance Attributes:
+        - exploration: The weight of the exploration bonus in the UCT value.
+        - guided_playouts: Whether playouts win and block immediate wins instead of playing only at random.
+        - playouts: The number of playouts (iterations) of the last call to search.
+
+    Private Instance Attributes:
+        - _random: The random number generator of the playouts and expansions.
+        - _root: The root of the tree, or None if nothing was searched yet.
+        - _root_moves: The columns played to reach the game state of _root, as given by
+        ConnectFour.get_move_string.
+
+    Representation Invariants:
+        - self.exploration >= 0
+
+    >>> engine = MonteCarloTreeSearch(seed=111)
+    >>> game = create_game_from_moves('060606')
+    >>> statistics = engine.search(game, max_iterations=500)
+    >>> max(statistics, key=lambda column: statistics[column][0])
+    0
+    """
+    exploration: float
+    guided_playouts: bool
+    playouts: int
+    _random: random.Random
+    _root: Optional[_Node]
+    _root_moves: str
+
+    def __init__(self, exploration: float = DEFAULT_EXPLORATION, guided_playouts: bool = True,
+                 seed: Optional[int] = None) -> None:
+        """Initialize a search engine with an empty tree.
+
+        If seed is not None, the random choices are made by a generator seeded with seed, so the searches
+        are repeatable when they are not limited by time.
+
+        Preconditions:
+            - exploration >= 0
+        """
+        self.exploration = exploration
+        self.guided_playouts = guided_playouts
+        self.playouts = 0
+        self._random = random.Random(seed)
+        self._root = None
+        self._root_moves = ''
+
+    def search(self, game: ConnectFour, max_iterations: Optional[int] = None,
+               time_limit_ms: Optional[int] = None) -> dict[int, tuple[int, float]]:
+        """Run iterations from game until max_iterations iterations were run or time_limit_ms milliseconds
+        have passed, whichever comes first, and return a mapping from each column tried at the root to a
+        tuple (visits, total_result), where total_result is the sum of the results of its visits for the
+        player moving next in game.
+
+        At least one iteration is always run. The iterations run by earlier searches below game are kept.
+
+        Preconditions:
+            - game.get_winner() is None
+            - max_iterations is not None or time_limit_ms is not None
+            - max_iterations is None or max_iterations >= 1
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        root = self._move_root(game)
+        current, occupied, num_moves = get_position(game)
+        deadline = None if time_limit_ms is None else time.perf_counter() + time_limit_ms / 1000
+
+        self.playouts = 0
+        while True:
+            self._run_iteration(root, current, occupied, num_moves)
+            self.playouts += 1
+            if (max_iterations is not None and self.playouts >= max_iterations) \
+                    or (deadline is not None and time.perf_counter() >= deadline):
+                break
+
+        return {child.column: (child.visits, child.total_result) for child in root.children}
+
+    def _move_root(self, game: ConnectFour) -> _Node:
+        """Make the node of game the root of the tree, reusing the current tree if game is reached from its
+        root, and return it.
+        """
+        moves = game.get_move_string()
+        node = self._root
+        if node is not None and moves.startswith(self._root_moves):
+            for column in moves[len(self._root_moves):]:
+                node = next((child for child in node.children if child.column == int(column)), None)
+                if node is None:
+                    break
+        else:
+            node = None
+
+        if node is None:
+            # Copy the possible columns, since the list of untried columns is changed by the search.
+            node = _Node(-1, list(game.get_possible_columns()))
+        self._root, self._root_moves = node, moves
+        return node
+
+    def _run_iteration(self, root: _Node, current: int, occupied: int, num_moves: int) -> None:
+        """Walk down the tree from root (the node of the game state (current, occupied, num_moves), as
+        returned by get_position), add a child, run a playout from it and add its result to the nodes on
+        the way.
+        """
+        node = root
+        path = [root]
+        while node.final_result is None and not node.untried_columns:
+            node = self._select_child(node)
+            move = (occupied + BOTTOM_MASK) & _COLUMN_MASKS[node.column]
+            current, occupied = current ^ occupied, occupied | move
+            num_moves += 1
+            path.append(node)
+
+        if node.final_result is None:
+            # Expand a random untried column.
+            column = node.untried_columns.pop(self._random.randrange(len(node.untried_columns)))
+            move = (occupied + BOTTOM_MASK) & _COLUMN_MASKS[column]
+            if move & compute_winning_cells(current, occupied):
+                child = _Node(column, [], WIN_RESULT)
+            elif num_moves + 1 == NUM_CELLS:
+                child = _Node(column, [], DRAW_RESULT)
+            else:
+                current, occupied = current ^ occupied, occupied | move
+                child = _Node(column, [x for x in range(GRID_WIDTH) if not occupied & _TOP_CELLS[x]])
+            node.children.append(child)
+            path.append(child)
+            node = child
+
+        if node.final_result is not None:
+            result = node.final_result
+        else:
+            # The playout gives the result for the player moving next, who did not make the move into node.
+            result = 1.0 - self._playout(current, occupied, num_moves + 1)
+
+        for node in reversed(path):
+            node.visits += 1
+            node.total_result += result
+            result = 1.0 - result
+
+    def _select_child(self, node: _Node) -> _Node:
+        """Return the child of node with the largest UCT value.
+
+        Preconditions:
+            - node.children != [] and node.untried_columns == []
+        """
+        log_visits = math.log(node.visits)
+        best_child, best_value = node.children[0], -1.0
+        for child in node.children:
+            value = child.total_result / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best_child, best_value = child, value
+        return best_child
+
+    def _playout(self, current: int, occupied: int, num_moves: int) -> float:
+        """Play random moves from the game state (current, occupied, num_moves) until the game is over, and
+        return the result for the player moving next in that game state.
+
+        Preconditions:
+            - (current, occupied, num_moves) is not finished
+        """
+        starter_moves_next = True
+        while num_moves < NUM_CELLS:
+            playable = (occupied + BOTTOM_MASK) & BOARD_MASK
+            winning_cells = compute_winning_cells(current, occupied) & playable
+            if self.guided_playouts:
+                if winning_cells:
+                    return WIN_RESULT if starter_moves_next else LOSS_RESULT
+                # Block the opponent's winning cells if there are any.
+                candidates = (compute_winning_cells(current ^ occupied, occupied) & playable) or playable
+            else:
+                candidates = playable
+
+            options = [candidates & mask for mask in _COLUMN_MASKS if candidates & mask]
+            move = options[self._random.randrange(len(options))]
+            if move & winning_cells:
+                return WIN_RESULT if starter_moves_next else LOSS_RESULT
+            current, occupied = current ^ occupied, occupied | move
+            num_moves += 1
+            starter_moves_next = not starter_moves_next
+        return DRAW_RESULT
+
+
+class _WorkerState:
+    """The state of a worker process of a RootParallelMCTS, which is set up by the initializer of its process
+    pool and used by every task the process runs.
+
+    Instance Attributes:
+        - search: The search engine of this process, or None if this process is not a worker process.
+    """
+    search: Optional[MonteCarloTreeSearch]
+
+    def __init__(self) -> None:
+        """Initialize the state of a process that is not a worker process yet."""
+        self.search = None
+
+    def get_search(self) -> MonteCarloTreeSearch:
+        """Return the search engine of this worker process.
+
+        Preconditions:
+            - self.search is not None
+        """
+        assert self.search is not None
+        return self.search
+
+
+# The state of this process, if it is a worker process. Each process has its own copy.
+_WORKER = _WorkerState()
+
+
+def _init_worker(exploration: float, guided_playouts: bool) -> None:
+    """Create the search engine of a new worker process of a RootParallelMCTS."""
+    # Each worker seeds its own generator from the operating system, so the workers play different playouts.
+    _WORKER.search = MonteCarloTreeSearch(exploration, guided_playouts)
+
+
+def _search_task(moves: str, max_iterations: Optional[int],
+                 deadline: Optional[float]) -> tuple[dict[int, tuple[int, float]], int]:
+    """Search the game state given by moves in a worker process until max_iterations iterations were run
+    or the time.time() value deadline has passed, and return a tuple (statistics, playouts) as given by
+    MonteCarloTreeSearch.search and its playouts attribute.
+
+    Preconditions:
+        - create_game_from_moves(moves).get_winner() is None
+        - max_iterations is not None or deadline is not None
+    """
+    time_limit_ms = None if deadline is None else max(int((deadline - time.time()) * 1000), 0)
+    search = _WORKER.get_search()
+    statistics = search.search(create_game_from_moves(moves), max_iterations, time_limit_ms)
+    return (statistics, search.playouts)
+
+
+class RootParallelMCTS:
+    """A Monte Carlo tree search engine that searches separate trees on several processes at once and adds
+    up the statistics of their roots.
+
+    It can be used instead of a MonteCarloTreeSearch by MCTSPlayer.
+
+    Instance Attributes:
+        - num_workers: The number of worker processes.
+        - exploration: The weight of the exploration bonus in the UCT value of every worker.
+        - guided_playouts: Whether the playouts of every worker are guided.
+        - playouts: The total number of playouts of all the workers for the last call to search.
+
+    Private Instance Attributes:
+        - _executor: The pool of worker processes, or None if it has not been started or has been closed.
+
+    Representation Invariants:
+        - self.num_workers >= 1
+    """
+    num_workers: int
+    exploration: float
+    guided_playouts: bool
+    playouts: int
+    _executor: Optional[ProcessPoolExecutor]
+
+    def __init__(self, num_workers: Optional[int] = None, exploration: float = DEFAULT_EXPLORATION,
+                 guided_playouts: bool = True) -> None:
+        """Initialize a root-parallel search engine with num_workers worker processes, or one per core if
+        num_workers is None.
+
+        The worker processes are only started by the first search, and they keep their trees between searches
+        until close is called.
+
+        Preconditions:
+            - num_workers is None or num_workers >= 1
+            - exploration >= 0
+        """
+        self.num_workers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+        self.exploration = exploration
+        self.guided_playouts = guided_playouts
+        self.playouts = 0
+        self._executor = None
+
+    def close(self) -> None:
+        """Stop the worker processes. They are started again by the next search."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def search(self, game: ConnectFour, max_iterations: Optional[int] = None,
+               time_limit_ms: Optional[int] = None) -> dict[int, tuple[int, float]]:
+        """Search game on every worker like MonteCarloTreeSearch.search, and return the sum of their
+        statistics.
+
+        max_iterations is the total number of iterations, shared equally between the workers, while every
+        worker searches for time_limit_ms milliseconds.
+
+        Preconditions:
+            - game.get_winner() is None
+            - max_iterations is not None or time_limit_ms is not None
+            - max_iterations is None or max_iterations >= 1
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.num_workers, initializer=_init_worker,
+                                                 initargs=(self.exploration, self.guided_playouts))
+
+        moves = game.get_move_string()
+        worker_iterations = None if max_iterations is None else max(max_iterations // self.num_workers, 1)
+        deadline = None if time_limit_ms is None else time.time() + time_limit_ms / 1000
+        futures = [self._executor.submit(_search_task, moves, worker_iterations, deadline)
+                   for _ in range(self.num_workers)]
+        return self._collect_statistics(futures)
+
+    def _collect_statistics(self, futures: list[Future]) -> dict[int, tuple[int, float]]:
+        """Wait for the tasks in futures and return the sum of their statistics, as described in search.
+
+        The playouts of all the tasks are counted in self.playouts.
+        """
+        totals = {}
+        self.playouts = 0
+        for future in futures:
+            statistics, playouts = future.result()
+            self.playouts += playouts
+            for column, (visits, total_result) in statistics.items():
+                old_visits, old_total_result = totals.get(column, (0, 0.0))
+                totals[column] = (old_visits + visits, old_total_result + total_result)
+        return totals
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'concurrent.futures', 'math', 'os', 'random', 'time',
+                          'connect_four', 'bitboard', 'solver', 'constant'],
+    })
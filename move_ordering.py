@@ -0,0 +1,156 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Move Ordering)
+
+Module Description
+==================
+
+This module contains a MoveOrdering class that decides in which order a search engine tries the
+possible columns of a game state.
+
+The order does not change the result of an alpha-beta search, but it changes how much of the game tree
+is pruned: if the best column is searched first, the other columns are usually cut off right away.
+The following heuristics can be turned on and off independently:
+
+    - Center first: try the columns from the center outwards, since discs in the center take part in
+      more possible four connected discs.
+    - Hash column first: try the best column stored in the transposition table by an earlier search.
+    - Killer columns: try the columns that recently caused a cutoff at the same number of moves
+      in another branch of the search.
+    - History: try the columns that caused the most cutoffs (weighted by depth) anywhere in the search.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from constant import GRID_WIDTH, GRID_HEIGHT
+
+# The columns from the center outwards, e.g. (3, 2, 4, 1, 5, 0, 6) for 7 columns.
+CENTER_ORDER = tuple(sorted(range(GRID_WIDTH), key=lambda x: (abs(2 * x - (GRID_WIDTH - 1)), x)))
+
+# The number of killer columns remembered for each number of moves.
+NUM_KILLERS = 2
+
+
+class MoveOrdering:
+    """A configurable order in which a search tries the possible columns.
+
+    Instance Attributes:
+        - center_first: Whether to try the columns from the center outwards.
+        - use_hash_column: Whether to try the column from the transposition table first.
+        - use_killers: Whether to try the killer columns early.
+        - use_history: Whether to sort the columns by their history score.
+
+    Private Instance Attributes:
+        - _killers: _killers[n] is a list of the columns that most recently caused a cutoff in a game
+        state with n discs, newest first.
+        - _history: _history[player][column] is the history score of column for player.
+
+    Representation Invariants:
+        - len(self._killers) == GRID_WIDTH * GRID_HEIGHT + 1
+        - all(len(killers) <= NUM_KILLERS for killers in self._killers)
+        - len(self._history) == 2 and all(len(scores) == GRID_WIDTH for scores in self._history)
+
+    >>> ordering = MoveOrdering()
+    >>> ordering.order([0, 1, 2, 3, 4, 5, 6], 0, 0, -1)
+    [3, 2, 4, 1, 5, 0, 6]
+    >>> ordering.record_cutoff(6, 0, 0, 2)
+    >>> ordering.order([0, 1, 2, 3, 4, 5, 6], 0, 0, 1)
+    [1, 6, 3, 2, 4, 5, 0]
+    """
+    center_first: bool
+    use_hash_column: bool
+    use_killers: bool
+    use_history: bool
+    _killers: list[list[int]]
+    _history: list[list[int]]
+
+    def __init__(self, center_first: bool = True, use_hash_column: bool = True, use_killers: bool = True,
+                 use_history: bool = True) -> None:
+        """Initialize a move ordering using the given heuristics."""
+        self.center_first = center_first
+        self.use_hash_column = use_hash_column
+        self.use_killers = use_killers
+        self.use_history = use_history
+        self._killers = [[] for _ in range(GRID_WIDTH * GRID_HEIGHT + 1)]
+        self._history = [[0] * GRID_WIDTH for _ in range(2)]
+
+    def new_search(self) -> None:
+        """Start a new search.
+
+        Killer columns only make sense within one search, so they are forgotten. History scores are halved
+        so that they keep some of what was learned while favouring the newer search.
+        """
+        for killers in self._killers:
+            killers.clear()
+        for scores in self._history:
+            for column in range(GRID_WIDTH):
+                scores[column] //= 2
+
+    def order(self, columns: list[int], num_moves: int, player: int, hash_column: int) -> list[int]:
+        """Return the possible columns in the order they should be searched.
+
+        columns are the possible columns of a game state with num_moves discs where player moves next,
+        and hash_column is the best column stored in the transposition table, or -1 if there is none.
+
+        Preconditions:
+            - 0 <= num_moves <= GRID_WIDTH * GRID_HEIGHT
+            - player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        if self.center_first:
+            ordered = [column for column in CENTER_ORDER if column in columns]
+        else:
+            ordered = list(columns)
+
+        if self.use_history:
+            # sort is stable, so columns with the same history score keep the order above.
+            ordered.sort(key=self._history[player].__getitem__, reverse=True)
+
+        front = []
+        if self.use_hash_column and hash_column in ordered:
+            front.append(hash_column)
+        if self.use_killers:
+            for killer in self._killers[num_moves]:
+                if killer in ordered and killer not in front:
+                    front.append(killer)
+
+        if front:
+            return front + [column for column in ordered if column not in front]
+        return ordered
+
+    def record_cutoff(self, column: int, num_moves: int, player: int, d: int) -> None:
+        """Record that playing column caused a cutoff in a game state with num_moves discs where player moves
+        next, which was searched to the depth d.
+
+        Preconditions:
+            - 0 <= column < GRID_WIDTH
+            - 0 <= num_moves <= GRID_WIDTH * GRID_HEIGHT
+            - player in {PLAYER_ONE, PLAYER_TWO}
+            - d >= 1
+        """
+        if self.use_killers:
+            killers = self._killers[num_moves]
+            if column in killers:
+                killers.remove(column)
+            killers.insert(0, column)
+            del killers[NUM_KILLERS:]
+
+        if self.use_history:
+            self._history[player][column] += d * d
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'constant'],
+    })
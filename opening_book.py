@@ -0,0 +1,262 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Opening Book)
+
+Module Description
+==================
+
+This module contains an OpeningBook class that looks up precomputed best columns for the game states at
+the start of a game, and a generate_opening_book function that computes them and writes them to a file.
+
+Searching the first few moves is the most expensive part of a game, since no discs are blocking any
+columns yet, and it gives the same result every game. So an opening book stores, for every game state of
+at most max_plies discs, the score and best columns found by an AlphaBetaSearch of a fixed depth.
+
+A game state and its mirror image (flipped left to right) have mirrored best columns, so they are stored
+once under their canonical key (see ConnectFour.get_canonical_key), which halves the size of the book.
+
+File Format
+===========
+
+An opening book file is a header followed by one record per game state, sorted by key so that a record can
+be found by binary search. The file is memory-mapped rather than read, so opening a book is instant and
+only the pages that are looked up are ever loaded.
+
+    - Header (12 bytes): the 4 bytes BOOK_MAGIC, the version, max_plies and the search depth (one byte
+      each), a padding byte, and the number of records (4 bytes).
+    - Record (11 bytes): the key of the game state (8 bytes), its score for the player moving next
+      (2 bytes, signed), and its best columns as a bit mask where bit x is set if column x is a best column
+      (1 byte).
+
+All numbers are little-endian.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import BinaryIO, Optional
+import mmap
+import os
+import random
+import struct
+from connect_four import ConnectFour, create_game_from_moves
+from bitboard import mirror_column
+from search import AlphaBetaSearch
+from evaluation import IncrementalEvaluator
+from transposition import TranspositionTable
+from constant import GRID_WIDTH
+
+# The first bytes of every opening book file, and the version of the file format.
+BOOK_MAGIC = b'C4OB'
+BOOK_VERSION = 1
+
+# The opening book shipped with the game, generated by running this file.
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+DEFAULT_MAX_PLIES = 4
+DEFAULT_SEARCH_DEPTH = 8
+
+_HEADER = struct.Struct('<4sBBBxI')
+_RECORD = struct.Struct('<QhB')
+_KEY = struct.Struct('<Q')
+
+
+def mirror_columns(columns: int) -> int:
+    """Return the bit mask of columns (where bit x is set for column x) flipped left to right.
+
+    >>> mirror_columns(0b0000011)
+    96
+    """
+    return sum(1 << mirror_column(x) for x in range(GRID_WIDTH) if columns & (1 << x))
+
+
+class OpeningBook:
+    """An opening book file, opened for lookups.
+
+    Instance Attributes:
+        - max_plies: The largest number of discs of the game states in the book.
+        - search_depth: The depth the game states in the book were searched to.
+
+    Private Instance Attributes:
+        - _file: The open book file.
+        - _data: The memory-mapped contents of the book file.
+        - _num_records: The number of records in the book.
+
+    Representation Invariants:
+        - len(self._data) == _HEADER.size + self._num_records * _RECORD.size
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'book.bin')
+    >>> generate_opening_book(path, 2, 2)
+    30
+    >>> book = OpeningBook(path)
+    >>> book.lookup(create_game_from_moves('01'))
+    (3, [1])
+    >>> book.lookup(create_game_from_moves('65'))
+    (3, [5])
+    >>> book.lookup(create_game_from_moves('000')) is None
+    True
+    >>> book.close()
+    """
+    max_plies: int
+    search_depth: int
+    _file: BinaryIO
+    _data: mmap.mmap
+    _num_records: int
+
+    def __init__(self, path: str = DEFAULT_BOOK_PATH) -> None:
+        """Open the opening book file at path.
+
+        Raise a ValueError if the file is not an opening book of this version.
+        """
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.max_plies, self.search_depth, self._num_records = _HEADER.unpack_from(self._data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION \
+                or len(self._data) != _HEADER.size + self._num_records * _RECORD.size:
+            self.close()
+            raise ValueError(f'{path} is not a valid opening book')
+
+    def __len__(self) -> int:
+        """Return the number of game states stored in the book (not counting mirror images)."""
+        return self._num_records
+
+    def close(self) -> None:
+        """Close the book file. The book cannot be used afterwards."""
+        self._data.close()
+        self._file.close()
+
+    def lookup(self, game: ConnectFour) -> Optional[tuple[int, list[int]]]:
+        """Return a tuple (score, best_columns) for the player moving next in game, or None if game is not in
+        the book.
+
+        score is the score of game for the player moving next, and best_columns are all the possible columns
+        with that score, as found by AlphaBetaSearch.search when searching for the player moving next.
+        """
+        if len(game.bitboard.moves) > self.max_plies:
+            return None
+
+        key, mirrored = game.get_canonical_key()
+        record = self._find(key)
+        if record is None:
+            return None
+
+        score, columns = record
+        if mirrored:
+            columns = mirror_columns(columns)
+        return (score, [x for x in range(GRID_WIDTH) if columns & (1 << x)])
+
+    def _find(self, key: int) -> Optional[tuple[int, int]]:
+        """Return the score and the bit mask of best columns of the record of key, or None if there is none."""
+        low, high = 0, self._num_records
+        while low < high:
+            middle = (low + high) // 2
+            offset = _HEADER.size + middle * _RECORD.size
+            middle_key = _KEY.unpack_from(self._data, offset)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                _, score, columns = _RECORD.unpack_from(self._data, offset)
+                return (score, columns)
+        return None
+
+
+def choose_book_column(opening_book: Optional[OpeningBook], game: ConnectFour) -> Optional[int]:
+    """Return a random best column from opening_book for the player moving next in game, or None if there is
+    no opening book or game is not in it.
+    """
+    if opening_book is None:
+        return None
+
+    entry = opening_book.lookup(game)
+    if entry is None:
+        return None
+    return random.choice(entry[1])
+
+
+def load_default_opening_book() -> Optional[OpeningBook]:
+    """Return the opening book at DEFAULT_BOOK_PATH, or None if it does not exist."""
+    if not os.path.exists(DEFAULT_BOOK_PATH):
+        return None
+    return OpeningBook(DEFAULT_BOOK_PATH)
+
+
+def generate_opening_book(path: str, max_plies: int = DEFAULT_MAX_PLIES,
+                          search_depth: int = DEFAULT_SEARCH_DEPTH) -> int:
+    """Write an opening book of every unfinished game state with at most max_plies discs, searched to
+    search_depth, to the file at path, and return the number of game states written.
+
+    Only one of each game state and its mirror image is searched. Since the children of a mirror image are
+    the mirror images of the children, expanding one of each pair is enough to reach every game state.
+
+    Preconditions:
+        - 0 <= max_plies < 256
+        - 1 <= search_depth < 256
+    """
+    engine = AlphaBetaSearch(IncrementalEvaluator(), TranspositionTable())
+    records = []
+
+    # Mapping from canonical key to the moves of one game state with that key, for one number of discs.
+    level = {ConnectFour().get_canonical_key()[0]: ''}
+    for plies in range(max_plies + 1):
+        for key, moves in level.items():
+            game = create_game_from_moves(moves)
+            score, best_columns = engine.search(game, search_depth, game.get_current_player())
+            columns = sum(1 << x for x in best_columns)
+            if game.get_canonical_key()[1]:
+                columns = mirror_columns(columns)
+            records.append((key, score, columns))
+
+        if plies < max_plies:
+            level = _get_next_level(level)
+
+    records.sort()
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, max_plies, search_depth, len(records)))
+        for record in records:
+            file.write(_RECORD.pack(*record))
+    return len(records)
+
+
+def _get_next_level(level: dict[int, str]) -> dict[int, str]:
+    """Return a mapping from the canonical key of every unfinished game state one move after a game state in
+    level to the moves of one game state with that key.
+
+    level is a mapping from canonical keys to the moves of one game state with that key.
+    """
+    next_level = {}
+    for moves in level.values():
+        game = create_game_from_moves(moves)
+        for column in game.get_possible_columns():
+            game.play(column)
+            if game.get_winner() is None:
+                next_level.setdefault(game.get_canonical_key()[0], moves + str(column))
+            game.undo()
+    return next_level
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    # We disabled python_ta's 'consider-using-with' error, because an OpeningBook keeps its file open (and
+    # memory-mapped) until it is closed, so the file cannot be opened in a with statement.
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'mmap', 'os', 'random', 'struct', 'connect_four', 'bitboard',
+                          'search', 'evaluation', 'transposition', 'constant', 'tempfile'],
+        'allowed-io': ['OpeningBook.__init__', 'generate_opening_book', 'load_default_opening_book'],
+        'disable': ['consider-using-with'],
+    })
+
+    # Generate the opening book shipped with the game. This takes a few minutes.
+    generate_opening_book(DEFAULT_BOOK_PATH)
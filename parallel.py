@@ -0,0 +1,613 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Parallel Search)
+
+Module Description
+==================
+
+This module contains two search engines that give the same results as AlphaBetaSearch in search.py, but
+search on several processes at once: ParallelSearch and LazySMPSearch.
+
+Python runs one thread at a time, so a search only uses one core. ParallelSearch splits the game tree at
+a fixed depth below the root (the split depth): every game state at that depth is searched as a separate
+task by a pool of worker processes, each with its own AlphaBetaSearch and transposition table. The exact
+scores of the tasks are then combined by minimax up to the root, which gives the same scores as a serial
+search. With a split depth of 1, the tasks are the root's possible moves; a split depth of 2 makes up to
+49 tasks, which keeps more workers busy.
+
+Game states are sent to the workers as the string of columns played (see ConnectFour.get_move_string),
+which is only one byte per disc, and the workers send back a score and a node count.
+
+LazySMPSearch does not split the game tree. Instead, all its processes search the whole game tree at
+once, and they share one transposition table in shared memory (see TranspositionTable for why this needs
+no locks). This process searches exactly as an AlphaBetaSearch would, and returns its own result, while
+helper processes search the same game state with the root columns in a different order, and every other
+one a move deeper. Each helper fills the shared table with scores that this process can then reuse instead
+of searching, so it gets through the game tree faster. Once this process is done, the helpers are stopped
+through a flag in the shared memory. Since a score in the table is only reused at the depth it was searched
+to, the results are the same as a search by one process.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+import os
+import time
+from connect_four import ConnectFour, create_game_from_moves, get_opposite_player
+from search import AlphaBetaSearch, SearchStopped
+from evaluation import IncrementalEvaluator
+from transposition import TranspositionTable, get_table_bytes
+from move_ordering import CENTER_ORDER
+from constant import WIN_SCORE, LOSE_SCORE, DRAW_SCORE
+
+DEFAULT_SPLIT_DEPTH = 1
+
+# The memory budget of the transposition table of each worker, in bytes.
+DEFAULT_WORKER_TABLE_BYTES = 1 << 24
+
+# The memory budget of the transposition table shared by the processes of a LazySMPSearch, in bytes.
+DEFAULT_SHARED_TABLE_BYTES = 1 << 24
+
+
+class _WorkerState:
+    """The state of a worker process of a ParallelSearch or a helper process of a LazySMPSearch, which is set
+    up by the initializer of its process pool and used by every task the process runs.
+
+    Instance Attributes:
+        - engine: The search engine of this process, or None if this process is not a worker process.
+        - shared_memory: The shared memory of this process, or None if it is not a helper process.
+        - stop_index: The index of the stop flag byte in shared_memory.
+        - deadline: The time.time() value at which the current task of a helper process must stop, or None if
+        it has none.
+    """
+    engine: Optional[AlphaBetaSearch]
+    shared_memory: Optional[SharedMemory]
+    stop_index: int
+    deadline: Optional[float]
+
+    def __init__(self) -> None:
+        """Initialize the state of a process that is not a worker process yet."""
+        self.engine = None
+        self.shared_memory = None
+        self.stop_index = 0
+        self.deadline = None
+
+    def get_engine(self) -> AlphaBetaSearch:
+        """Return the search engine of this worker process.
+
+        Preconditions:
+            - self.engine is not None
+        """
+        assert self.engine is not None
+        return self.engine
+
+    def should_stop(self) -> bool:
+        """Return whether the current task of this helper process must stop.
+
+        Preconditions:
+            - self.shared_memory is not None
+        """
+        assert self.shared_memory is not None
+        return self.shared_memory.buf[self.stop_index] != 0 \
+            or (self.deadline is not None and time.time() > self.deadline)
+
+
+# The state of this process, if it is a worker process. Each process has its own copy.
+_WORKER = _WorkerState()
+
+
+def _init_worker(table_bytes: int) -> None:
+    """Create the search engine of a new worker process."""
+    _WORKER.engine = AlphaBetaSearch(IncrementalEvaluator(), TranspositionTable(table_bytes))
+
+
+def _init_helper(shared_memory_name: str, table_bytes: int) -> None:
+    """Attach a new helper process of a LazySMPSearch to its shared memory, and create its search engine
+    with a transposition table in the shared memory.
+    """
+    shared_memory = SharedMemory(shared_memory_name)
+    _WORKER.shared_memory = shared_memory
+    _WORKER.stop_index = get_table_bytes(table_bytes)
+    table = TranspositionTable(table_bytes, buffer=shared_memory.buf)
+    _WORKER.engine = AlphaBetaSearch(IncrementalEvaluator(), table, should_stop=_WORKER.should_stop)
+
+
+def _helper_task(moves: str, d: int, initial_player: int, column_order: list[int],
+                 deadline: Optional[float]) -> int:
+    """Search the game state given by moves to the depth d in a helper process, trying the root columns in
+    column_order, until the search is done, the stop flag is set or the time.time() value deadline passes.
+    Return the number of game states visited.
+
+    Preconditions:
+        - d >= 1
+        - create_game_from_moves(moves).get_winner() is None
+        - sorted(column_order) == create_game_from_moves(moves).get_possible_columns()
+    """
+    engine = _WORKER.get_engine()
+    _WORKER.deadline = deadline
+    try:
+        engine.search(create_game_from_moves(moves), d, initial_player, column_order)
+    except SearchStopped:
+        pass
+    finally:
+        _WORKER.deadline = None
+    return engine.nodes
+
+
+def _search_task(moves: str, d: int, initial_player: int, deadline: Optional[float]) -> tuple[int, int, int]:
+    """Search the game state given by moves to the depth d in a worker process, and return a tuple
+    (score, nodes, completed_depth).
+
+    If deadline is not None, search by iterative deepening until the time.time() value deadline, and
+    completed_depth is the depth that was completed, or -1 if the deadline had already passed. Otherwise,
+    completed_depth is always d. (A deadline rather than a time limit is given, since a task may wait for
+    other tasks before it starts.)
+
+    Preconditions:
+        - d >= 0
+        - create_game_from_moves(moves).get_winner() is None
+    """
+    game = create_game_from_moves(moves)
+    if d == 0:
+        evaluator = IncrementalEvaluator(game)
+        return (evaluator(game, initial_player, game.get_current_player() == initial_player), 1, 0)
+
+    engine = _WORKER.get_engine()
+    if deadline is None:
+        score, _ = engine.search(game, d, initial_player)
+        return (score, engine.nodes, d)
+
+    time_limit_ms = int((deadline - time.time()) * 1000)
+    if time_limit_ms <= 0:
+        return (0, 0, -1)
+    score, _ = engine.iterative_deepening(game, d, initial_player, time_limit_ms)
+    return (score, engine.nodes, engine.completed_depth)
+
+
+def _get_task_moves(game: ConnectFour, split_depth: int, column_order: Optional[list[int]] = None) -> list[str]:
+    """Return the moves (see ConnectFour.get_move_string) of every unfinished game state split_depth moves
+    after game, starting with the columns of game in column_order if it is not None.
+
+    game is mutated with play and undo, but it is restored before returning.
+
+    Preconditions:
+        - split_depth >= 1
+        - game.get_winner() is None
+        - column_order is None or sorted(column_order) == game.get_possible_columns()
+
+    >>> _get_task_moves(create_game_from_moves('33'), 1, [3, 2, 4, 1, 5, 0, 6])
+    ['333', '332', '334', '331', '335', '330', '336']
+    >>> len(_get_task_moves(ConnectFour(), 2))
+    49
+    """
+    task_moves = []
+    for column in (column_order if column_order is not None else game.get_possible_columns()):
+        game.play(column)
+        if game.get_winner() is None:
+            if split_depth == 1:
+                task_moves.append(game.get_move_string())
+            else:
+                task_moves.extend(_get_task_moves(game, split_depth - 1))
+        game.undo()
+    return task_moves
+
+
+class ParallelSearch:
+    """A minimax search engine that searches the game tree below a split depth on a pool of processes.
+
+    It can be used instead of an AlphaBetaSearch by AlphaBetaPlayer.
+
+    Instance Attributes:
+        - num_workers: The number of worker processes.
+        - split_depth: The depth below the root at which the game tree is split into tasks.
+        - nodes: The number of game states visited by the workers for the last call to search or
+        iterative_deepening.
+        - completed_depth: The depth of the last search that was completed by iterative_deepening.
+
+    Private Instance Attributes:
+        - _table_bytes: The memory budget of the transposition table of each worker, in bytes.
+        - _executor: The pool of worker processes, or None if it has not been started or has been closed.
+
+    Representation Invariants:
+        - self.num_workers >= 1
+        - self.split_depth >= 1
+
+    >>> engine = ParallelSearch(2)
+    >>> game = create_game_from_moves('33')
+    >>> engine.search(game, 4, game.get_current_player()) == AlphaBetaSearch(IncrementalEvaluator()).search(
+    ...     game, 4, game.get_current_player())
+    True
+    >>> engine.close()
+    """
+    num_workers: int
+    split_depth: int
+    nodes: int
+    completed_depth: int
+    _table_bytes: int
+    _executor: Optional[ProcessPoolExecutor]
+
+    def __init__(self, num_workers: Optional[int] = None, split_depth: int = DEFAULT_SPLIT_DEPTH,
+                 table_bytes: int = DEFAULT_WORKER_TABLE_BYTES) -> None:
+        """Initialize a parallel search engine with num_workers worker processes (or one per core if
+        num_workers is None), each with a transposition table of table_bytes bytes.
+
+        The worker processes are only started by the first search, and they keep their transposition tables
+        between searches until close is called.
+
+        Preconditions:
+            - num_workers is None or num_workers >= 1
+            - split_depth >= 1
+        """
+        self.num_workers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+        self.split_depth = split_depth
+        self.nodes = 0
+        self.completed_depth = 0
+        self._table_bytes = table_bytes
+        self._executor = None
+
+    def close(self) -> None:
+        """Stop the worker processes. They are started again by the next search."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def search(self, game: ConnectFour, d: int, initial_player: int,
+               column_order: Optional[list[int]] = None) -> tuple[int, list[int]]:
+        """Search game to the depth d and return a tuple (score, best_columns), exactly as
+        AlphaBetaSearch.search does.
+
+        If column_order is not None, the tasks of the possible columns are submitted in that order, so when
+        there are more tasks than workers, the first columns are searched first. This does not change the
+        result.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        result = self._search_split(game, d, initial_player, None, column_order)
+        assert result is not None
+        return result
+
+    def iterative_deepening(self, game: ConnectFour, max_depth: int, initial_player: int,
+                            time_limit_ms: int) -> tuple[int, list[int]]:
+        """Search game to the depths 1, 2, ..., max_depth until time_limit_ms milliseconds have passed,
+        and return the result of search for the deepest depth that was completed, like
+        AlphaBetaSearch.iterative_deepening.
+
+        Each task of each depth is searched by iterative deepening in its worker, so a depth is only
+        completed if all of its tasks were completed in time. The depth 1 search is always completed.
+
+        Preconditions:
+            - max_depth >= 1
+            - time_limit_ms >= 0
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        deadline = time.time() + time_limit_ms / 1000
+        result = self._search_split(game, 1, initial_player, None)
+        total_nodes = self.nodes
+        self.completed_depth = 1
+
+        for d in range(2, max_depth + 1):
+            if time.time() >= deadline:
+                break
+            deeper_result = self._search_split(game, d, initial_player, deadline)
+            total_nodes += self.nodes
+            if deeper_result is None:
+                break
+            result = deeper_result
+            self.completed_depth = d
+
+        self.nodes = total_nodes
+        return result
+
+    def _search_split(self, game: ConnectFour, d: int, initial_player: int, deadline: Optional[float],
+                      column_order: Optional[list[int]] = None) -> Optional[tuple[int, list[int]]]:
+        """Search game to the depth d on the worker processes and return a tuple (score, best_columns) as
+        described in search, or None if deadline is not None and some task was not completed before the
+        time.time() value deadline. The tasks are submitted in column_order, as described in search.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.num_workers, initializer=_init_worker,
+                                                 initargs=(self._table_bytes,))
+        executor = self._executor
+
+        split_depth = min(self.split_depth, d)
+        futures = {moves: executor.submit(_search_task, moves, d - split_depth, initial_player, deadline)
+                   for moves in _get_task_moves(game, split_depth, column_order)}
+        results = self._collect_results(futures, d - split_depth)
+        if results is None:
+            return None
+
+        scores = self._combine_scores(game, split_depth, initial_player, results)
+        if game.get_current_player() == initial_player:
+            best_score = max(scores.values())
+        else:
+            best_score = min(scores.values())
+        return (best_score, sorted(column for column, score in scores.items() if score == best_score))
+
+    def _collect_results(self, futures: dict[str, Future], task_depth: int) -> Optional[dict[str, int]]:
+        """Wait for the tasks in futures, which search to the depth task_depth, and return a mapping from the
+        moves of the game state of each task to its score, or None if some task was not completed in time.
+
+        The game states visited by all the tasks are counted in self.nodes.
+        """
+        wait(futures.values())
+        results = {}
+        self.nodes = 0
+        completed = True
+        for moves, future in futures.items():
+            score, nodes, completed_depth = future.result()
+            self.nodes += nodes
+            results[moves] = score
+            completed = completed and completed_depth == task_depth
+        return results if completed else None
+
+    def _combine_scores(self, game: ConnectFour, split_depth: int, initial_player: int,
+                        results: dict[str, int]) -> dict[int, int]:
+        """Return a mapping from each possible column of game to its minimax score for initial_player, given
+        the scores of the tasks in results, under the moves of their game states.
+
+        game is mutated with play and undo, but it is restored before returning.
+
+        Preconditions:
+            - split_depth >= 1
+            - game.get_winner() is None
+            - results has the score of every unfinished game state split_depth moves after game
+        """
+        scores = {}
+        for column in game.get_possible_columns():
+            game.play(column)
+            winner = game.get_winner()
+            if winner == initial_player:
+                scores[column] = WIN_SCORE
+            elif winner == get_opposite_player(initial_player):
+                scores[column] = LOSE_SCORE
+            elif winner is not None:
+                scores[column] = DRAW_SCORE
+            elif split_depth == 1:
+                scores[column] = results[game.get_move_string()]
+            else:
+                child_scores = self._combine_scores(game, split_depth - 1, initial_player, results).values()
+                if game.get_current_player() == initial_player:
+                    scores[column] = max(child_scores)
+                else:
+                    scores[column] = min(child_scores)
+            game.undo()
+        return scores
+
+
+class LazySMPSearch:
+    """A minimax search engine whose processes all search the same game state and share one transposition
+    table, in the style of Lazy SMP.
+
+    It can be used instead of an AlphaBetaSearch by AlphaBetaPlayer.
+
+    Instance Attributes:
+        - num_workers: The number of processes searching, including this one.
+        - nodes: The number of game states visited by all the processes for the last call to search or
+        iterative_deepening.
+        - completed_depth: The depth of the last search that was completed by iterative_deepening.
+
+    Private Instance Attributes:
+        - _table_bytes: The memory budget of the shared transposition table, in bytes.
+        - _shared: A tuple (shared_memory, engine) of the memory holding the shared transposition table,
+        followed by the stop flag byte, and the search engine of this process using that table, or None if
+        they have not been created or have been freed.
+        - _executor: The pool of helper processes, or None if it has not been started or has been closed.
+        - _deadline: The time.time() value at which the current search of this process must stop, or None
+        if it has no time limit.
+
+    Representation Invariants:
+        - self.num_workers >= 1
+
+    >>> engine = LazySMPSearch(2, 1 << 16)
+    >>> game = create_game_from_moves('3342')
+    >>> engine.search(game, 6, game.get_current_player()) == AlphaBetaSearch(IncrementalEvaluator()).search(
+    ...     game, 6, game.get_current_player())
+    True
+    >>> engine.close()
+    """
+    num_workers: int
+    nodes: int
+    completed_depth: int
+    _table_bytes: int
+    _shared: Optional[tuple[SharedMemory, AlphaBetaSearch]]
+    _executor: Optional[ProcessPoolExecutor]
+    _deadline: Optional[float]
+
+    def __init__(self, num_workers: Optional[int] = None, table_bytes: int = DEFAULT_SHARED_TABLE_BYTES) -> None:
+        """Initialize a Lazy SMP search engine with num_workers searching processes (or one per core if
+        num_workers is None), sharing a transposition table of table_bytes bytes.
+
+        The shared memory and the helper processes are only created by the first search, and they keep the
+        shared transposition table between searches until close is called.
+
+        Preconditions:
+            - num_workers is None or num_workers >= 1
+            - table_bytes >= 2 * ENTRY_SIZE
+        """
+        self.num_workers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+        self.nodes = 0
+        self.completed_depth = 0
+        self._table_bytes = table_bytes
+        self._shared = None
+        self._executor = None
+        self._deadline = None
+
+    def close(self) -> None:
+        """Stop the helper processes and free the shared memory. They are created again by the next search,
+        with an empty transposition table.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._shared is not None:
+            shared_memory, engine = self._shared
+            table = engine.get_transposition_table()
+            assert table is not None
+            table.release()
+            shared_memory.close()
+            shared_memory.unlink()
+            self._shared = None
+
+    def search(self, game: ConnectFour, d: int, initial_player: int,
+               column_order: Optional[list[int]] = None) -> tuple[int, list[int]]:
+        """Search game to the depth d and return a tuple (score, best_columns), exactly as
+        AlphaBetaSearch.search does.
+
+        If column_order is not None, this process searches the possible columns in that order, and the
+        helpers search them in rotations of that order.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        result = self._search_shared(game, d, initial_player, column_order, None)
+        assert result is not None
+        return result
+
+    def iterative_deepening(self, game: ConnectFour, max_depth: int, initial_player: int,
+                            time_limit_ms: int) -> tuple[int, list[int]]:
+        """Search game to the depths 1, 2, ..., max_depth until time_limit_ms milliseconds have passed,
+        and return the result of search for the deepest depth that was completed, like
+        AlphaBetaSearch.iterative_deepening.
+
+        The depth 1 search is always completed, by this process alone.
+
+        Preconditions:
+            - max_depth >= 1
+            - time_limit_ms >= 0
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        deadline = time.time() + time_limit_ms / 1000
+        _, engine = self._start()
+        result = engine.search(game, 1, initial_player)
+        total_nodes = engine.nodes
+        self.completed_depth = 1
+
+        for d in range(2, max_depth + 1):
+            if time.time() >= deadline:
+                break
+            best_columns = result[1]
+            column_order = best_columns + [column for column in game.get_possible_columns()
+                                           if column not in best_columns]
+            deeper_result = self._search_shared(game, d, initial_player, column_order, deadline)
+            total_nodes += self.nodes
+            if deeper_result is None:
+                break
+            result = deeper_result
+            self.completed_depth = d
+
+        self.nodes = total_nodes
+        return result
+
+    def _start(self) -> tuple[SharedMemory, AlphaBetaSearch]:
+        """Create the shared memory, the search engine of this process and the helper processes, if they
+        do not exist yet, and return a tuple (shared_memory, engine) of the first two.
+        """
+        if self._shared is None:
+            # A new shared memory is filled with zeros, so the table starts empty and the stop flag is unset.
+            shared_memory = SharedMemory(create=True, size=get_table_bytes(self._table_bytes) + 1)
+            table = TranspositionTable(self._table_bytes, buffer=shared_memory.buf)
+            self._shared = (shared_memory,
+                            AlphaBetaSearch(IncrementalEvaluator(), table, should_stop=self._is_past_deadline))
+        if self._executor is None and self.num_workers > 1:
+            self._executor = ProcessPoolExecutor(self.num_workers - 1, initializer=_init_helper,
+                                                 initargs=(self._shared[0].name, self._table_bytes))
+        return self._shared
+
+    def _is_past_deadline(self) -> bool:
+        """Return whether the time.time() value self._deadline has passed."""
+        return self._deadline is not None and time.time() > self._deadline
+
+    def _search_shared(self, game: ConnectFour, d: int, initial_player: int, column_order: Optional[list[int]],
+                       deadline: Optional[float]) -> Optional[tuple[int, list[int]]]:
+        """Search game to the depth d on this process and the helper processes, and return a tuple
+        (score, best_columns) as described in search, or None if deadline is not None and the search of
+        this process was not completed before the time.time() value deadline.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        shared_memory, engine = self._start()
+        futures = self._submit_helper_tasks(game, d, initial_player, column_order, deadline)
+
+        self._deadline = deadline
+        try:
+            result = engine.search(game, d, initial_player, column_order)
+        except SearchStopped:
+            result = None
+        finally:
+            self._deadline = None
+        self.nodes = engine.nodes
+
+        # Stop the helpers, and wait for them so that they do not take the time of the next search.
+        stop_index = get_table_bytes(self._table_bytes)
+        shared_memory.buf[stop_index] = 1
+        wait(futures)
+        shared_memory.buf[stop_index] = 0
+        for future in futures:
+            self.nodes += future.result()
+        return result
+
+    def _submit_helper_tasks(self, game: ConnectFour, d: int, initial_player: int,
+                             column_order: Optional[list[int]], deadline: Optional[float]) -> list[Future]:
+        """Submit a task for each helper process to search game to the depth d, or one deeper for every other
+        helper, with the root columns in a rotation of column_order (or of the center-first order if it is
+        None), and return their futures. Return an empty list if there are no helper processes.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        if self._executor is None:
+            return []
+
+        moves = game.get_move_string()
+        possible_columns = game.get_possible_columns()
+        helper_order = column_order if column_order is not None \
+            else [column for column in CENTER_ORDER if column in possible_columns]
+        futures = []
+        for i in range(1, self.num_workers):
+            rotation = i % len(helper_order)
+            futures.append(self._executor.submit(_helper_task, moves, d + i % 2, initial_player,
+                                                 helper_order[rotation:] + helper_order[:rotation], deadline))
+        return futures
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'concurrent.futures', 'multiprocessing.shared_memory', 'os',
+                          'time', 'connect_four', 'search', 'evaluation', 'transposition', 'move_ordering',
+                          'constant'],
+    })
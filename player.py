@@ -5,8 +5,9 @@ Module Description
 
 This module contains a collection of Python classes and functions that
 represent the game of Connect 4.
-This file contains classes including Player, RandomPlayer, ScoringPlayer, and GreedyPlayer
-with associated functions defined under each class.
+This file contains classes including Player, RandomPlayer, ScoringPlayer, and GreedyPlayer with associated
+functions defined under each class. The players searching with a search engine instead of a game tree are in
+search_player.py.
 By reading the *docstring* of this file, you can gain insights into the
 role and functionality of these classes and functions
 as well as how they contribute to this project as a whole.
@@ -25,11 +26,25 @@ which is also Copyright (c) 2023 Mario Badr, David Liu, and Angela Zavaleta Bern
 """
 
 from __future__ import annotations
-from typing import Optional
+from typing import Callable, Optional
 import random
+import threading
+import time
 from connect_four import ConnectFour, get_opposite_player
-from game_tree import GameTree, GAME_START_MOVE
-from constant import GRID_WIDTH, GRID_HEIGHT, PLAYER_ONE, PLAYER_TWO, UNOCCUPIED
+from game_tree import GameTree, GAME_START_MOVE, UNSEARCHED_DEPTH, FINAL_DEPTH
+from search import SearchStopped, INFINITY
+from opening_book import OpeningBook, choose_book_column
+from endgame import EndgameTablebase
+from instrumentation import SearchStats, SearchInstrumentation
+from move_ordering import CENTER_ORDER
+from batch_evaluation import LeafBatch, DEFAULT_BATCH_SIZE
+from evaluation import score_game
+from constant import GRID_WIDTH, PLAYER_ONE, PLAYER_TWO, \
+    WIN_SCORE, LOSE_SCORE, DRAW_SCORE, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# The ways a GreedyPlayer can keep its game tree (see GreedyPlayer).
+COMPLETE_TREE, BATCHED_TREE, LAZY_TREE, PONDERING_TREE = 'complete', 'batched', 'lazy', 'pondering'
+TREE_MODES = (COMPLETE_TREE, BATCHED_TREE, LAZY_TREE, PONDERING_TREE)
 
 
 class Player:
@@ -37,18 +52,31 @@ class Player:
 
     Subclasses of this class will be created to implement different strategies for our Connect 4 AI player.
 
+    A player can ponder, i.e. search on the opponent's time: after choosing a column, it calls _start_pondering
+    with the game after its move, which runs _ponder on a background thread until the player is asked for its
+    next move. Subclasses that ponder override _ponder, and call stop_pondering before using anything _ponder
+    uses.
+
     Instance Attributes:
         - player_num: An int representing whether this player goes first or second.
 
+    Private Instance Attributes:
+        - _ponder_thread: The thread running _ponder, or None if the player is not pondering.
+        - _ponder_stop: The event set to ask _ponder to return.
+
     Representation Invariants:
         - player_num in {PLAYER_ONE, PLAYER_TWO}
     """
     player_num: int
+    _ponder_thread: Optional[threading.Thread]
+    _ponder_stop: threading.Event
 
     def __init__(self, player_num: int) -> None:
         """Initialize a player with a variable determining whether it goes first.
         """
         self.player_num = player_num
+        self._ponder_thread = None
+        self._ponder_stop = threading.Event()
 
     def choose_column(self, game: ConnectFour) -> int:
         """ Return a chosen column of grid given the current game state.
@@ -65,6 +93,36 @@ class Player:
         """
         raise NotImplementedError
 
+    def stop_pondering(self) -> None:
+        """ Stop searching on the opponent's time, and wait until the search has stopped.
+
+        Nothing happens if the player is not pondering. Players that ponder call this themselves before
+        choosing a column, so it only needs to be called before a pondering player is dropped.
+        """
+        if self._ponder_thread is not None:
+            self._ponder_stop.set()
+            self._ponder_thread.join()
+            self._ponder_stop.clear()
+            self._ponder_thread = None
+
+    def _start_pondering(self, game: ConnectFour) -> None:
+        """ Start running _ponder on a copy of game on a background thread, unless the game is over.
+
+        Preconditions:
+            - game.get_current_player() != self.player_num
+            - self._ponder_thread is None
+        """
+        if game.get_winner() is None:
+            self._ponder_thread = threading.Thread(target=self._ponder, args=(game.copy(),), daemon=True)
+            self._ponder_thread.start()
+
+    def _ponder(self, game: ConnectFour) -> None:
+        """ Search game, where the opponent moves next, so that choosing the next column is faster, returning
+        as soon as possible once self._ponder_stop is set. game may be mutated.
+
+        By default, do nothing.
+        """
+
 
 class RandomPlayer(Player):
     """ A player that performs randomly by selecting one of the possible moves at random.
@@ -102,22 +160,7 @@ class ScoringPlayer(Player):
             - game.get_winner() is None
             - game.get_current_player() == self.player_num
         """
-        possible_columns = game.get_possible_columns()
-        best_column_so_far = possible_columns[0]
-
-        new_game = game.copy_and_record_player_move(best_column_so_far)
-        best_score_so_far = score_game(new_game, self.player_num, True)
-
-        for i in range(1, len(possible_columns)):
-            column = possible_columns[i]
-            new_game = game.copy_and_record_player_move(column)
-
-            score = score_game(new_game, self.player_num, True)
-            if score > best_score_so_far:
-                best_score_so_far = score
-                best_column_so_far = column
-
-        return best_column_so_far
+        return _choose_column_by_score(game, self.player_num)
 
     def hint_opponent(self, game: ConnectFour) -> int:
         """ Return a chosen column from all possible columns with the maximum score for the opponent.
@@ -129,60 +172,153 @@ class ScoringPlayer(Player):
             - game.get_winner() is None
             - game.get_current_player() == self.player_num
         """
-        opponent = get_opposite_player(self.player_num)
-        possible_columns = game.get_possible_columns()
-        best_column_so_far = possible_columns[0]
+        return _choose_column_by_score(game, get_opposite_player(self.player_num))
 
-        new_game = game.copy_and_record_player_move(best_column_so_far)
-        best_score_so_far = score_game(new_game, opponent, True)
+    def copy(self) -> Player:
+        """Return a copy of self."""
+        return ScoringPlayer(self.player_num)
 
-        for i in range(1, len(possible_columns)):
-            column = possible_columns[i]
-            new_game = game.copy_and_record_player_move(column)
 
-            score = score_game(new_game, opponent, True)
-            if score > best_score_so_far:
-                best_score_so_far = score
-                best_column_so_far = column
+def _choose_column_by_score(game: ConnectFour, player: int) -> int:
+    """ Return the possible column whose resulting game state has the maximum score_game for player.
 
-        return best_column_so_far
+    The first column with the maximum score is returned. Each move is played and undone on game itself,
+    so game is unchanged when this function returns.
 
-    def copy(self) -> Player:
-        """Return a copy of self."""
-        return ScoringPlayer(self.player_num)
+    Preconditions:
+        - game.get_winner() is None
+        - player in {PLAYER_ONE, PLAYER_TWO}
+    """
+    best_column_so_far = None
+    best_score_so_far = 0
+
+    for column in game.get_possible_columns():
+        game.play(column)
+        score = score_game(game, player, True)
+        game.undo()
+
+        if best_column_so_far is None or score > best_score_so_far:
+            best_score_so_far = score
+            best_column_so_far = column
+
+    return best_column_so_far
 
 
 class GreedyPlayer(Player):
     """ A Greedy AI Player that makes move based on its game tree.
 
+    The player keeps its game tree in one of these ways, given by its tree mode:
+        - COMPLETE_TREE: a complete game tree of the search depth, updated after each move.
+        - BATCHED_TREE: the same complete game tree, with the leaves scored in batches with NumPy.
+        - LAZY_TREE: a game tree expanded lazily by search_lazy_tree, which gives the same moves.
+        - PONDERING_TREE: a lazily expanded game tree that is also searched on the opponent's time.
+
+    To search with a search engine, or with a time limit, use an AlphaBetaPlayer (see search_player.py), which
+    gives the same moves without a game tree.
+
     Private Instance Attributes:
         - _depth: An integer representing the depth of the decision tree.
         - _game_tree: A GameTree object representing the decision tree of the greedy player.
+        - _tree_mode: How the game tree is kept, one of TREE_MODES.
+        - _opening_book: The OpeningBook consulted before using the game tree, or None if there is no opening
+        book.
+        - _endgame_tablebase: The EndgameTablebase that the game tree stops at, or None if there is none.
+        - _should_stop: The function asked by search_lazy_tree whether to stop searching, or None if there is
+        none.
+        - _instrumentation: The instrumentation measuring every move the player chooses, or None if there is none.
 
     Representation Invariant:
         - self._depth > 0
+        - self._tree_mode in TREE_MODES
     """
     _depth: int
     _game_tree: GameTree | None
-
-    def __init__(self, player_num: int, search_depth: int, game_tree: Optional[GameTree]) -> None:
+    _tree_mode: str
+    _opening_book: Optional[OpeningBook]
+    _endgame_tablebase: Optional[EndgameTablebase]
+    _should_stop: Optional[Callable[[], bool]]
+    _instrumentation: Optional[SearchInstrumentation]
+
+    def __init__(self, player_num: int, search_depth: int, game_tree: Optional[GameTree],
+                 tree_mode: str = COMPLETE_TREE, opening_book: Optional[OpeningBook] = None,
+                 endgame_tablebase: Optional[EndgameTablebase] = None,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 instrumentation: Optional[SearchInstrumentation] = None) -> None:
         """Initiate a GreedyPlayer with given player number, search depth and game_tree.
 
-        Generate a new game tree if game_tree is None.
+        Generate a new game tree if game_tree is None, unless the tree is expanded lazily.
+
+        If tree_mode is BATCHED_TREE, the game tree is generated and updated with the batched versions of
+        generate_complete_tree_to_depth and update_complete_tree_to_depth, which give the same scores.
+
+        If tree_mode is LAZY_TREE or PONDERING_TREE, the game tree is not generated up front, and it is not
+        updated after each move. Instead, each move is chosen by search_lazy_tree, which adds to the game tree
+        only the nodes it visits, and gives the same best columns as a complete game tree.
+
+        If tree_mode is PONDERING_TREE, the player also ponders (see Player): once it has chosen a column, it
+        keeps searching its game tree on a background thread while the opponent decides, first the replies it
+        expects, then the others, to the depth choose_column will search them to. The scores stay in the game
+        tree, so the next column is chosen right away if the search of the opponent's reply was finished, and
+        faster otherwise. The game tree is shared with the background thread, so the player (and its copies)
+        must only be used by one thread at a time.
+
+        If opening_book is not None, the player chooses its moves from opening_book while the game is in it.
+        In that case no game tree is generated here: the game tree is only generated, from the game state
+        at that point, once the game leaves the opening book.
+
+        If endgame_tablebase is not None, the game tree is not expanded past the game states found in it, whose
+        results are known exactly (see generate_complete_tree_to_depth).
+
+        If should_stop is not None, it is given to search_lazy_tree, so that choosing a move from a lazily
+        expanded game tree can be stopped from another thread (a complete game tree is not stopped).
+        choose_column and hint_opponent may then raise SearchStopped, after which the player must not be used.
+
+        If instrumentation is not None, every column chosen by choose_column is measured by it, with the stats of
+        the game tree generation, update or search of that move (see instrumentation.py). The game tree
+        generated here and the searches of pondering are not measured.
 
         Preconditions:
             - player_num in {PLAYER_ONE, PLAYER_TWO}
             - search_depth > 0
+            - tree_mode in TREE_MODES
         """
         Player.__init__(self, player_num)
+        self._tree_mode = tree_mode
+        self._opening_book = opening_book
+        self._endgame_tablebase = endgame_tablebase
+        self._should_stop = should_stop
+        self._instrumentation = instrumentation
+        self._depth = search_depth
 
         if game_tree is not None:
             self._game_tree = game_tree
+        elif opening_book is not None:
+            self._game_tree = None
+        elif self._is_lazy():
+            # Nothing is searched until the first move needs it.
+            self._game_tree = GameTree(GAME_START_MOVE, player_num, get_opposite_player(PLAYER_ONE))
         else:
-            self._game_tree = generate_complete_tree_to_depth(GAME_START_MOVE, ConnectFour(), search_depth,
-                                                              self.player_num)
+            self._game_tree = self._generate_tree(GAME_START_MOVE, ConnectFour(), search_depth)
 
-        self._depth = search_depth
+    def _is_lazy(self) -> bool:
+        """ Return whether the game tree is expanded lazily by search_lazy_tree."""
+        return self._tree_mode in {LAZY_TREE, PONDERING_TREE}
+
+    def _generate_tree(self, root_move: str | int, game: ConnectFour, d: int,
+                       stats: Optional[SearchStats] = None) -> GameTree:
+        """ Return a complete game tree of game to the depth d, generated with or without batch evaluation,
+        counting its nodes in stats if it is not None.
+
+        Preconditions:
+            - d >= 0
+            - root_move == GAME_START_MOVE or root_move == game.get_last_move()[1][0]
+        """
+        if self._tree_mode == BATCHED_TREE:
+            return generate_complete_tree_to_depth_batched(root_move, game, d, self.player_num,
+                                                           endgame_tablebase=self._endgame_tablebase, stats=stats)
+        else:
+            return generate_complete_tree_to_depth(root_move, game, d, self.player_num,
+                                                   endgame_tablebase=self._endgame_tablebase, stats=stats)
 
     def choose_column(self, game: ConnectFour) -> int:
         """ Choose a column with maximum score based on the given game and game tree.
@@ -190,23 +326,60 @@ class GreedyPlayer(Player):
 
         Choose a random possible column if either game tree is None or game tree has no subtree.
 
+        If the game is in the opening book, choose a random best column from the opening book instead.
+        The game tree no longer follows the game after that, so it is dropped.
+
         Preconditions:
             - game.get_last_move() is not none or self.player_num == PLAYER_ONE
             - game.get_winner() is None
             - game.get_current_player() == self.player_num
         """
+        if self._instrumentation is not None:
+            return self._instrumentation.measure_move(game, lambda stats: self._choose_column(game, stats))
+        return self._choose_column(game, None)
+
+    def _choose_column(self, game: ConnectFour, stats: Optional[SearchStats]) -> int:
+        """ Choose a column as described in choose_column, counting the work of the search in stats if it is
+        not None.
+        """
+        self.stop_pondering()
+        book_column = choose_book_column(self._opening_book, game)
+        if book_column is not None:
+            self._game_tree = None
+            return book_column
 
         last_move = game.get_last_move()
 
         # Always choose the central column when making the first step of the whole game.
         if last_move is None:
             move_column = GRID_WIDTH // 2
-            self._recurse_into_tree(move_column, game)
+            if self._game_tree is not None:
+                self._recurse_into_tree(move_column, game, stats)
+                if self._tree_mode == PONDERING_TREE:
+                    self._start_pondering(game.copy_and_record_player_move(move_column))
             return move_column
 
-        # Recurse into a subtree based on the last move of the game (the opponent's move).
         last_move_column = last_move[1][0]
-        self._game_tree = self._game_tree.get_subtree_by_column(last_move_column)
+        if self._is_lazy():
+            if self._game_tree is None:
+                # The game has just left the opening book, so start a new game tree from this game state.
+                self._game_tree = GameTree(last_move_column, self.player_num, get_opposite_player(self.player_num))
+            else:
+                self._game_tree = self._game_tree.get_or_add_subtree(last_move_column)
+            move_column = random.choice(search_lazy_tree(self._game_tree, game, max(self._depth - 1, 1),
+                                                         self.player_num, self._endgame_tablebase, self._should_stop,
+                                                         stats))
+            self._recurse_into_tree(move_column, game, stats)
+            if self._tree_mode == PONDERING_TREE:
+                self._start_pondering(game.copy_and_record_player_move(move_column))
+            return move_column
+
+        if self._game_tree is None and self._opening_book is not None:
+            # The game has just left the opening book, so generate the game tree the player would have now.
+            self._game_tree = self._generate_tree(last_move_column, game, self._depth - 1, stats)
+        else:
+            # Recurse into a subtree based on the last move of the game (the opponent's move).
+            self._game_tree = self._game_tree.get_subtree_by_column(last_move_column)
 
         # Make random choices if either game tree is None or game tree has no subtree.
         if self._game_tree is None:
@@ -222,32 +395,69 @@ class GreedyPlayer(Player):
         max_score_tree = [subtree for subtree in subtrees if subtree.score == max_score]
 
         move_column = random.choice(max_score_tree).move_column
-        self._recurse_into_tree(move_column, game)
+        self._recurse_into_tree(move_column, game, stats)
         return move_column
 
-    def _recurse_into_tree(self, move_column: int, game: ConnectFour) -> None:
+    def _recurse_into_tree(self, move_column: int, game: ConnectFour, stats: Optional[SearchStats] = None) -> None:
         """ Recurse game tree into the given column. Update the game tree to maintain its depth, so that
-        the following moves can still be based a tree with self._depth.
+        the following moves can still be based a tree with self._depth. The update is counted in stats if it
+        is not None.
+
+        If the game tree is expanded lazily, only recurse into the subtree, which is searched again when the
+        next move is chosen.
 
         Preconditions:
             - move_column in game.get_possible_columns()
         """
+        if self._is_lazy():
+            self._game_tree = self._game_tree.get_or_add_subtree(move_column)
+            return
+
         self._game_tree = self._game_tree.get_subtree_by_column(move_column)
-        new_game = game.copy_and_record_player_move(move_column)
-        update_complete_tree_to_depth(self._game_tree, new_game, self._depth, self.player_num)
+        game.play(move_column)
+        if self._tree_mode == BATCHED_TREE:
+            update_complete_tree_to_depth_batched(self._game_tree, game, self._depth, self.player_num,
+                                                  endgame_tablebase=self._endgame_tablebase, stats=stats)
+        else:
+            update_complete_tree_to_depth(self._game_tree, game, self._depth, self.player_num,
+                                          endgame_tablebase=self._endgame_tablebase, stats=stats)
+        game.undo()
 
     def hint_opponent(self, game: ConnectFour) -> int:
         """ Return a column that the opponent should choose for their best interest according to self._game_tree.
 
+        If the game is in the opening book, return a random best column from the opening book instead.
+
         Preconditions:
             - game.get_last_move() is not none or self.player_num == PLAYER_TWO
             - game.get_winner() is None
             - game.get_current_player() == self.player_num
         """
+        self.stop_pondering()
+        book_column = choose_book_column(self._opening_book, game)
+        if book_column is not None:
+            return book_column
+
         last_move = game.get_last_move()
         if last_move is None:
             return GRID_WIDTH // 2
 
+        if self._is_lazy():
+            if self._game_tree is None:
+                # The game has just left the opening book, so start a new game tree from this game state.
+                self._game_tree = GameTree(last_move[1][0], self.player_num,
+                                           get_opposite_player(game.get_current_player()))
+            hint_columns = search_lazy_tree(self._game_tree, game, self._depth, self.player_num,
+                                            self._endgame_tablebase, self._should_stop)
+            if self._tree_mode == PONDERING_TREE:
+                # Carry on pondering where the hint stopped it.
+                self._start_pondering(game)
+            return random.choice(hint_columns)
+
+        if self._game_tree is None and self._opening_book is not None:
+            # The game has just left the opening book, so generate the game tree the player would have now.
+            self._game_tree = self._generate_tree(last_move[1][0], game, self._depth)
+
         if self._game_tree is None:
             return random.choice(game.get_possible_columns())
 
@@ -265,12 +475,43 @@ class GreedyPlayer(Player):
     def copy(self) -> Player:
         """
         Return a copy of self with the same search depth and game tree.
+
+        Pondering is stopped first, since the copy shares the game tree.
+        """
+        self.stop_pondering()
+        return GreedyPlayer(self.player_num, self._depth, self._game_tree, self._tree_mode, self._opening_book,
+                            self._endgame_tablebase, self._should_stop, self._instrumentation)
+
+    def _ponder(self, game: ConnectFour) -> None:
+        """ Search the game tree of game to the depth hint_opponent searches it to, which finds the replies the
+        opponent is expected to play, and then search the subtree of each reply to the depth choose_column will
+        search it to, expected replies first, until self._ponder_stop is set.
+
+        Preconditions:
+            - self._game_tree is the lazily expanded game tree of game
         """
-        return GreedyPlayer(self.player_num, self._depth, self._game_tree)
+        try:
+            expected_columns = search_lazy_tree(self._game_tree, game, self._depth, self.player_num,
+                                                self._endgame_tablebase, self._is_search_stopped)
+            for column in expected_columns + [column for column in game.get_possible_columns()
+                                              if column not in expected_columns]:
+                game.play(column)
+                if game.get_winner() is None:
+                    search_lazy_tree(self._game_tree.get_or_add_subtree(column), game, max(self._depth - 1, 1),
+                                     self.player_num, self._endgame_tablebase, self._is_search_stopped)
+                game.undo()
+        except SearchStopped:
+            return
+
+    def _is_search_stopped(self) -> bool:
+        """ Return whether pondering is being stopped, or the player's searches must stop."""
+        return self._ponder_stop.is_set() or (self._should_stop is not None and self._should_stop())
 
 
 def generate_complete_tree_to_depth(root_move: str | int, game: ConnectFour, d: int,
-                                    initial_player: int) -> GameTree:
+                                    initial_player: int, leaf_batch: Optional[LeafBatch] = None,
+                                    endgame_tablebase: Optional[EndgameTablebase] = None,
+                                    stats: Optional[SearchStats] = None) -> GameTree:
     """ Generate a complete game tree to the depth d recursively.
 
     Since generating a complete tree to the maximum possible depth is very time and space consuming, we
@@ -284,29 +525,69 @@ def generate_complete_tree_to_depth(root_move: str | int, game: ConnectFour, d:
     Create an empty game tree. For all possible game moves, create its associated subtree to depth d - 1,
     and add to the empty game tree's subtrees.
 
+    If leaf_batch is not None, the leaves at the maximum depth are added to leaf_batch instead of being
+    scored right away, so their scores (and the scores of their ancestors) are only correct once leaf_batch
+    is flushed and the scores are updated. Use generate_complete_tree_to_depth_batched for that.
+
+    If endgame_tablebase is not None, a game state found in it is not expanded any further: like a finished
+    game, it becomes a leaf scored with WIN_SCORE, LOSE_SCORE or DRAW_SCORE, according to how the game ends
+    with perfect play.
+
+    If stats is not None, every node of the tree is counted in it (see instrumentation.py).
+
     Preconditions:
         - d >= 0
         - root_move == GAME_START_MOVE or 0 <= root_move < GRID_WIDTH
         - len(game.player_one_moves) == 0 or root_move != GAME_START_MOVE
         - initial_player in {PLAYER_ONE, PLAYER_TWO}
+        - leaf_batch is None or leaf_batch.initial_player == initial_player
+
+    game is mutated with play and undo while the tree is generated, but it is restored before returning.
+
+    >>> stats = SearchStats()
+    >>> game_tree = generate_complete_tree_to_depth(GAME_START_MOVE, ConnectFour(), 2, PLAYER_ONE, stats=stats)
+    >>> stats.nodes_generated == len(game_tree), stats.leaves_evaluated, stats.get_branching_factors()
+    (True, 49, [7.0, 7.0])
     """
+    if stats is not None:
+        stats.count_node(game)
     current_player = game.get_current_player()
     last_player = get_opposite_player(current_player)
     # Last player made the root_move. Current player will choose bewteen moves in subtrees
 
+    tablebase_score = None
+    if endgame_tablebase is not None and game.get_winner() is None:
+        tablebase_score = endgame_tablebase.lookup_outcome_score(game, initial_player)
+
     if game.get_winner() is not None:
         # A winner already exists
+        if stats is not None:
+            stats.terminal_hits += 1
         if game.get_winner() == initial_player:
-            return GameTree(root_move, initial_player, last_player, score=1000)
+            return GameTree(root_move, initial_player, last_player, score=WIN_SCORE)
         elif game.get_winner() == get_opposite_player(initial_player):
-            return GameTree(root_move, initial_player, last_player, score=-500)
+            return GameTree(root_move, initial_player, last_player, score=LOSE_SCORE)
         else:
-            # Game draws, so score = 0
-            return GameTree(root_move, initial_player, last_player, score=0)
+            # Game draws
+            return GameTree(root_move, initial_player, last_player, score=DRAW_SCORE)
+
+    elif tablebase_score is not None:
+        # The result of the game with perfect play is already known
+        if stats is not None:
+            stats.terminal_hits += 1
+        return GameTree(root_move, initial_player, last_player, score=tablebase_score)
 
     elif d == 0:
         # Reaches maximum search depth, score the current situation
-        if initial_player == last_player:
+        if leaf_batch is not None:
+            game_tree = GameTree(root_move, initial_player, last_player, score=0)
+            leaf_batch.add(game_tree, game, initial_player != last_player)
+            if stats is not None:
+                stats.leaves_evaluated += 1
+            return game_tree
+        if stats is not None:
+            score = stats.evaluate(score_game, game, initial_player, initial_player != last_player)
+        elif initial_player == last_player:
             score = score_game(game, initial_player, False)
         else:
             score = score_game(game, initial_player, True)
@@ -315,17 +596,25 @@ def generate_complete_tree_to_depth(root_move: str | int, game: ConnectFour, d:
     else:
         # Recursive steps
         game_tree = GameTree(root_move, initial_player, last_player, score=0)
-
-        possible_columns = game.get_possible_columns()
-        for column in possible_columns:
-            new_game = game.copy_and_record_player_move(column)
-            subtree = generate_complete_tree_to_depth(column, new_game, d - 1, initial_player)
+        if stats is not None:
+            stats.count_expansion(game)
+
+        # Each move is played and undone on the same game object. Iterating over the possible columns
+        # is safe because every play is undone (restoring the list) before moving to the next column.
+        for column in game.get_possible_columns():
+            game.play(column)
+            subtree = generate_complete_tree_to_depth(column, game, d - 1, initial_player, leaf_batch,
+                                                      endgame_tablebase, stats)
+            game.undo()
             game_tree.add_subtree(subtree)
 
         return game_tree
 
 
-def update_complete_tree_to_depth(game_tree: GameTree, game: ConnectFour, d: int, initial_player: int) -> None:
+def update_complete_tree_to_depth(game_tree: GameTree, game: ConnectFour, d: int, initial_player: int,
+                                  leaf_batch: Optional[LeafBatch] = None,
+                                  endgame_tablebase: Optional[EndgameTablebase] = None,
+                                  stats: Optional[SearchStats] = None) -> None:
     """ Mutate game_tree to make it a complete game tree to the depth d.
 
     If game_tree has no subtrees, generate subtrees to depth to fulfill the depth requirement.
@@ -334,11 +623,22 @@ def update_complete_tree_to_depth(game_tree: GameTree, game: ConnectFour, d: int
 
     Nothing will be changed if game_tree is already completed to depth d.
 
+    If leaf_batch is not None, the leaves at the maximum depth are added to leaf_batch instead of being
+    scored right away, as in generate_complete_tree_to_depth. Use update_complete_tree_to_depth_batched
+    to also flush leaf_batch and update the scores.
+
+    If endgame_tablebase is not None, leaves found in it are scored from it and never expanded, as in
+    generate_complete_tree_to_depth.
+
+    If stats is not None, every node of the tree is counted in it, as in generate_complete_tree_to_depth. The
+    nodes that already existed are counted as cache hits, since their subtrees are reused.
+
     Preconditions:
         - d >= 0
         - root_move == GAME_START_MOVE or 0 <= root_move < GRID_WIDTH
         - len(game.player_one_moves) == 0 or root_move != GAME_START_MOVE
         - initial_player in {PLAYER_ONE, PLAYER_TWO}
+        - leaf_batch is None or leaf_batch.initial_player == initial_player
 
     >>> game_tree = generate_complete_tree_to_depth(GAME_START_MOVE, ConnectFour(), 3, PLAYER_ONE)
     >>> complete_length = len(game_tree)
@@ -347,140 +647,310 @@ def update_complete_tree_to_depth(game_tree: GameTree, game: ConnectFour, d: int
     True
     """
 
+    if stats is not None:
+        stats.count_node(game)
     if not game_tree.get_subtrees():
         # game_tree is a leaf
         current_player = game.get_current_player()
         last_player = get_opposite_player(current_player)
 
+        tablebase_score = None
+        if endgame_tablebase is not None and game.get_winner() is None:
+            tablebase_score = endgame_tablebase.lookup_outcome_score(game, initial_player)
+
         if game.get_winner() is not None:
+            if stats is not None:
+                stats.terminal_hits += 1
             if game.get_winner() == initial_player:
-                game_tree.score = 1000
+                game_tree.score = WIN_SCORE
             elif game.get_winner() == get_opposite_player(initial_player):
-                game_tree.score = -500
+                game_tree.score = LOSE_SCORE
             else:
-                # Game draws, so score = 0
-                game_tree.score = 0
+                # Game draws
+                game_tree.score = DRAW_SCORE
+
+        elif tablebase_score is not None:
+            if stats is not None:
+                stats.terminal_hits += 1
+            game_tree.score = tablebase_score
 
         elif d == 0:
-            if initial_player == last_player:
+            if leaf_batch is not None:
+                leaf_batch.add(game_tree, game, initial_player != last_player)
+                if stats is not None:
+                    stats.leaves_evaluated += 1
+            elif stats is not None:
+                game_tree.score = stats.evaluate(score_game, game, initial_player, initial_player != last_player)
+            elif initial_player == last_player:
                 game_tree.score = score_game(game, initial_player, False)
             else:
                 game_tree.score = score_game(game, initial_player, True)
 
         elif d > 0:
-            possible_columns = game.get_possible_columns()
-            for column in possible_columns:
-                new_game = game.copy_and_record_player_move(column)
-                subtree = generate_complete_tree_to_depth(column, new_game, d - 1, initial_player)
+            if stats is not None:
+                stats.count_expansion(game)
+            for column in game.get_possible_columns():
+                game.play(column)
+                subtree = generate_complete_tree_to_depth(column, game, d - 1, initial_player, leaf_batch,
+                                                          endgame_tablebase, stats)
+                game.undo()
                 game_tree.add_subtree(subtree)
 
     else:
         # Recurse into next level
+        if stats is not None:
+            stats.cache_hits += 1
+            stats.count_expansion(game)
         for subtree in game_tree.get_subtrees():
-            new_game = game.copy_and_record_player_move(subtree.move_column)
-            update_complete_tree_to_depth(subtree, new_game, d - 1, initial_player)
+            game.play(subtree.move_column)
+            update_complete_tree_to_depth(subtree, game, d - 1, initial_player, leaf_batch, endgame_tablebase,
+                                          stats)
+            game.undo()
         game_tree.update_score()
 
 
-def score_game(game: ConnectFour, player: int, is_moving_next: bool) -> int:
-    """ Score how favorable the game state is to this player, given whether he is moving next.
+def generate_complete_tree_to_depth_batched(root_move: str | int, game: ConnectFour, d: int, initial_player: int,
+                                            batch_size: int = DEFAULT_BATCH_SIZE,
+                                            endgame_tablebase: Optional[EndgameTablebase] = None,
+                                            stats: Optional[SearchStats] = None) -> GameTree:
+    """ Return the same game tree as generate_complete_tree_to_depth, but score the leaves at the maximum
+    depth batch_size at a time with score_boards in batch_evaluation.py instead of one at a time.
 
-    is_moving_next means whether this player will make the next move. This variable is included
-    because this function can be called when player is moving next or when his opponent is moving next.
+    The leaves are scored once the whole tree is generated, and then the scores are updated from the leaves
+    up to the root. endgame_tablebase and stats are used as in generate_complete_tree_to_depth, where the time
+    spent scoring the leaves and updating the scores counts as evaluation time.
 
-    This function evaluates the whole game grid by iterating through all possible 4-in-a-row slices in
-    horizontal, vertical, and two diagonal. The total score returned is the sum of the score of each slice.
+    Preconditions:
+        - d >= 0
+        - batch_size > 0
+        - root_move == GAME_START_MOVE or 0 <= root_move < GRID_WIDTH
+        - len(game.player_one_moves) == 0 or root_move != GAME_START_MOVE
+        - initial_player in {PLAYER_ONE, PLAYER_TWO}
 
-    The center column is also scored and added to the total score since taking up the central column
-    is very crucial to winning the game. This is because any horizontal or slanted 4 connected discs
-    on the grid must have at least one disc in the central column.
+    >>> game_tree = generate_complete_tree_to_depth(GAME_START_MOVE, ConnectFour(), 3, PLAYER_ONE)
+    >>> batched_tree = generate_complete_tree_to_depth_batched(GAME_START_MOVE, ConnectFour(), 3, PLAYER_ONE)
+    >>> str(batched_tree) == str(game_tree)
+    True
+    """
+    leaf_batch = LeafBatch(initial_player, batch_size)
+    game_tree = generate_complete_tree_to_depth(root_move, game, d, initial_player, leaf_batch, endgame_tablebase,
+                                                stats)
+    start = time.perf_counter()
+    leaf_batch.flush()
+    game_tree.update_all_scores()
+    if stats is not None:
+        stats.evaluation_seconds += time.perf_counter() - start
+    return game_tree
+
+
+def update_complete_tree_to_depth_batched(game_tree: GameTree, game: ConnectFour, d: int, initial_player: int,
+                                          batch_size: int = DEFAULT_BATCH_SIZE,
+                                          endgame_tablebase: Optional[EndgameTablebase] = None,
+                                          stats: Optional[SearchStats] = None) -> None:
+    """ Mutate game_tree like update_complete_tree_to_depth, but score the new leaves at the maximum depth
+    batch_size at a time with score_boards in batch_evaluation.py instead of one at a time.
+    endgame_tablebase and stats are used as in update_complete_tree_to_depth, where the time spent scoring the
+    leaves and updating the scores counts as evaluation time.
 
     Preconditions:
-        - player in {PLAYER_ONE, PLAYER_TWO}
+        - d >= 0
+        - batch_size > 0
+        - initial_player in {PLAYER_ONE, PLAYER_TWO}
     """
-    score_so_far = 0
-
-    # Score center column
-    center_array = [row[GRID_WIDTH // 2] for row in game.grid]
-    center_count = center_array.count(player)
-    score_so_far += 6 * center_count
-
-    # Score horizontal
-    for r in range(GRID_HEIGHT):
-        row_array = game.grid[r]
-        for c in range(GRID_WIDTH - 3):
-            grid_slice = row_array[c: c + 4]
-            score_so_far += _score_slice(grid_slice, player, is_moving_next)
-
-    # Score vertical
-    for c in range(GRID_WIDTH):
-        column_array = [row[c] for row in game.grid]
-        for r in range(GRID_HEIGHT - 3):
-            grid_slice = column_array[r: r + 4]
-            score_so_far += _score_slice(grid_slice, player, is_moving_next)
-
-    # Score positive sloped diagonal
-    for r in range(GRID_HEIGHT - 3):
-        for c in range(GRID_WIDTH - 3):
-            grid_slice = [game.grid[r + i][c + i] for i in range(4)]
-            score_so_far += _score_slice(grid_slice, player, is_moving_next)
-
-    # Score negative sloped diagonal
-    for r in range(GRID_HEIGHT - 3):
-        for c in range(GRID_WIDTH - 3):
-            grid_slice = [game.grid[r + 3 - i][c + i] for i in range(4)]
-            score_so_far += _score_slice(grid_slice, player, is_moving_next)
-
-    return score_so_far
-
-
-def _score_slice(grid_slice: list[int], player: int, player_go_next: bool) -> int:
-    """ Score a slice of four discs with respective to the player, given whether he is moving next.
-
-    If the slice contains both player's discs and opponent's discs, we give it a 0, because
-    both parties can't connect four in this slice.
-
-    Otherwise, we give positive scores if player is occupying this slice, and negative scores if opponent is
-    occupying this slice. We give a higher score if more discs are connected. The specific score scheme is
-    stored in the four lists.
-
-    Based on whether player goes next, we value player and opponent's discs differently. If the player
-    goes next, we think attacking is more important. Thus, the absolute value of go_next_player_score is larger
-    than that of go_next_opponent_score. This means that the player's connected discs influence the
-    overall score to a larger extent. If the opponent goes next, we think defending is more important. The
-    scoring scheme is thus opposite to the other case.
+    leaf_batch = LeafBatch(initial_player, batch_size)
+    update_complete_tree_to_depth(game_tree, game, d, initial_player, leaf_batch, endgame_tablebase, stats)
+    start = time.perf_counter()
+    leaf_batch.flush()
+    game_tree.update_all_scores()
+    if stats is not None:
+        stats.evaluation_seconds += time.perf_counter() - start
 
-    Preconditions:
-        - len(grid_slice) = 4
-        - player in {PLAYER_ONE, PLAYER_TWO}
 
-    >>> _score_slice([PLAYER_ONE, PLAYER_TWO, UNOCCUPIED, UNOCCUPIED], PLAYER_ONE, True)
-    0
-    >>> _score_slice([PLAYER_ONE, PLAYER_ONE, UNOCCUPIED, PLAYER_ONE], PLAYER_ONE, True)
-    90
-    >>> _score_slice([PLAYER_ONE, PLAYER_ONE, UNOCCUPIED, PLAYER_ONE], PLAYER_TWO, True)
-    -60
-    >>> _score_slice([UNOCCUPIED, PLAYER_ONE, UNOCCUPIED, PLAYER_ONE], PLAYER_ONE, False)
-    5
-    """
+def search_lazy_tree(game_tree: GameTree, game: ConnectFour, d: int, initial_player: int,
+                     endgame_tablebase: Optional[EndgameTablebase] = None,
+                     should_stop: Optional[Callable[[], bool]] = None,
+                     stats: Optional[SearchStats] = None) -> list[int]:
+    """ Return the best columns of game at the depth d, searching the lazily expanded game tree game_tree.
+
+    The result is the same as the columns of the subtrees with the maximum score (or the minimum score, if
+    initial_player is not moving next) of generate_complete_tree_to_depth(..., game, d, initial_player, ...).
+    But instead of generating the complete tree first, the tree is searched with alpha-beta pruning, and a
+    subtree is only added when the search visits it. Each searched node keeps its score together with the
+    depth of the search and whether the score is exact or a bound, so a node searched to the same depth again
+    is not searched twice, and the scores of earlier searches decide which columns are searched first.
 
-    opponent = get_opposite_player(player)
-    player_count, opponent_count = grid_slice.count(player), grid_slice.count(opponent)
+    So after a move, the subtree of that move can be searched again at the next depth without walking the
+    whole subtree first, like update_complete_tree_to_depth would: only the nodes the new search visits are
+    looked at, and only the ones it visits for the first time are created.
 
-    if player_count != 0 and opponent_count != 0:
-        # The grid contains both player's disc and opponent's disc
-        return 0
+    The root's subtrees that have the best score have exact scores afterwards, and the others have scores
+    that are worse than the best score.
 
-    # Represents the given score if the party hax 0/1/2/3/4 connected discs.
-    go_next_player_score = [0, 0, 8, 90, 100]
-    go_next_opponent_score = [0, 0, -5, -60, -100]
-    not_next_player_score = [0, 0, 5, 60, 100]
-    not_next_opponent_score = [0, 0, -8, -90, 100]
+    If should_stop is not None, it is called at every node searched, and once it returns True, SearchStopped
+    is raised. The nodes searched so far keep their scores, which are still valid for later searches.
 
-    if player_go_next:
-        return go_next_player_score[player_count] + go_next_opponent_score[opponent_count]
+    If stats is not None, every node searched is counted in it (see instrumentation.py), and the nodes whose
+    scores from earlier searches are reused are counted as cache hits.
+
+    game is mutated with play and undo while searching, but it is restored before returning, even when
+    SearchStopped is raised.
+
+    Preconditions:
+        - d >= 1
+        - game.get_winner() is None
+        - game_tree is the game tree of game, i.e. game_tree.get_next_player() == game.get_current_player()
+        - initial_player == game_tree.initial_player
+
+    >>> game = ConnectFour()
+    >>> for column in [3, 3, 4]:
+    ...     game.record_player_move(column)
+    >>> game_tree = GameTree(4, PLAYER_TWO, PLAYER_ONE)
+    >>> complete_tree = generate_complete_tree_to_depth(4, game, 4, PLAYER_TWO)
+    >>> max_score = max(subtree.score for subtree in complete_tree.get_subtrees())
+    >>> best_columns = [subtree.move_column for subtree in complete_tree.get_subtrees() if subtree.score == max_score]
+    >>> search_lazy_tree(game_tree, game, 4, PLAYER_TWO) == best_columns
+    True
+    >>> len(game_tree) < len(complete_tree)
+    True
+    """
+    maximizing = game.get_current_player() == initial_player
+    best_score = -INFINITY if maximizing else INFINITY
+    best_columns = []
+    num_moves = len(game.bitboard.moves)
+    if stats is not None:
+        stats.count_node(game)
+        stats.count_expansion(game)
+
+    for column in _order_lazy_columns(game_tree, game, maximizing):
+        subtree = game_tree.get_or_add_subtree(column)
+        game.play(column)
+        try:
+            # Only exclude the scores strictly worse than the best score so far, to find every best column.
+            if maximizing:
+                score = _search_lazily(subtree, game, d - 1, best_score - 1, INFINITY, endgame_tablebase,
+                                       should_stop, stats)
+            else:
+                score = _search_lazily(subtree, game, d - 1, -INFINITY, best_score + 1, endgame_tablebase,
+                                       should_stop, stats)
+        except SearchStopped:
+            # Undo the moves of the interrupted search.
+            while len(game.bitboard.moves) > num_moves:
+                game.undo()
+            raise
+        game.undo()
+
+        if score == best_score:
+            best_columns.append(column)
+        elif (score > best_score) == maximizing:
+            best_score = score
+            best_columns = [column]
+
+    game_tree.score, game_tree.depth, game_tree.bound = best_score, d, EXACT
+    best_columns.sort()
+    return best_columns
+
+
+def _search_lazily(game_tree: GameTree, game: ConnectFour, d: int, alpha: int, beta: int,
+                   endgame_tablebase: Optional[EndgameTablebase], should_stop: Optional[Callable[[], bool]],
+                   stats: Optional[SearchStats]) -> int:
+    """ Return the minimax score of game at the depth d for game_tree.initial_player, and remember it in
+    game_tree, adding the subtrees that are searched.
+
+    The result is exact if it is strictly between alpha and beta. Otherwise, a result <= alpha is an upper
+    bound and a result >= beta is a lower bound of the exact score, as in AlphaBetaSearch.
+
+    Raise SearchStopped if should_stop is not None and returns True. game is not restored in that case.
+    stats is filled in as described in search_lazy_tree, if it is not None.
+
+    Preconditions:
+        - d >= 0
+        - alpha < beta
+        - game_tree is the game tree of game
+    """
+    if should_stop is not None and should_stop():
+        raise SearchStopped
+    if stats is not None:
+        stats.count_node(game)
+    if game_tree.depth == FINAL_DEPTH:
+        if stats is not None:
+            stats.terminal_hits += 1
+        return game_tree.score
+    if game_tree.depth == d and (game_tree.bound == EXACT
+                                 or (game_tree.bound == LOWER_BOUND and game_tree.score >= beta)
+                                 or (game_tree.bound == UPPER_BOUND and game_tree.score <= alpha)):
+        if stats is not None:
+            stats.cache_hits += 1
+        return game_tree.score
+
+    initial_player = game_tree.initial_player
+    winner = game.get_winner()
+    final_score = None
+    if winner is not None:
+        if winner == initial_player:
+            final_score = WIN_SCORE
+        elif winner == get_opposite_player(initial_player):
+            final_score = LOSE_SCORE
+        else:
+            final_score = DRAW_SCORE
+    elif endgame_tablebase is not None:
+        final_score = endgame_tablebase.lookup_outcome_score(game, initial_player)
+
+    if final_score is not None:
+        if stats is not None:
+            stats.terminal_hits += 1
+        game_tree.score, game_tree.depth, game_tree.bound = final_score, FINAL_DEPTH, EXACT
+        return final_score
+
+    maximizing = game.get_current_player() == initial_player
+    if d == 0:
+        if stats is not None:
+            score = stats.evaluate(score_game, game, initial_player, maximizing)
+        else:
+            score = score_game(game, initial_player, maximizing)
+        game_tree.score, game_tree.depth, game_tree.bound = score, 0, EXACT
+        return score
+
+    if stats is not None:
+        stats.count_expansion(game)
+
+    original_alpha, original_beta = alpha, beta
+    value = -INFINITY if maximizing else INFINITY
+    for column in _order_lazy_columns(game_tree, game, maximizing):
+        subtree = game_tree.get_or_add_subtree(column)
+        game.play(column)
+        score = _search_lazily(subtree, game, d - 1, alpha, beta, endgame_tablebase, should_stop, stats)
+        game.undo()
+
+        if maximizing and score > value:
+            value = score
+            alpha = max(alpha, value)
+        elif not maximizing and score < value:
+            value = score
+            beta = min(beta, value)
+        if alpha >= beta:
+            break
+
+    if value <= original_alpha:
+        game_tree.bound = UPPER_BOUND
+    elif value >= original_beta:
+        game_tree.bound = LOWER_BOUND
     else:
-        return not_next_player_score[player_count] + not_next_opponent_score[opponent_count]
+        game_tree.bound = EXACT
+    game_tree.score, game_tree.depth = value, d
+    return value
+
+
+def _order_lazy_columns(game_tree: GameTree, game: ConnectFour, maximizing: bool) -> list[int]:
+    """ Return the possible columns of game in the order they should be searched in the lazily expanded
+    game_tree: first the columns of the subtrees searched before, from the best score to the worst, and then
+    the other columns from the center outwards.
+    """
+    searched = [subtree for subtree in game_tree.get_subtrees() if subtree.depth != UNSEARCHED_DEPTH]
+    searched.sort(key=lambda subtree: subtree.score, reverse=maximizing)
+    searched_columns = [subtree.move_column for subtree in searched]
+    possible_columns = game.get_possible_columns()
+    return searched_columns + [column for column in CENTER_ORDER
+                               if column in possible_columns and column not in searched_columns]
 
 
 if __name__ == '__main__':
@@ -492,6 +962,8 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 120,
         'max-nested-blocks': 4,
-        'extra-imports': ['__future__', 'typing', 'random', 'connect_four', 'game_tree', 'constant'],
+        'extra-imports': ['__future__', 'typing', 'random', 'threading', 'time', 'connect_four', 'game_tree',
+                          'constant', 'search', 'evaluation', 'batch_evaluation', 'opening_book', 'endgame',
+                          'move_ordering', 'instrumentation'],
         'disable': ['unused-import'],
     })
@@ -6,6 +6,10 @@ Module Description
 This module contains a main class GameRunner which represents the manipulation of the game
 that runs in the pygame interface, with two functions run_game_interactive() and
 run_game_between_ai() that represent two different types of runners.
+
+The AI player of a GameRunner chooses its moves (and hints) on a background thread, so the window keeps
+being redrawn and handling events while the AI is thinking. The main loop calls GameRunner.update every
+frame to pick up the AI's move once it is ready.
 By reading the *docstring* of this file, you can gain insights into the
 role and functionality of this class and functions
 as well as how they contribute to this project as a whole.
@@ -21,13 +25,18 @@ expressly prohibited.
 This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
 """
 from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import traceback
 import pygame
 from connect_four import ConnectFour
-from player import Player, RandomPlayer, GreedyPlayer, ScoringPlayer
-from interface import Button, GameBoard, Disc, Label
+from player import Player, RandomPlayer, GreedyPlayer, ScoringPlayer, generate_complete_tree_to_depth
+from search_player import AlphaBetaPlayer, SolverPlayer, MCTSPlayer
+from opening_book import OpeningBook, load_default_opening_book
+from interface import Button, GameBoard, Disc, Label, FONT_WORDS, FONT_WIN_STATUS, get_font
 from constant import GAME_NOT_STARTED, GAMING, GAME_OVER, UNOCCUPIED, PLAYER_ONE, PLAYER_TWO, HINT, \
     SQUARESIZE, GRID_WIDTH, WINDOW_WIDTH, WINDOW_HEIGHT, \
-    FONT_WORDS, FONT_WIN_STATUS, BLACK, LIGHT_BLUE, WHITE
+    BLACK, LIGHT_BLUE, WHITE
 
 
 class GameRunner:
@@ -43,8 +52,16 @@ class GameRunner:
         - gane_status: an integer representing the state of the game, which is one of GAME_NOT_STARTED,
         GAMING, and GAME_OVER.
         - game: a ConnecFour instance representing the current game.
-        - ai_player: Either None or a GreedyPlayer that represents the AI our user is competing against.
+        - ai_player: Either None or a GreedyPlayer (or a SolverPlayer) that represents the AI our user is competing
+        against.
         - ai_search_depth: an integer representing the depth of the GameTree the AI player uses to make decisions.
+        - ai_time_limit_ms: an integer representing the maximum number of milliseconds the AI player may take to
+        make a move, or None if there is no time limit. With a time limit, ai_search_depth is the maximum depth.
+        - ai_uses_solver: a boolean value indicating if the AI is a SolverPlayer, which plays perfectly once it can
+        solve the game, instead of a GreedyPlayer. Its fallback player searches to ai_search_depth.
+        - ai_opening_book: the OpeningBook the AI player (or the fallback player of a SolverPlayer, since its
+        scores are not exact) chooses its first moves from, or None if it has none. Since the AI player does not
+        search (or generate its game tree) while the game is in the opening book, starting a game is instant.
         - user_goes_first: a boolean value indicating if the user goes first.
 
     Private instance attributes:
@@ -62,12 +79,22 @@ class GameRunner:
         - _notice_lable: a Label instance representing the instructions that appears on top of our
         interactive interface.
         - _win_label: a Label instance representing the winning message that is displayed once the game ends.
-
+        - _executor: a pool of one thread on which the AI player chooses its moves and hints, one at a time.
+        - _ai_move_future: the future of the AI's move being chosen, or None if the AI is not choosing a move.
+        - _hint_future: the future of the hint being chosen, or None if no hint is being chosen.
+        - _stop_event: the event that stops the AI player's search (and its pondering) when it is set. A new event
+        is created for every game, since the AI player of a stopped game is not used again.
+
+    Representation Invariants:
+        - self._ai_move_future is None or self._hint_future is None
     """
     game_status: int
     game: ConnectFour
-    ai_player: Optional[GreedyPlayer]
+    ai_player: Optional[GreedyPlayer | SolverPlayer]
     ai_search_depth: int
+    ai_time_limit_ms: Optional[int]
+    ai_uses_solver: bool
+    ai_opening_book: Optional[OpeningBook]
     user_goes_first: Optional[bool]
     _winner: Optional[int]
     _me_first_button: Button
@@ -79,17 +106,31 @@ class GameRunner:
     _legend: list[Disc | Label]
     _notice_label: Label
     _win_label: Label
+    _executor: ThreadPoolExecutor
+    _ai_move_future: Optional[Future]
+    _hint_future: Optional[Future]
+    _stop_event: threading.Event
 
-    def __init__(self, ai_search_depth: int) -> None:
+    def __init__(self, ai_search_depth: int, ai_time_limit_ms: Optional[int] = None,
+                 ai_uses_solver: bool = False, ai_uses_opening_book: bool = False) -> None:
         """
         Initializes the GameRunner.
+
+        If ai_uses_opening_book is True, the opening book shipped with the game is loaded, if it exists.
         """
         self.game_status = GAME_NOT_STARTED
         self.game = ConnectFour()
         self.ai_player = None
         self.ai_search_depth = ai_search_depth
+        self.ai_time_limit_ms = ai_time_limit_ms
+        self.ai_uses_solver = ai_uses_solver
+        self.ai_opening_book = load_default_opening_book() if ai_uses_opening_book else None
         self.user_goes_first = None
         self._winner = None
+        self._executor = ThreadPoolExecutor(1)
+        self._ai_move_future = None
+        self._hint_future = None
+        self._stop_event = threading.Event()
 
         self._me_first_button = Button(x=10 * SQUARESIZE, y=2 * SQUARESIZE, word='I go first')
         self._ai_first_button = Button(x=10 * SQUARESIZE, y=4 * SQUARESIZE, word='AI go first')
@@ -103,20 +144,61 @@ class GameRunner:
         player_one_disc = Disc(int(SQUARESIZE * 2.5), (2 + GRID_WIDTH) * SQUARESIZE, PLAYER_ONE)
         player_two_disc = Disc(int(SQUARESIZE * 6.5), (2 + GRID_WIDTH) * SQUARESIZE, PLAYER_TWO)
         player_one_label = Label((int(SQUARESIZE * 2.5), int((2.5 + GRID_WIDTH) * SQUARESIZE)), 'Player One',
-                                 (FONT_WORDS, BLACK))
+                                 (get_font(FONT_WORDS), BLACK))
         player_two_label = Label((int(SQUARESIZE * 6.5), int((2.5 + GRID_WIDTH) * SQUARESIZE)), 'Player Two',
-                                 (FONT_WORDS, BLACK))
+                                 (get_font(FONT_WORDS), BLACK))
         self._legend = [player_one_disc, player_two_disc, player_one_label, player_two_label]
 
         self._notice_label = Label((SQUARESIZE, SQUARESIZE), 'Choose if you want to go first or last!',
-                                   (FONT_WORDS, BLACK))
+                                   (get_font(FONT_WORDS), BLACK))
         self._win_label = Label((WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - int(0.5 * SQUARESIZE)), '',
-                                (FONT_WIN_STATUS, BLACK),
+                                (get_font(FONT_WIN_STATUS), BLACK),
                                 background=(pygame.Rect(0, WINDOW_HEIGHT // 2 - SQUARESIZE, WINDOW_WIDTH, SQUARESIZE),
                                             LIGHT_BLUE))
         self._notice_label.align = 'left'
         self._win_label.visible = False
 
+    def update(self) -> None:
+        """
+        Record the AI's move or show the hint if the AI has finished choosing it. Called once every frame.
+        """
+        if self._ai_move_future is not None and self._ai_move_future.done():
+            ai_move_column = _get_result(self._ai_move_future)
+            self._ai_move_future = None
+            if ai_move_column is None:
+                # The AI player failed, so the game cannot go on.
+                self._show_ai_error()
+                return
+            self._notice_label.update_text('')
+            self._record_move(ai_move_column, 'AI')
+            self._update_disabled()
+            if self._game_over():
+                self._show_winner()
+
+        elif self._hint_future is not None and self._hint_future.done():
+            hint_column = _get_result(self._hint_future)
+            self._hint_future = None
+            if hint_column is None:
+                # The failed search may have left the AI player in a broken state, so it is replaced by a new one.
+                self.ai_player = self._create_ai_player(self.ai_player.player_num)
+                self._notice_label.update_text('The AI could not find a hint.')
+            else:
+                hint_position = self.game.get_move_position_by_column(hint_column)
+                self._game_board.record_move(hint_position, HINT)
+                self._notice_label.update_text('')
+            self._update_disabled()
+
+        elif self._is_thinking():
+            # Animate the dots of the thinking message, with a new dot every half second.
+            self._notice_label.update_text('AI is thinking' + '.' * (pygame.time.get_ticks() // 500 % 4))
+
+    def close(self) -> None:
+        """
+        Stop the AI player if it is thinking or pondering, and stop the background thread.
+        """
+        self._stop_ai()
+        self._executor.shutdown(wait=False)
+
     def draw(self, surface: pygame.Surface) -> None:
         """
         Draws surface, which is the current pygame surface display of the game.
@@ -153,7 +235,7 @@ class GameRunner:
             self._start_gaming('AI')
             # AI makes the first move
             self.draw(surface)
-            self._ai_makes_move()
+            self._start_ai_move()
 
         # Press hint button
         elif self._hint_button.is_valid_click(position):
@@ -171,15 +253,13 @@ class GameRunner:
                 # The move is not valid (i.e., the chosen column is full).
                 return
 
-            # Draw user's move first, because AI takes some time to make move
+            # Draw user's move before the AI starts thinking
             self.draw(surface)
-            if not self._game_over():
-                # AI makes move if player doesn't win
-                self._ai_makes_move()
-
-            # Handle game over case
             if self._game_over():
                 self._show_winner()
+            else:
+                # AI makes move if player doesn't win. The move is recorded by update once it is chosen.
+                self._start_ai_move()
 
     def _handle_mouse_motion(self, position: tuple[int, int]) -> None:
         """
@@ -207,27 +287,61 @@ class GameRunner:
             - first_player == 'User' or first_player == 'AI'
         """
         if first_player == 'User':
-            self.ai_player = GreedyPlayer(PLAYER_TWO, self.ai_search_depth, None)
+            self.ai_player = self._create_ai_player(PLAYER_TWO)
             self.user_goes_first = True
         elif first_player == 'AI':
-            self.ai_player = GreedyPlayer(PLAYER_ONE, self.ai_search_depth, None)
+            self.ai_player = self._create_ai_player(PLAYER_ONE)
             self.user_goes_first = False
 
         self.game_status = GAMING
         self._update_disabled()
         self._notice_label.update_text('')
 
+    def _create_ai_player(self, player_num: int) -> GreedyPlayer | AlphaBetaPlayer | SolverPlayer:
+        """
+        Return a new AI player with the given player number, according to ai_uses_solver and ai_time_limit_ms.
+
+        If the game has started, the game tree of a new GreedyPlayer is generated from the current game state, so
+        that the player can carry on the game.
+
+        Preconditions:
+            - player_num in {PLAYER_ONE, PLAYER_TWO}
+        """
+        should_stop = self._stop_event.is_set
+        if not self.ai_uses_solver:
+            # A GreedyPlayer has no time limit, so an AlphaBetaPlayer is used when there is one. It ponders on the
+            # user's time (through its transposition table), so its answers are often ready right away.
+            if self.ai_time_limit_ms is not None:
+                return AlphaBetaPlayer(player_num, self.ai_search_depth, time_limit_ms=self.ai_time_limit_ms,
+                                       opening_book=self.ai_opening_book, should_stop=should_stop, ponder=True)
+            last_move = self.game.get_last_move()
+            if last_move is None or self.ai_opening_book is not None:
+                game_tree = None
+            else:
+                game_tree = generate_complete_tree_to_depth(last_move[1][0], self.game, self.ai_search_depth,
+                                                            player_num)
+            return GreedyPlayer(player_num, self.ai_search_depth, game_tree, opening_book=self.ai_opening_book)
+
+        # The opening book holds heuristic scores, so only the fallback player, used when the game cannot be
+        # solved in time, plays from it.
+        fallback = AlphaBetaPlayer(player_num, self.ai_search_depth, time_limit_ms=self.ai_time_limit_ms,
+                                   opening_book=self.ai_opening_book, should_stop=should_stop)
+        if self.ai_time_limit_ms is None:
+            return SolverPlayer(player_num, fallback=fallback, should_stop=should_stop)
+        return SolverPlayer(player_num, time_limit_ms=self.ai_time_limit_ms, fallback=fallback,
+                            should_stop=should_stop)
+
     def _hint(self) -> None:
         """
-        Update the game grid with a hint location where the user can choose to drop the piece, so the display can be
-        updated consequently.
+        Start choosing a hint location where the user can choose to drop the piece on the background thread.
+        The game grid is updated with it by update once it is chosen.
         """
-        hint_column = self.ai_player.hint_opponent(self.game)
-        hint_position = self.game.get_move_position_by_column(hint_column)
-        self._game_board.record_move(hint_position, HINT)
+        self._hint_future = self._executor.submit(self.ai_player.hint_opponent, self.game.copy())
+        self._update_disabled()
 
     def _restart(self) -> None:
-        """ Reset the game to the condition same as when it started."""
+        """ Reset the game to the condition same as when it started, stopping the AI if it is thinking."""
+        self._stop_ai()
         self.game = ConnectFour()
         self.ai_player = None
         self.user_goes_first = None
@@ -239,10 +353,29 @@ class GameRunner:
         self._game_board = GameBoard(SQUARESIZE, 2 * SQUARESIZE)
         self._hover_disc = Disc(SQUARESIZE, int(1.5 * SQUARESIZE), UNOCCUPIED)
 
-    def _ai_makes_move(self) -> None:
-        """Let the AI player make a move and record it."""
-        ai_move_column = self.ai_player.choose_column(self.game)
-        self._record_move(ai_move_column, 'AI')
+    def _start_ai_move(self) -> None:
+        """Let the AI player start choosing its move on the background thread. The move is recorded by update
+        once it is chosen.
+
+        The AI player is given a copy of the game, since it plays and undoes moves while searching.
+        """
+        self._ai_move_future = self._executor.submit(self.ai_player.choose_column, self.game.copy())
+        self._update_disabled()
+
+    def _is_thinking(self) -> bool:
+        """Return whether the AI player is choosing a move or a hint."""
+        return self._ai_move_future is not None or self._hint_future is not None
+
+    def _stop_ai(self) -> None:
+        """Stop the AI player if it is choosing a move or a hint (and forget the result) or pondering.
+
+        The AI player must not be used afterwards, since its search may have been stopped in the middle.
+        """
+        if self.ai_player is not None:
+            self._stop_event.set()
+            self._stop_event = threading.Event()
+            self._ai_move_future = None
+            self._hint_future = None
 
     def _user_makes_move(self, mouse_position: tuple[int, int]) -> bool:
         """
@@ -303,6 +436,16 @@ class GameRunner:
         self._notice_label.update_text('Press Restart for a new game!')
         self._hover_disc.update_color_and_type(UNOCCUPIED)
 
+    def _show_ai_error(self) -> None:
+        """Display a notice that the AI player failed to choose a move, and end the game.
+
+        Update the game_status to GAME_OVER status.
+        """
+        self.game_status = GAME_OVER
+        self._update_disabled()
+        self._notice_label.update_text('The AI failed to choose a move. Press Restart for a new game!')
+        self._hover_disc.update_color_and_type(UNOCCUPIED)
+
     def _update_disabled(self) -> None:
         """
         Update the four buttons‘ disabled attribute and gameboard's disabled attribute according to self.game_status.
@@ -316,9 +459,10 @@ class GameRunner:
         elif self.game_status == GAMING:
             self._me_first_button.disabled = True
             self._ai_first_button.disabled = True
-            self._hint_button.disabled = False
+            # The user waits for the AI while it is thinking.
+            self._hint_button.disabled = self._is_thinking()
             self._restart_button.disabled = False
-            self._game_board.disabled = False
+            self._game_board.disabled = self._is_thinking()
         elif self.game_status == GAME_OVER:
             self._me_first_button.disabled = True
             self._ai_first_button.disabled = True
@@ -417,18 +561,39 @@ def run_game_between_ai() -> None:
 def _get_player_from_console(player_number: int) -> Player:
     """
     Returns the type of AI Player that user chooses in console. A user input of 1 indicates Random Player, 2 indicates
-    Scoring Player, 3 indicates Greedy Player. Whether this AI player goes first will be dependent on player_number.
+    Scoring Player, 3 indicates Greedy Player, 4 indicates Alpha-Beta Player, 5 indicates Solver Player, 6 indicates
+    MCTS Player.
+    Whether this AI player goes first will be dependent on player_number.
     Player_number == PLAYER_ONE indicates AI goes first, Player_number == PLAYER_TWO indicates AI goes second.
     """
-    print('Please choose an AI Player. Enter a number from 1 to 3.')
-    player_type = int(input('1 = Random Player, 2 = Scoring Player, 3 = Greedy Player'))
-    while player_type < 1 or player_type > 3:
-        player_type = int(input('Invalid input. Please enter a number from 1 to 3.'))
+    print('Please choose an AI Player. Enter a number from 1 to 6.')
+    player_type = int(input('1 = Random Player, 2 = Scoring Player, 3 = Greedy Player, 4 = Alpha-Beta Player, '
+                            '5 = Solver Player, 6 = MCTS Player'))
+    while player_type < 1 or player_type > 6:
+        player_type = int(input('Invalid input. Please enter a number from 1 to 6.'))
 
     if player_type == 1:
         return RandomPlayer(player_number)
     elif player_type == 2:
         return ScoringPlayer(player_number)
+    elif player_type == 4:
+        print('Please enter a positive integer as the search depth of the Alpha-Beta Player.')
+        search_depth = int(input('If the number is too large (>= 9), it may take a long time to compute a result.'))
+        while search_depth <= 0:
+            search_depth = int(input('Invalid input. Please enter a positive integer.'))
+        return AlphaBetaPlayer(player_number, search_depth)
+    elif player_type == 5:
+        print('Please enter a positive integer as the number of milliseconds the Solver Player may take to solve the')
+        time_limit_ms = int(input('game. If it cannot solve the game in time, it plays like an Alpha-Beta Player.'))
+        while time_limit_ms <= 0:
+            time_limit_ms = int(input('Invalid input. Please enter a positive integer.'))
+        return SolverPlayer(player_number, time_limit_ms=time_limit_ms)
+    elif player_type == 6:
+        time_limit_ms = int(input('Please enter a positive integer as the number of milliseconds the MCTS Player may '
+                                  'take to choose a move.'))
+        while time_limit_ms <= 0:
+            time_limit_ms = int(input('Invalid input. Please enter a positive integer.'))
+        return MCTSPlayer(player_number, time_limit_ms=time_limit_ms)
     else:
         print('Please enter a positive integer as the search depth of the Greedy Player.')
         search_depth = int(input('If the number is too large (>= 6), it may take a long time to compute a result.'))
@@ -437,6 +602,22 @@ def _get_player_from_console(player_number: int) -> Player:
         return GreedyPlayer(player_number, search_depth, None)
 
 
+def _get_result(future: Future) -> Optional[int]:
+    """Return the column chosen by the AI player in future, or None if the AI player raised an exception.
+
+    The exception is printed to stderr instead of being raised in the main loop, so that a failing search
+    does not close the window. The caller tells the user that the AI player failed.
+
+    Preconditions:
+        - future.done()
+    """
+    error = future.exception()
+    if error is not None:
+        traceback.print_exception(error)
+        return None
+    return future.result()
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(verbose=True)
@@ -445,7 +626,8 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 120,
         'max-nested-blocks': 4,
-        'extra-imports': ['typing', 'pygame', 'connect_four', 'player', 'interface', 'constant'],
+        'extra-imports': ['typing', 'concurrent.futures', 'threading', 'traceback', 'pygame', 'connect_four',
+                          'player', 'search_player', 'opening_book', 'interface', 'constant'],
         'disable': ['no-member', 'too-many-instance-attributes'],
         'allowed-io': ['run_game_interactive', 'run_game_between_ai', '_get_player_from_console']
     })
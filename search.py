@@ -0,0 +1,464 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Search)
+
+Module Description
+==================
+
+This module contains an AlphaBetaSearch class, a search engine that finds the best columns for a
+Connect 4 game state without building a GameTree.
+
+The engine computes the same minimax scores as generate_complete_tree_to_depth in player.py: finished
+games are scored with WIN_SCORE, LOSE_SCORE or DRAW_SCORE, and game states at the maximum depth are
+scored with an evaluation function, all from the point of view of the initial player. The difference is
+that it walks the game tree depth-first on a single ConnectFour object (using play and undo), and it
+stops searching a branch as soon as it is known that the branch cannot change the result (alpha-beta
+pruning). It can also remember searched game states in a transposition table. Since the scores are not
+symmetric between the two players (a win is worth more than a loss costs), this is a minimax alpha-beta
+search rather than a negamax one.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+import time
+from connect_four import ConnectFour, get_opposite_player
+from bitboard import mirror_column
+from constant import WIN_SCORE, LOSE_SCORE, DRAW_SCORE, EXACT, LOWER_BOUND, UPPER_BOUND
+from transposition import TranspositionTable
+from move_ordering import MoveOrdering
+from evaluation import IncrementalEvaluator
+from endgame import EndgameTablebase
+from instrumentation import SearchStats
+
+# A score larger than any score a game state can get.
+INFINITY = 1 << 30
+
+# The clock (and the stop function) is checked once every this many nodes (plus one) while searching.
+_TIME_CHECK_MASK = 255
+
+
+class _SearchTimeout(Exception):
+    """Raised inside a search when its time limit is reached."""
+
+
+class SearchStopped(Exception):
+    """Raised by AlphaBetaSearch.search when the search is stopped by the stop function of the engine."""
+
+
+class AlphaBetaSearch:
+    """A minimax search engine with alpha-beta pruning.
+
+    Instance Attributes:
+        - nodes: The number of game states visited by the last call to search or iterative_deepening.
+        - completed_depth: The depth of the last search that was completed by iterative_deepening.
+        - stats: The SearchStats every game state searched is counted in (see instrumentation.py), or None if
+        the searches are not instrumented. Transposition table cutoffs are counted as cache hits.
+
+    Private Instance Attributes:
+        - _evaluate: The function that scores a game state at the maximum depth. It is called as
+        _evaluate(game, initial_player, is_moving_next), like score_game in evaluation.py.
+        - _incremental: Whether _evaluate is an IncrementalEvaluator, which must be told about every disc
+        played and undone.
+        - _transposition_table: The table remembering searched game states, or None if there is none.
+        - _move_ordering: The order in which the possible columns of each game state are searched.
+        - _endgame_tablebase: The tablebase of exact results of game states near the end of the game, or
+        None if there is none.
+        - _should_stop: The function called while searching to ask whether the search must stop, or None
+        if there is none.
+        - _deadline: The time.perf_counter() value at which the current search must stop, or None if
+        it has no time limit.
+        - _stoppable: Whether the current search is stopped when _should_stop returns True.
+
+    Representation Invariants:
+        - self.nodes >= 0
+    """
+    nodes: int
+    completed_depth: int
+    stats: Optional[SearchStats]
+    _evaluate: Callable[[ConnectFour, int, bool], int]
+    _incremental: bool
+    _transposition_table: Optional[TranspositionTable]
+    _move_ordering: MoveOrdering
+    _endgame_tablebase: Optional[EndgameTablebase]
+    _should_stop: Optional[Callable[[], bool]]
+    _deadline: Optional[float]
+    _stoppable: bool
+
+    def __init__(self, evaluate: Callable[[ConnectFour, int, bool], int],
+                 transposition_table: Optional[TranspositionTable] = None,
+                 move_ordering: Optional[MoveOrdering] = None,
+                 endgame_tablebase: Optional[EndgameTablebase] = None,
+                 should_stop: Optional[Callable[[], bool]] = None) -> None:
+        """Initialize a search engine that scores the game states at the maximum depth with evaluate.
+
+        evaluate can be an IncrementalEvaluator, in which case the engine keeps it up to date as it plays and
+        undoes moves, so that scoring a game state only takes a lookup.
+
+        If transposition_table is not None, it is used to avoid searching the same game state twice, both
+        within one search and across searches. Its scores are only reused for searches of the same depth,
+        so the results are the same as without a table. Game states are stored under their canonical key
+        (see ConnectFour.get_canonical_key), so a game state and its mirror image share one entry.
+
+        If move_ordering is None, a MoveOrdering with all heuristics turned on is used. The move ordering
+        never changes the results, only the number of game states visited.
+
+        If endgame_tablebase is not None, a game state found in it is not searched any further: it is scored
+        with WIN_SCORE, LOSE_SCORE or DRAW_SCORE as if the game was over, since that is how it ends with
+        perfect play. This can change the results, but only by replacing estimates with exact results.
+
+        If should_stop is not None, it is called every few hundred game states while searching (for example,
+        it can be the is_set method of a threading.Event set by another thread). Once it returns True, search
+        raises SearchStopped, and iterative_deepening returns its deepest completed result, as if its time
+        limit was reached.
+        """
+        self.nodes = 0
+        self.completed_depth = 0
+        self.stats = None
+        self._evaluate = evaluate
+        self._incremental = isinstance(evaluate, IncrementalEvaluator)
+        self._transposition_table = transposition_table
+        if move_ordering is not None:
+            self._move_ordering = move_ordering
+        else:
+            self._move_ordering = MoveOrdering()
+        self._endgame_tablebase = endgame_tablebase
+        self._should_stop = should_stop
+        self._deadline = None
+        self._stoppable = False
+
+    def get_transposition_table(self) -> Optional[TranspositionTable]:
+        """Return the transposition table of this engine, or None if there is none."""
+        return self._transposition_table
+
+    def iterative_deepening(self, game: ConnectFour, max_depth: int, initial_player: int,
+                            time_limit_ms: int) -> tuple[int, list[int]]:
+        """Search game to the depths 1, 2, ..., max_depth until time_limit_ms milliseconds have passed,
+        and return the result of search for the deepest depth that was completed.
+
+        The best columns of each depth are searched first at the next depth, which makes the deeper searches
+        prune more. The depth 1 search is always completed, so there is always a result. The depth of the
+        returned result is stored in self.completed_depth.
+
+        game is mutated with play and undo while searching, but it is restored before returning, even
+        when a search is stopped in the middle.
+
+        Preconditions:
+            - max_depth >= 1
+            - time_limit_ms >= 0
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+        """
+        deadline = time.perf_counter() + time_limit_ms / 1000
+        num_moves = len(game.bitboard.moves)
+
+        self._new_search(game)
+        result = self._search_root(game, 1, initial_player, None)
+        self.completed_depth = 1
+
+        for d in range(2, max_depth + 1):
+            best_columns = result[1]
+            column_order = best_columns + [column for column in game.get_possible_columns()
+                                           if column not in best_columns]
+            self._deadline = deadline
+            self._stoppable = self._should_stop is not None
+            try:
+                result = self._search_root(game, d, initial_player, column_order)
+            except (_SearchTimeout, SearchStopped):
+                self._undo_to(game, num_moves)
+                break
+            finally:
+                self._deadline = None
+                self._stoppable = False
+            self.completed_depth = d
+
+        return result
+
+    def search(self, game: ConnectFour, d: int, initial_player: int,
+               column_order: Optional[list[int]] = None) -> tuple[int, list[int]]:
+        """Search game to the depth d and return a tuple (score, best_columns).
+
+        score is the minimax score of game for initial_player. If initial_player moves next, best_columns
+        are all the possible columns with the maximum score. Otherwise, best_columns are all the possible
+        columns with the minimum score, i.e. the best columns for the opponent of initial_player.
+
+        These are exactly the subtrees with the maximum (or minimum) score of the game tree returned by
+        generate_complete_tree_to_depth(..., game, d, initial_player). To keep all the columns tied for
+        the best score, each root column is searched with a window that only excludes scores strictly
+        worse than the best score so far.
+
+        If column_order is not None, the possible columns are searched in that order instead of the order
+        given by the move ordering. This does not change the result, but searching the best columns first
+        makes the search faster.
+
+        game is mutated with play and undo while searching, but it is restored before returning, even
+        when SearchStopped is raised.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        num_moves = len(game.bitboard.moves)
+        self._new_search(game)
+        self._stoppable = self._should_stop is not None
+        try:
+            return self._search_root(game, d, initial_player, column_order)
+        except SearchStopped:
+            self._undo_to(game, num_moves)
+            raise
+        finally:
+            self._stoppable = False
+
+    def _new_search(self, game: ConnectFour) -> None:
+        """Reset the node count and tell the evaluator, transposition table and move ordering that a new search
+        of game starts."""
+        self.nodes = 0
+        if self._incremental:
+            self._evaluate.reset(game)
+        if self._transposition_table is not None:
+            self._transposition_table.new_search()
+        self._move_ordering.new_search()
+
+    def _search_root(self, game: ConnectFour, d: int, initial_player: int,
+                     column_order: Optional[list[int]]) -> tuple[int, list[int]]:
+        """Search game to the depth d and return a tuple (score, best_columns), as described in search.
+
+        Preconditions:
+            - d >= 1
+            - game.get_winner() is None
+            - initial_player in {PLAYER_ONE, PLAYER_TWO}
+            - column_order is None or sorted(column_order) == game.get_possible_columns()
+        """
+        self.nodes += 1
+        if self.stats is not None:
+            self.stats.count_node(game)
+            self.stats.count_expansion(game)
+        maximizing = game.get_current_player() == initial_player
+        best_score = -INFINITY if maximizing else INFINITY
+        best_columns = []
+
+        if column_order is None:
+            column_order = self._move_ordering.order(game.get_possible_columns(), len(game.bitboard.moves),
+                                                     game.get_current_player(), -1)
+
+        for column in column_order:
+            self._play(game, column)
+            if maximizing:
+                score = self._alpha_beta(game, d - 1, best_score - 1, INFINITY, initial_player)
+            else:
+                score = self._alpha_beta(game, d - 1, -INFINITY, best_score + 1, initial_player)
+            self._undo(game)
+
+            if score == best_score:
+                best_columns.append(column)
+            elif (score > best_score) == maximizing:
+                best_score = score
+                best_columns = [column]
+
+        best_columns.sort()
+        return (best_score, best_columns)
+
+    def _play(self, game: ConnectFour, column: int) -> None:
+        """Play column in game, and update the evaluator if it is incremental."""
+        if self._incremental:
+            self._evaluate.add_disc(column, game.bitboard.heights[column], game.get_current_player())
+        game.play(column)
+
+    def _undo(self, game: ConnectFour) -> None:
+        """Undo the last move of game, and update the evaluator if it is incremental."""
+        column = game.undo()
+        if self._incremental:
+            self._evaluate.remove_disc(column, game.bitboard.heights[column], game.get_current_player())
+
+    def _undo_to(self, game: ConnectFour, num_moves: int) -> None:
+        """Undo the moves of game played after its first num_moves moves, such as those of an interrupted search.
+
+        Preconditions:
+            - 0 <= num_moves <= len(game.bitboard.moves)
+        """
+        for _ in range(len(game.bitboard.moves) - num_moves):
+            self._undo(game)
+
+    def _alpha_beta(self, game: ConnectFour, d: int, alpha: int, beta: int, initial_player: int) -> int:
+        """Return the minimax score of game for initial_player when searched to the depth d.
+
+        The result is exact if it is strictly between alpha and beta. Otherwise, a result <= alpha is an
+        upper bound and a result >= beta is a lower bound of the exact score (fail-soft alpha-beta).
+
+        Preconditions:
+            - d >= 0
+            - alpha < beta
+        """
+        self.nodes += 1
+        if self.nodes & _TIME_CHECK_MASK == 0:
+            self._check_time()
+        if self.stats is not None:
+            self.stats.count_node(game)
+
+        terminal_score = self._get_terminal_score(game, initial_player)
+        if terminal_score is not None:
+            return terminal_score
+
+        table = self._transposition_table
+        key, mirrored, hash_column = 0, False, -1
+        if table is not None:
+            # The scores depend on initial_player, so it is part of the key.
+            canonical_key, mirrored = game.get_canonical_key()
+            key = (canonical_key << 1) | initial_player
+            entry = table.probe(key)
+            if entry is not None:
+                if entry[0] == d and _is_within_bound(entry[1], entry[2], alpha, beta):
+                    if self.stats is not None:
+                        self.stats.cache_hits += 1
+                    return entry[2]
+                hash_column = entry[3]
+                if mirrored and hash_column != -1:
+                    hash_column = mirror_column(hash_column)
+
+        if d == 0:
+            value = self._evaluate_leaf(game, initial_player)
+            if table is not None:
+                table.store(key, 0, EXACT, value, -1)
+            return value
+
+        value, best_column = self._search_children(game, d, (alpha, beta), initial_player, hash_column)
+
+        if table is not None:
+            if mirrored and best_column != -1:
+                # Columns are stored in the orientation of the canonical key.
+                best_column = mirror_column(best_column)
+            table.store(key, d, _get_bound(value, alpha, beta), value, best_column)
+
+        return value
+
+    def _check_time(self) -> None:
+        """Raise _SearchTimeout if the current search has reached its deadline, or SearchStopped if it is
+        stoppable and the stop function returns True."""
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _SearchTimeout
+        if self._stoppable and self._should_stop():
+            raise SearchStopped
+
+    def _get_terminal_score(self, game: ConnectFour, initial_player: int) -> Optional[int]:
+        """Return WIN_SCORE, LOSE_SCORE or DRAW_SCORE if game is over, or if it is in the endgame tablebase
+        and ends that way for initial_player with perfect play. Otherwise, return None."""
+        winner = game.get_winner()
+        if winner is None and self._endgame_tablebase is not None:
+            score = self._endgame_tablebase.lookup_outcome_score(game, initial_player)
+        elif winner is None:
+            score = None
+        elif winner == initial_player:
+            score = WIN_SCORE
+        elif winner == get_opposite_player(initial_player):
+            score = LOSE_SCORE
+        else:
+            score = DRAW_SCORE
+
+        if score is not None and self.stats is not None:
+            self.stats.terminal_hits += 1
+        return score
+
+    def _evaluate_leaf(self, game: ConnectFour, initial_player: int) -> int:
+        """Return the score of game for initial_player given by the evaluation function, counting the call in
+        self.stats if the search is instrumented."""
+        is_moving_next = game.get_current_player() == initial_player
+        if self.stats is not None:
+            return self.stats.evaluate(self._evaluate, game, initial_player, is_moving_next)
+        return self._evaluate(game, initial_player, is_moving_next)
+
+    def _search_children(self, game: ConnectFour, d: int, window: tuple[int, int], initial_player: int,
+                         hash_column: int) -> tuple[int, int]:
+        """Search each move of game to the depth d - 1 and return a tuple (value, best_column), where value is
+        the minimax score of game for initial_player and best_column is the column it comes from (or -1 if
+        there is none), with fail-soft alpha-beta pruning in the window (alpha, beta).
+
+        hash_column is searched first if it is not -1, as the move ordering decides.
+
+        Preconditions:
+            - d >= 1
+            - window[0] < window[1]
+            - game.get_winner() is None
+        """
+        alpha, beta = window
+        current_player = game.get_current_player()
+        num_moves = len(game.bitboard.moves)
+        columns = self._move_ordering.order(game.get_possible_columns(), num_moves, current_player, hash_column)
+        if self.stats is not None:
+            self.stats.count_expansion(game)
+
+        best_column = -1
+        if current_player == initial_player:
+            # initial_player chooses the move with the maximum score.
+            value = -INFINITY
+            for column in columns:
+                self._play(game, column)
+                score = self._alpha_beta(game, d - 1, alpha, beta, initial_player)
+                self._undo(game)
+                if score > value:
+                    value, best_column = score, column
+                    alpha = max(alpha, value)
+                    if alpha >= beta:
+                        self._move_ordering.record_cutoff(column, num_moves, current_player, d)
+                        break
+        else:
+            # The opponent chooses the move with the minimum score.
+            value = INFINITY
+            for column in columns:
+                self._play(game, column)
+                score = self._alpha_beta(game, d - 1, alpha, beta, initial_player)
+                self._undo(game)
+                if score < value:
+                    value, best_column = score, column
+                    beta = min(beta, value)
+                    if alpha >= beta:
+                        self._move_ordering.record_cutoff(column, num_moves, current_player, d)
+                        break
+
+        return (value, best_column)
+
+
+def _get_bound(value: int, alpha: int, beta: int) -> int:
+    """Return the bound type of value as the result of a fail-soft search with the window (alpha, beta):
+    UPPER_BOUND if value <= alpha, LOWER_BOUND if value >= beta, and EXACT otherwise.
+
+    >>> _get_bound(3, 3, 5) == UPPER_BOUND, _get_bound(4, 3, 5) == EXACT, _get_bound(6, 3, 5) == LOWER_BOUND
+    (True, True, True)
+    """
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+
+def _is_within_bound(bound: int, score: int, alpha: int, beta: int) -> bool:
+    """Return whether a transposition table entry with the given bound and score gives the result of a search
+    with the window (alpha, beta): it is exact, or it is a bound that already causes a cutoff."""
+    if bound == LOWER_BOUND:
+        return score >= beta
+    if bound == UPPER_BOUND:
+        return score <= alpha
+    return True
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'time', 'connect_four', 'bitboard', 'constant', 'transposition',
+                          'move_ordering', 'evaluation', 'endgame', 'instrumentation'],
+        # Besides its components, an engine keeps the limits and the statistics of the current search
+        'disable': ['too-many-instance-attributes']
+    })
@@ -0,0 +1,449 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Search Players)
+
+Module Description
+==================
+
+This module contains the AI players that choose their moves with a search engine instead of a game tree:
+AlphaBetaPlayer, which searches with alpha-beta pruning (see search.py and parallel.py), SolverPlayer, which
+solves the game whenever it can (see solver.py), and MCTSPlayer, which searches by Monte Carlo tree search
+(see mcts.py). The players keeping a game tree, and the Player class they all extend, are in player.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+import random
+from connect_four import ConnectFour, create_game_from_moves
+from player import Player
+from search import AlphaBetaSearch, SearchStopped
+from parallel import ParallelSearch, LazySMPSearch
+from solver import Solver, SolverTimeout
+from mcts import MonteCarloTreeSearch, RootParallelMCTS
+from opening_book import OpeningBook, choose_book_column
+from endgame import EndgameTablebase
+from instrumentation import SearchStats, SearchInstrumentation
+from transposition import TranspositionTable
+from evaluation import IncrementalEvaluator
+from constant import GRID_WIDTH, PLAYER_ONE, PLAYER_TWO
+
+
+class AlphaBetaPlayer(Player):
+    """ An AI Player that searches the game with alpha-beta pruning every time it makes a move.
+
+    It makes the same decisions as a full minimax search of its search depth, but it neither stores
+    a game tree nor visits the branches that cannot change the result, so it can search much deeper
+    than a GreedyPlayer in the same amount of time.
+
+    Private Instance Attributes:
+        - _depth: An integer representing how many moves ahead the player searches.
+        - _search_engine: The AlphaBetaSearch (or ParallelSearch or LazySMPSearch) used to search the game.
+        - _time_limit_ms: The maximum number of milliseconds to search for each move, or None if there is
+        no time limit.
+        - _opening_book: The OpeningBook consulted before searching, or None if there is no opening book.
+        - _should_stop: The function asked by the search engine created by the player whether to stop
+        searching, or None if there is none.
+        - _ponders: Whether the player searches on the opponent's time.
+        - _instrumentation: The instrumentation measuring every move the player chooses, or None if there is none.
+
+    Representation Invariant:
+        - self._depth > 0
+
+    >>> player = AlphaBetaPlayer(PLAYER_TWO, 4)
+    >>> game = ConnectFour()
+    >>> for column in [0, 6, 0, 6, 0]:
+    ...     game.record_player_move(column)
+    >>> player.choose_column(game)
+    0
+    """
+    _depth: int
+    _search_engine: AlphaBetaSearch | ParallelSearch | LazySMPSearch
+    _time_limit_ms: Optional[int]
+    _opening_book: Optional[OpeningBook]
+    _should_stop: Optional[Callable[[], bool]]
+    _ponders: bool
+    _instrumentation: Optional[SearchInstrumentation]
+
+    def __init__(self, player_num: int, search_depth: int,
+                 search_engine: Optional[AlphaBetaSearch | ParallelSearch | LazySMPSearch] = None,
+                 time_limit_ms: Optional[int] = None, opening_book: Optional[OpeningBook] = None,
+                 endgame_tablebase: Optional[EndgameTablebase] = None,
+                 should_stop: Optional[Callable[[], bool]] = None, ponder: bool = False,
+                 instrumentation: Optional[SearchInstrumentation] = None) -> None:
+        """Initiate an AlphaBetaPlayer with given player number and search depth.
+
+        Create a new search engine scoring game states with an IncrementalEvaluator (which gives the same
+        scores as score_game) and using a transposition table if search_engine is None. The new search engine
+        stops searching at the game states found in endgame_tablebase, if it is not None, and it is stopped by
+        should_stop, if it is not None (see AlphaBetaSearch).
+
+        If time_limit_ms is not None, each move is searched by iterative deepening for at most about
+        time_limit_ms milliseconds, and search_depth is only the maximum depth.
+
+        If opening_book is not None, the player chooses its moves from opening_book while the game is in it.
+
+        If ponder is True, the player ponders (see Player): once it has chosen a column, it keeps searching each
+        reply of the opponent on a background thread, expected replies first, to the depth choose_column will
+        search it to. The results stay in the transposition table of the search engine, so the next search
+        mostly finds them there.
+
+        If instrumentation is not None, every column chosen by choose_column is measured by it, with the stats of
+        the search of that move (see instrumentation.py and _search_best_columns).
+
+        Preconditions:
+            - player_num in {PLAYER_ONE, PLAYER_TWO}
+            - search_depth > 0
+            - time_limit_ms is None or time_limit_ms >= 0
+            - not ponder or search_engine is None
+        """
+        Player.__init__(self, player_num)
+        self._depth = search_depth
+        self._time_limit_ms = time_limit_ms
+        self._opening_book = opening_book
+        self._should_stop = should_stop
+        self._ponders = ponder
+        self._instrumentation = instrumentation
+
+        if search_engine is not None:
+            self._search_engine = search_engine
+        else:
+            self._search_engine = AlphaBetaSearch(IncrementalEvaluator(), TranspositionTable(),
+                                                  endgame_tablebase=endgame_tablebase,
+                                                  should_stop=self._is_search_stopped if ponder else should_stop)
+
+    def choose_column(self, game: ConnectFour) -> int:
+        """ Return a random column among the columns with the maximum score.
+
+        Always choose the central column when making the first step of the whole game. If the game is in
+        the opening book, choose a random best column from the opening book instead.
+
+        Preconditions:
+            - game.get_winner() is None
+            - game.get_current_player() == self.player_num
+        """
+        if self._instrumentation is not None:
+            return self._instrumentation.measure_move(game, lambda stats: self._choose_column(game, stats))
+        return self._choose_column(game, None)
+
+    def _choose_column(self, game: ConnectFour, stats: Optional[SearchStats]) -> int:
+        """ Choose a column as described in choose_column, counting the work of the search in stats if it is
+        not None.
+        """
+        self.stop_pondering()
+        book_column = choose_book_column(self._opening_book, game)
+        if book_column is not None:
+            return book_column
+
+        if game.get_last_move() is None:
+            move_column = GRID_WIDTH // 2
+        else:
+            move_column = random.choice(_search_best_columns(self._search_engine, game, self._depth, self.player_num,
+                                                             self._time_limit_ms, stats))
+        if self._ponders:
+            self._start_pondering(game.copy_and_record_player_move(move_column))
+        return move_column
+
+    def hint_opponent(self, game: ConnectFour) -> int:
+        """ Return a random column among the columns with the minimum score, which are the best columns
+        for the opponent. If the game is in the opening book, return a random best column from the opening
+        book instead.
+
+        Preconditions:
+            - game.get_winner() is None
+            - game.get_current_player() != self.player_num
+        """
+        self.stop_pondering()
+        book_column = choose_book_column(self._opening_book, game)
+        if book_column is not None:
+            return book_column
+
+        if game.get_last_move() is None:
+            return GRID_WIDTH // 2
+
+        hint_columns = _search_best_columns(self._search_engine, game, self._depth, self.player_num,
+                                            self._time_limit_ms)
+        if self._ponders:
+            # Carry on pondering where the hint stopped it.
+            self._start_pondering(game)
+        return random.choice(hint_columns)
+
+    def copy(self) -> Player:
+        """Return a copy of self with the same search depth and search engine.
+
+        The copy does not ponder, since its search engine would be stopped by the pondering of self.
+        """
+        self.stop_pondering()
+        return AlphaBetaPlayer(self.player_num, self._depth, self._search_engine, self._time_limit_ms,
+                               self._opening_book, instrumentation=self._instrumentation)
+
+    def _ponder(self, game: ConnectFour) -> None:
+        """ Search game to find the replies the opponent is expected to play, and then search each reply to
+        the depth choose_column will search it to, expected replies first, until self._ponder_stop is set.
+        """
+        try:
+            _, expected_columns = self._search_engine.search(game, self._depth, self.player_num)
+            for column in expected_columns + [column for column in game.get_possible_columns()
+                                              if column not in expected_columns]:
+                game.play(column)
+                if game.get_winner() is None:
+                    self._search_engine.search(game, self._depth, self.player_num)
+                game.undo()
+        except SearchStopped:
+            return
+
+    def _is_search_stopped(self) -> bool:
+        """ Return whether pondering is being stopped, or the player's searches must stop."""
+        return self._ponder_stop.is_set() or (self._should_stop is not None and self._should_stop())
+
+
+class SolverPlayer(Player):
+    """ An AI Player that plays perfectly whenever it can solve the game in time.
+
+    Every move, the player tries to solve the game with a Solver, which finds the columns that win as fast
+    as possible (or lose as slowly as possible, or draw) against any opponent. Solving is very slow early in
+    the game, so if the game cannot be solved within the time limit, the move is chosen by a fallback player
+    instead. The work done by the solver is kept in its transposition table, so later moves are solved faster.
+
+    No solver book is shipped with the game (see solver.py), so unless one is generated, a game can usually only
+    be solved within a second from about 16 discs onward, and the fallback player chooses the earlier moves.
+
+    Private Instance Attributes:
+        - _solver: The Solver used to solve the game.
+        - _time_limit_ms: The maximum number of milliseconds to try solving the game for each move,
+        or None if there is no time limit.
+        - _fallback: The player that chooses the move when the game cannot be solved in time.
+
+    Representation Invariant:
+        - self._fallback.player_num == self.player_num
+
+    >>> player = SolverPlayer(PLAYER_ONE)
+    >>> game = create_game_from_moves('33142344555024411551')
+    >>> player.choose_column(game)
+    2
+    """
+    _solver: Solver
+    _time_limit_ms: Optional[int]
+    _fallback: Player
+
+    def __init__(self, player_num: int, solver: Optional[Solver] = None, time_limit_ms: Optional[int] = 1000,
+                 fallback: Optional[Player] = None, should_stop: Optional[Callable[[], bool]] = None) -> None:
+        """Initiate a SolverPlayer with given player number.
+
+        Create a new Solver if solver is None. If fallback is None, an AlphaBetaPlayer searching to at most
+        the depth 8 by iterative deepening with the same time limit is used, so a move can take up to about
+        twice time_limit_ms milliseconds. If should_stop is not None, it stops the new Solver and the new
+        fallback player (see Solver and AlphaBetaSearch).
+
+        The scores of an OpeningBook come from a heuristic search, so the player never plays from one as if
+        they were exact. To use one before the game can be solved, give it to the fallback player instead.
+
+        Preconditions:
+            - player_num in {PLAYER_ONE, PLAYER_TWO}
+            - time_limit_ms is None or time_limit_ms >= 0
+            - fallback is None or fallback.player_num == player_num
+        """
+        Player.__init__(self, player_num)
+        self._time_limit_ms = time_limit_ms
+
+        if solver is not None:
+            self._solver = solver
+        else:
+            self._solver = Solver(should_stop=should_stop)
+
+        if fallback is not None:
+            self._fallback = fallback
+        else:
+            self._fallback = AlphaBetaPlayer(player_num, 8, time_limit_ms=time_limit_ms, should_stop=should_stop)
+
+    def choose_column(self, game: ConnectFour) -> int:
+        """ Return a random column among the best columns found by the solver, or the column chosen by the
+        fallback player if the game cannot be solved in time.
+
+        Always choose the central column when making the first step of the whole game.
+
+        Preconditions:
+            - game.get_winner() is None
+            - game.get_current_player() == self.player_num
+        """
+        if game.get_last_move() is None:
+            return GRID_WIDTH // 2
+
+        try:
+            _, best_columns = self._solver.get_best_columns(game, self._time_limit_ms)
+        except SolverTimeout:
+            return self._fallback.choose_column(game)
+        return random.choice(best_columns)
+
+    def hint_opponent(self, game: ConnectFour) -> int:
+        """ Return a random column among the best columns for the opponent found by the solver, or the column
+        given by the fallback player if the game cannot be solved in time.
+
+        Preconditions:
+            - game.get_winner() is None
+            - game.get_current_player() != self.player_num
+        """
+        if game.get_last_move() is None:
+            return GRID_WIDTH // 2
+
+        try:
+            # The solver always solves for the player moving next, which is the opponent here.
+            _, best_columns = self._solver.get_best_columns(game, self._time_limit_ms)
+        except SolverTimeout:
+            return self._fallback.hint_opponent(game)
+        return random.choice(best_columns)
+
+    def copy(self) -> Player:
+        """Return a copy of self with the same solver and time limit and a copy of the fallback player."""
+        return SolverPlayer(self.player_num, self._solver, self._time_limit_ms, self._fallback.copy())
+
+
+class MCTSPlayer(Player):
+    """ An AI Player that chooses its moves by Monte Carlo tree search.
+
+    Every move, the player runs playouts from the game for a budget of iterations or time, and plays the most
+    visited column. The search engine keeps its tree between moves, so the playouts below the moves that were
+    actually played are reused.
+
+    Private Instance Attributes:
+        - _search_engine: The MonteCarloTreeSearch (or RootParallelMCTS) used to search the game.
+        - _max_iterations: The maximum number of iterations of each search, or None if there is no maximum.
+        - _time_limit_ms: The maximum number of milliseconds of each search, or None if there is no time limit.
+        - _opening_book: The OpeningBook consulted before searching, or None if there is no opening book.
+
+    Representation Invariant:
+        - self._max_iterations is not None or self._time_limit_ms is not None
+
+    >>> player = MCTSPlayer(PLAYER_TWO, MonteCarloTreeSearch(seed=111), max_iterations=500, time_limit_ms=None)
+    >>> player.choose_column(create_game_from_moves('06060'))
+    0
+    """
+    _search_engine: MonteCarloTreeSearch | RootParallelMCTS
+    _max_iterations: Optional[int]
+    _time_limit_ms: Optional[int]
+    _opening_book: Optional[OpeningBook]
+
+    def __init__(self, player_num: int, search_engine: Optional[MonteCarloTreeSearch | RootParallelMCTS] = None,
+                 max_iterations: Optional[int] = None, time_limit_ms: Optional[int] = 1000,
+                 opening_book: Optional[OpeningBook] = None) -> None:
+        """Initiate an MCTSPlayer with given player number, searching each move until max_iterations
+        iterations were run or time_limit_ms milliseconds have passed, whichever comes first.
+
+        Create a new MonteCarloTreeSearch with guided playouts if search_engine is None. Give a
+        RootParallelMCTS to search on several processes.
+
+        If opening_book is not None, the player chooses its moves from opening_book while the game is in it.
+
+        Preconditions:
+            - player_num in {PLAYER_ONE, PLAYER_TWO}
+            - max_iterations is not None or time_limit_ms is not None
+            - max_iterations is None or max_iterations >= 1
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        Player.__init__(self, player_num)
+        self._max_iterations = max_iterations
+        self._time_limit_ms = time_limit_ms
+        self._opening_book = opening_book
+
+        if search_engine is not None:
+            self._search_engine = search_engine
+        else:
+            self._search_engine = MonteCarloTreeSearch()
+
+    def choose_column(self, game: ConnectFour) -> int:
+        """ Return a random column among the most visited columns of the search. If the game is in the
+        opening book, choose a random best column from the opening book instead.
+
+        Preconditions:
+            - game.get_winner() is None
+            - game.get_current_player() == self.player_num
+        """
+        book_column = choose_book_column(self._opening_book, game)
+        if book_column is not None:
+            return book_column
+
+        return self._choose_most_visited_column(game)
+
+    def hint_opponent(self, game: ConnectFour) -> int:
+        """ Return a random column among the most visited columns of the search, which are the best columns
+        for the opponent. If the game is in the opening book, return a random best column from the opening
+        book instead.
+
+        Preconditions:
+            - game.get_winner() is None
+            - game.get_current_player() != self.player_num
+        """
+        book_column = choose_book_column(self._opening_book, game)
+        if book_column is not None:
+            return book_column
+
+        return self._choose_most_visited_column(game)
+
+    def copy(self) -> Player:
+        """Return a copy of self with the same search engine, budget and opening book."""
+        return MCTSPlayer(self.player_num, self._search_engine, self._max_iterations, self._time_limit_ms,
+                          self._opening_book)
+
+    def _choose_most_visited_column(self, game: ConnectFour) -> int:
+        """ Search game and return a random column among its most visited columns, which are the best columns
+        for the player moving next.
+
+        Preconditions:
+            - game.get_winner() is None
+        """
+        statistics = self._search_engine.search(game, self._max_iterations, self._time_limit_ms)
+        most_visits = max(visits for visits, _ in statistics.values())
+        return random.choice([column for column, (visits, _) in statistics.items() if visits == most_visits])
+
+
+def _search_best_columns(search_engine: AlphaBetaSearch | ParallelSearch | LazySMPSearch, game: ConnectFour,
+                         d: int, initial_player: int, time_limit_ms: Optional[int],
+                         stats: Optional[SearchStats] = None) -> list[int]:
+    """ Return the best columns found by search_engine when searching game to the depth d.
+
+    If time_limit_ms is not None, search by iterative deepening instead, where d is the maximum depth.
+
+    If stats is not None, the search is counted in it: in detail by an AlphaBetaSearch, and only by the number
+    of game states visited by the other search engines, whose searches run on other processes.
+
+    Preconditions:
+        - d >= 1
+        - game.get_winner() is None
+        - initial_player in {PLAYER_ONE, PLAYER_TWO}
+    """
+    instrumented = stats is not None and isinstance(search_engine, AlphaBetaSearch)
+    if instrumented:
+        search_engine.stats = stats
+    try:
+        if time_limit_ms is None:
+            _, best_columns = search_engine.search(game, d, initial_player)
+        else:
+            _, best_columns = search_engine.iterative_deepening(game, d, initial_player, time_limit_ms)
+    finally:
+        if instrumented:
+            search_engine.stats = None
+    if stats is not None and not instrumented:
+        stats.nodes_generated += search_engine.nodes
+    return best_columns
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    # Disabled 'unused-import' because these imported constants and functions are used in doctests.
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'random', 'connect_four', 'player', 'search', 'parallel',
+                          'solver', 'mcts', 'opening_book', 'endgame', 'instrumentation', 'transposition',
+                          'evaluation', 'constant'],
+        'disable': ['unused-import'],
+    })
@@ -0,0 +1,717 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Solver)
+
+Module Description
+==================
+
+This module contains a Solver class that computes the exact game-theoretic value of a Connect 4 game
+state, i.e. whether the player moving next wins, loses or draws if both players play perfectly, and how
+quickly.
+
+The solver follows Pascal Pons' well-known Connect 4 solver. A game state is stored as two bit masks
+(see bitboard.py): the discs of the player moving next, and all occupied cells. It is searched with a
+negamax alpha-beta search that:
+
+    - never plays a move that lets the opponent win right away, and plays a forced block if there is one;
+    - searches the moves that create the most winning cells for the player first;
+    - remembers upper and lower bounds of searched game states in a TranspositionTable;
+    - looks up game states in an opening book and an endgame tablebase, if it has them.
+
+Instead of one search with a wide window, the score is found by a binary search of null-window
+searches, which prune much more.
+
+Scores
+======
+
+The score of a game state is from the point of view of the player moving next. It is 0 for a draw, positive
+if the player wins and negative if the player loses. A win with the k-th disc of the winner scores
+GRID_WIDTH * GRID_HEIGHT / 2 + 1 - k (so winning sooner scores higher), and a loss with the k-th disc of
+the opponent scores -(GRID_WIDTH * GRID_HEIGHT / 2 + 1 - k). See get_outcome.
+
+Solver Book
+===========
+
+Early game states are far too slow to solve during a game, so the exact scores of game states with few
+discs can be solved once, offline, by generate_solver_book and stored in a solver book file. By default, a
+Solver uses the book at DEFAULT_SOLVER_BOOK_PATH once it is generated (see load_default_solver_book), and
+stops searching at every game state found in it. Every score in a solver book is exact, unlike the scores
+of a heuristic search, so the Solver can trust it.
+
+A game state and its mirror image have the same score, so they are stored once under their canonical key,
+the smaller of their two keys (see get_book_key). A solver book file is a header followed by one record per
+game state, sorted by key so that a record can be found by binary search. It is memory-mapped, so opening it
+costs nothing.
+
+    - Header (12 bytes): the 4 bytes SOLVER_BOOK_MAGIC, the version and max_plies (one byte each), two
+      padding bytes, and the number of records (4 bytes).
+    - Record (9 bytes): the canonical key of a game state (8 bytes) and its score (1 byte, signed).
+
+All numbers are little-endian.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import BinaryIO, Callable, Iterator, Mapping, Optional
+import mmap
+import os
+import struct
+import time
+from connect_four import ConnectFour
+from bitboard import NUM_CELLS, BOTTOM_MASK, BOARD_MASK, column_mask, has_four_connected, mirror_mask
+from move_ordering import CENTER_ORDER
+from transposition import TranspositionTable, ALWAYS_REPLACE
+from endgame import EndgameTablebase
+from constant import LOWER_BOUND, UPPER_BOUND
+
+# Outcomes of a game state for the player moving next.
+WIN, LOSS, DRAW = 'win', 'loss', 'draw'
+
+# The clock (and the stop function) is checked once every this many nodes (plus one) while solving.
+_TIME_CHECK_MASK = 1023
+
+# column_mask(x) for every column x, in CENTER_ORDER.
+_ORDERED_COLUMN_MASKS = tuple(column_mask(x) for x in CENTER_ORDER)
+
+# The first bytes of every solver book file, and the version of the file format.
+SOLVER_BOOK_MAGIC = b'C4SB'
+SOLVER_BOOK_VERSION = 1
+
+# The solver book used by default, generated by running this file, and the number of discs it goes up to.
+DEFAULT_SOLVER_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solver_book.bin')
+DEFAULT_SOLVER_BOOK_MAX_PLIES = 8
+
+_BOOK_HEADER = struct.Struct('<4sBBxxI')
+_BOOK_RECORD = struct.Struct('<Qb')
+_BOOK_KEY = struct.Struct('<Q')
+
+
+class SolverTimeout(Exception):
+    """Raised by Solver.solve when its time limit is reached (or it is stopped by its stop function) before the
+    game state is solved."""
+
+
+def get_outcome(score: int, num_moves: int) -> tuple[str, int]:
+    """Return a tuple (outcome, num_plies) describing score, the score of a game state with num_moves
+    discs.
+
+    outcome is WIN, LOSS or DRAW for the player moving next, and num_plies is the number of moves (of both
+    players) left until the game ends with perfect play, counting the winning move. For a draw, it is the
+    number of moves left until the grid is full.
+
+    Preconditions:
+        - 0 <= num_moves <= NUM_CELLS
+
+    >>> get_outcome(18, 3)  # The player moving next wins with their 4th disc, the 5th move from now.
+    ('win', 5)
+    >>> get_outcome(-18, 4)  # The opponent wins with their 4th disc, the 4th move from now.
+    ('loss', 4)
+    >>> get_outcome(0, 40)
+    ('draw', 2)
+    """
+    if score > 0:
+        # The player moving next has num_moves // 2 discs and wins with their k-th disc.
+        k = NUM_CELLS // 2 + 1 - score
+        return (WIN, 2 * (k - num_moves // 2) - 1)
+    elif score < 0:
+        # The opponent has (num_moves + 1) // 2 discs and wins with their k-th disc.
+        k = NUM_CELLS // 2 + 1 + score
+        return (LOSS, 2 * (k - (num_moves + 1) // 2))
+    else:
+        return (DRAW, NUM_CELLS - num_moves)
+
+
+def get_position(game: ConnectFour) -> tuple[int, int, int]:
+    """Return the game state of game as a tuple (current, occupied, num_moves), where current is the mask
+    of the discs of the player moving next and occupied is the mask of all discs.
+    """
+    board = game.bitboard
+    return (board.masks[board.get_current_player()], board.get_occupied_mask(), len(board.moves))
+
+
+def get_position_key(current: int, occupied: int) -> int:
+    """Return the key of the game state with the discs current of the player moving next and the
+    discs occupied, which is the same as the key of the Bitboard of that game state when PLAYER_ONE moves
+    next.
+
+    Within each column, occupied + BOTTOM_MASK leaves a single bit just above the top disc, and the discs
+    of current lie below it, so different game states always have different keys. Keys are never 0.
+    """
+    return current + occupied + BOTTOM_MASK
+
+
+def get_book_key(current: int, occupied: int) -> int:
+    """Return the canonical key of the game state with the discs current of the player moving next and the
+    discs occupied in a solver book: the smaller of its key and the key of its mirror image.
+
+    >>> get_book_key(0, column_mask(0) & BOTTOM_MASK) == get_book_key(0, column_mask(6) & BOTTOM_MASK)
+    True
+    """
+    key = get_position_key(current, occupied)
+    return min(key, mirror_mask(key))
+
+
+def compute_winning_cells(discs: int, occupied: int) -> int:
+    """Return the mask of the empty cells where a disc would give the player with discs four connected
+    discs. The cells do not have to be playable right away.
+
+    The shifts below are for columns of COLUMN_HEIGHT == 7 bits.
+
+    Preconditions:
+        - discs & ~occupied == 0
+    """
+    # Vertical: three discs right below.
+    cells = (discs << 1) & (discs << 2) & (discs << 3)
+
+    # Horizontal (shift 7) and both diagonals (shifts 6 and 8): the cell completes three discs in a row
+    # on either side of it. The loop over the shifts is unrolled since this is the hottest code of the solver.
+    pairs = (discs << 7) & (discs << 14)
+    cells |= pairs & ((discs << 21) | (discs >> 7))
+    pairs = (discs >> 7) & (discs >> 14)
+    cells |= pairs & ((discs << 7) | (discs >> 21))
+    pairs = (discs << 6) & (discs << 12)
+    cells |= pairs & ((discs << 18) | (discs >> 6))
+    pairs = (discs >> 6) & (discs >> 12)
+    cells |= pairs & ((discs << 6) | (discs >> 18))
+    pairs = (discs << 8) & (discs << 16)
+    cells |= pairs & ((discs << 24) | (discs >> 8))
+    pairs = (discs >> 8) & (discs >> 16)
+    cells |= pairs & ((discs << 8) | (discs >> 24))
+
+    return cells & (BOARD_MASK ^ occupied)
+
+
+class SolverBook(Mapping[int, int]):
+    """A solver book file, opened for lookups, as a mapping from the keys of game states (see get_position_key)
+    to their exact scores.
+
+    A game state can be looked up by its key or by the key of its mirror image. Iterating over the book only
+    gives the canonical key of each game state.
+
+    Instance Attributes:
+        - max_plies: The largest number of discs of the game states in the book.
+
+    Private Instance Attributes:
+        - _file: The open book file.
+        - _data: The memory-mapped contents of the book file.
+        - _num_records: The number of records in the book.
+
+    Representation Invariants:
+        - len(self._data) == _BOOK_HEADER.size + self._num_records * _BOOK_RECORD.size
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'solver_book.bin')
+    >>> from connect_four import create_game_from_moves
+    >>> seed = create_game_from_moves('333222235655355205')
+    >>> generate_solver_book(path, 19, seeds=[seed])
+    7
+    >>> book = SolverBook(path)
+    >>> current, occupied, _ = get_position(seed)
+    >>> book[get_position_key(current, occupied)]
+    5
+    >>> mirrored = create_game_from_moves('333444431011311461')
+    >>> current, occupied, _ = get_position(mirrored)
+    >>> book.get(get_position_key(current, occupied))
+    5
+    >>> Solver(opening_book=book).solve(seed)
+    5
+    >>> book.close()
+    """
+    max_plies: int
+    _file: BinaryIO
+    _data: mmap.mmap
+    _num_records: int
+
+    def __init__(self, path: str = DEFAULT_SOLVER_BOOK_PATH) -> None:
+        """Open the solver book file at path.
+
+        Raise a ValueError if the file is not a solver book of this version.
+        """
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.max_plies, self._num_records = _BOOK_HEADER.unpack_from(self._data, 0)
+        if magic != SOLVER_BOOK_MAGIC or version != SOLVER_BOOK_VERSION \
+                or len(self._data) != _BOOK_HEADER.size + self._num_records * _BOOK_RECORD.size:
+            self.close()
+            raise ValueError(f'{path} is not a valid solver book')
+
+    def __len__(self) -> int:
+        """Return the number of game states stored in the book (not counting mirror images)."""
+        return self._num_records
+
+    def __iter__(self) -> Iterator[int]:
+        """Return an iterator over the canonical keys of the game states in the book, in increasing order."""
+        return (_BOOK_KEY.unpack_from(self._data, _BOOK_HEADER.size + index * _BOOK_RECORD.size)[0]
+                for index in range(self._num_records))
+
+    def __getitem__(self, key: int) -> int:
+        """Return the exact score of the game state with the given key (or the key of its mirror image).
+
+        Raise a KeyError if the game state is not in the book.
+        """
+        score = self.get(key)
+        if score is None:
+            raise KeyError(key)
+        return score
+
+    def get(self, key: int, default: Optional[int] = None) -> Optional[int]:
+        """Return the exact score of the game state with the given key (or the key of its mirror image), or
+        default if the game state is not in the book.
+
+        This is what Solver calls for every game state it searches, so it does not raise a KeyError.
+        """
+        key = min(key, mirror_mask(key))
+        low, high = 0, self._num_records
+        while low < high:
+            middle = (low + high) // 2
+            offset = _BOOK_HEADER.size + middle * _BOOK_RECORD.size
+            middle_key = _BOOK_KEY.unpack_from(self._data, offset)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return _BOOK_RECORD.unpack_from(self._data, offset)[1]
+        return default
+
+    def close(self) -> None:
+        """Close the book file. The book cannot be used afterwards."""
+        self._data.close()
+        self._file.close()
+
+
+def load_default_solver_book() -> Optional[SolverBook]:
+    """Return the solver book at DEFAULT_SOLVER_BOOK_PATH, or None if it does not exist."""
+    if not os.path.exists(DEFAULT_SOLVER_BOOK_PATH):
+        return None
+    return SolverBook(DEFAULT_SOLVER_BOOK_PATH)
+
+
+class Solver:
+    """A perfect-play solver for Connect 4.
+
+    No solver book is shipped with the game, since generating one takes a very long time (see
+    generate_solver_book). Without one, a game state can usually only be solved within a second from about
+    16 discs onward; a game state with 12 discs takes 10 to 30 seconds, and the empty grid far longer.
+
+    Instance Attributes:
+        - nodes: The number of game states visited since the solver was created.
+
+    Private Instance Attributes:
+        - _transposition_table: The table remembering upper and lower bounds of the scores of searched
+        game states. Since a score never depends on how the game state was reached, the table is kept
+        between calls to solve.
+        - _opening_book: A mapping from the keys of game states (see get_position_key) to their exact
+        scores, such as a SolverBook, or None if there is no opening book.
+        - _endgame_tablebase: The tablebase of exact scores of game states near the end of the game, or None
+        if there is none.
+        - _should_stop: The function called while solving to ask whether to stop, or None if there is none.
+        - _deadline: The time.perf_counter() value at which the current call to solve must stop, or None if
+        it has no time limit.
+
+    >>> solver = Solver()
+    >>> from connect_four import create_game_from_moves
+    >>> game = create_game_from_moves('33142344555024411551')
+    >>> solver.solve(game)
+    4
+    >>> get_outcome(4, 20)
+    ('win', 15)
+    >>> solver.analyze(game)
+    {0: -11, 1: -11, 2: 4, 3: -11, 4: -11, 5: -11, 6: -11}
+    """
+    nodes: int
+    _transposition_table: TranspositionTable
+    _opening_book: Optional[Mapping[int, int]]
+    _endgame_tablebase: Optional[EndgameTablebase]
+    _should_stop: Optional[Callable[[], bool]]
+    _deadline: Optional[float]
+
+    def __init__(self, transposition_table: Optional[TranspositionTable] = None,
+                 opening_book: Optional[Mapping[int, int]] = None,
+                 endgame_tablebase: Optional[EndgameTablebase] = None,
+                 should_stop: Optional[Callable[[], bool]] = None, use_default_book: bool = True) -> None:
+        """Initialize a solver.
+
+        If transposition_table is None, a new always-replace table of 16 MB is used. The table must not be
+        shared with an AlphaBetaSearch, since the keys and scores mean different things.
+
+        opening_book can be any mapping from the keys of game states to their exact scores, such as a
+        SolverBook or a dict. If it is None and use_default_book is True, the solver book at
+        DEFAULT_SOLVER_BOOK_PATH is used, if it exists (see load_default_solver_book).
+
+        endgame_tablebase has the same scores as the solver, so the game states found in it are not searched.
+
+        If should_stop is not None, it is called about every thousand game states while solving, and once it
+        returns True, SolverTimeout is raised as if the time limit was reached, even without a time limit.
+        """
+        if transposition_table is None:
+            transposition_table = TranspositionTable(1 << 24, ALWAYS_REPLACE)
+        self.nodes = 0
+        self._transposition_table = transposition_table
+        if opening_book is None and use_default_book:
+            opening_book = load_default_solver_book()
+        self._opening_book = opening_book
+        self._endgame_tablebase = endgame_tablebase
+        self._should_stop = should_stop
+        self._deadline = None
+
+    def solve(self, game: ConnectFour, weak: bool = False, time_limit_ms: Optional[int] = None) -> int:
+        """Return the score of game for the player moving next (see the module docstring).
+
+        If weak is True, only return 1, -1 or 0 depending on whether the player wins, loses or draws,
+        which is faster.
+
+        Raise SolverTimeout if time_limit_ms is not None and the game state is not solved within about
+        time_limit_ms milliseconds. What was learned is kept in the transposition table, so solving the
+        same game state again continues from there.
+
+        Preconditions:
+            - game.get_winner() is None
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        current, occupied, num_moves = get_position(game)
+        return self.solve_position(current, occupied, num_moves, weak, time_limit_ms)
+
+    def solve_position(self, current: int, occupied: int, num_moves: int, weak: bool = False,
+                       time_limit_ms: Optional[int] = None) -> int:
+        """Return the score of the game state (current, occupied, num_moves) for the player moving next,
+        like solve. The game state is given as by get_position.
+
+        Preconditions:
+            - (current, occupied, num_moves) is not finished
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        if time_limit_ms is None:
+            return self._solve_position(current, occupied, num_moves, weak)
+
+        self._deadline = time.perf_counter() + time_limit_ms / 1000
+        try:
+            return self._solve_position(current, occupied, num_moves, weak)
+        finally:
+            self._deadline = None
+
+    def analyze(self, game: ConnectFour, weak: bool = False,
+                time_limit_ms: Optional[int] = None) -> dict[int, int]:
+        """Return a mapping from each possible column of game to the score of playing it, for the player
+        moving next.
+
+        Raise SolverTimeout if time_limit_ms is not None and not every column is solved within about
+        time_limit_ms milliseconds.
+
+        Preconditions:
+            - game.get_winner() is None
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        current, occupied, num_moves = get_position(game)
+        if time_limit_ms is not None:
+            self._deadline = time.perf_counter() + time_limit_ms / 1000
+
+        try:
+            scores = {}
+            winning_cells = compute_winning_cells(current, occupied)
+            for column in game.get_possible_columns():
+                move = (occupied + BOTTOM_MASK) & column_mask(column)
+                if move & winning_cells:
+                    scores[column] = 1 if weak else (NUM_CELLS + 1 - num_moves) // 2
+                elif num_moves + 1 == NUM_CELLS:
+                    scores[column] = 0
+                else:
+                    # After the move, the opponent moves next.
+                    scores[column] = -self._solve_position(current ^ occupied, occupied | move, num_moves + 1, weak)
+            return scores
+        finally:
+            self._deadline = None
+
+    def get_best_columns(self, game: ConnectFour, time_limit_ms: Optional[int] = None) -> tuple[int, list[int]]:
+        """Return a tuple (score, best_columns), where score is the score of game for the player moving next
+        and best_columns are all the possible columns that keep that score.
+
+        Raise SolverTimeout if time_limit_ms is not None and game is not solved within about
+        time_limit_ms milliseconds.
+
+        Preconditions:
+            - game.get_winner() is None
+            - time_limit_ms is None or time_limit_ms >= 0
+        """
+        scores = self.analyze(game, time_limit_ms=time_limit_ms)
+        best_score = max(scores.values())
+        return (best_score, [column for column, score in scores.items() if score == best_score])
+
+    def _solve_position(self, current: int, occupied: int, num_moves: int, weak: bool) -> int:
+        """Return the score of the game state (current, occupied, num_moves) for the player moving next,
+        or its sign if weak is True.
+
+        The score is narrowed down between its lowest and highest possible values by a binary search of
+        null-window searches, each of which tells whether the score is above a guess. Guesses close to 0 are
+        tried first, since most game states are decided close to the end of the game.
+
+        Preconditions:
+            - (current, occupied, num_moves) is not finished
+        """
+        if compute_winning_cells(current, occupied) & (occupied + BOTTOM_MASK) & BOARD_MASK:
+            return 1 if weak else (NUM_CELLS + 1 - num_moves) // 2
+
+        if self._opening_book is not None:
+            book_score = self._opening_book.get(get_position_key(current, occupied))
+            if book_score is not None:
+                return (book_score > 0) - (book_score < 0) if weak else book_score
+
+        if weak:
+            low, high = -1, 1
+        else:
+            low, high = -((NUM_CELLS - num_moves) // 2), (NUM_CELLS + 1 - num_moves) // 2
+
+        while low < high:
+            middle = low + (high - low) // 2
+            if -(-low // 2) < middle <= 0:
+                middle = -(-low // 2)
+            elif 0 <= middle < high // 2:
+                middle = high // 2
+
+            score = self._negamax(current, occupied, num_moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+
+        if weak:
+            # The null-window searches are fail-soft, so low may be any score with the right sign.
+            return (low > 0) - (low < 0)
+        return low
+
+    def _negamax(self, current: int, occupied: int, num_moves: int, alpha: int, beta: int) -> int:
+        """Return the score of the game state (current, occupied, num_moves) for the player moving next, if
+        it is strictly between alpha and beta. Otherwise, return an upper bound <= alpha or a lower bound
+        >= beta of the score.
+
+        Preconditions:
+            - alpha < beta
+            - (current, occupied, num_moves) is not finished
+            - the player moving next cannot win with their next move
+        """
+        self.nodes += 1
+        if self.nodes & _TIME_CHECK_MASK == 0 and self._is_out_of_time():
+            raise SolverTimeout
+
+        non_losing = get_non_losing_moves(current, occupied)
+        if not non_losing:
+            return -((NUM_CELLS - num_moves) // 2)
+
+        if num_moves >= NUM_CELLS - 2:
+            # Neither player can win with the last two discs.
+            return 0
+
+        key = get_position_key(current, occupied)
+        # An exact score from the opening book or the endgame tablebase is returned by one of the cutoffs.
+        low, high = self._get_bounds(key, current, occupied, num_moves)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        opponent = current ^ occupied
+        for move in _get_ordered_moves(current, occupied, non_losing):
+            score = -self._negamax(opponent, occupied | move, num_moves + 1, -beta, -alpha)
+            if score >= beta:
+                self._transposition_table.store(key, 0, LOWER_BOUND, score, -1)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self._transposition_table.store(key, 0, UPPER_BOUND, alpha, -1)
+        return alpha
+
+    def _is_out_of_time(self) -> bool:
+        """Return whether the current call to solve has reached its time limit or has been asked to stop."""
+        return (self._deadline is not None and time.perf_counter() > self._deadline) \
+            or (self._should_stop is not None and self._should_stop())
+
+    def _get_bounds(self, key: int, current: int, occupied: int, num_moves: int) -> tuple[int, int]:
+        """Return a tuple (low, high) of a lower and an upper bound of the score of the game state
+        (current, occupied, num_moves) with the given key. Both bounds are the exact score if it is in the
+        opening book or the endgame tablebase; otherwise they come from the transposition table.
+
+        Preconditions:
+            - the game state is not finished, and neither player can win with their next move
+        """
+        exact_score = None
+        if self._opening_book is not None:
+            exact_score = self._opening_book.get(key)
+        if exact_score is None and self._endgame_tablebase is not None:
+            exact_score = self._endgame_tablebase.lookup_position(current, occupied, num_moves)
+        if exact_score is not None:
+            return (exact_score, exact_score)
+
+        # The opponent cannot win with their next move, and neither can the player.
+        low = -((NUM_CELLS - 2 - num_moves) // 2)
+        high = (NUM_CELLS - 1 - num_moves) // 2
+        entry = self._transposition_table.probe(key)
+        if entry is not None:
+            bound, score = entry[1], entry[2]
+            if bound == LOWER_BOUND:
+                low = max(low, score)
+            else:
+                high = min(high, score)
+        return (low, high)
+
+
+def get_non_losing_moves(current: int, occupied: int) -> int:
+    """Return the bit mask of the cells the player moving next can play without letting the opponent win with
+    their next move. Return 0 if every move lets the opponent win.
+
+    >>> from connect_four import create_game_from_moves
+    >>> current, occupied, _ = get_position(create_game_from_moves('01010'))
+    >>> get_non_losing_moves(current, occupied) == column_mask(0) & (occupied + BOTTOM_MASK)
+    True
+    """
+    playable = (occupied + BOTTOM_MASK) & BOARD_MASK
+    opponent_wins = compute_winning_cells(current ^ occupied, occupied)
+    forced = playable & opponent_wins
+    if forced:
+        if forced & (forced - 1):
+            # The opponent has two winning cells to play, so only one can be blocked.
+            return 0
+        playable = forced
+    # Never play right below a winning cell of the opponent.
+    return playable & ~(opponent_wins >> 1)
+
+
+def _get_ordered_moves(current: int, occupied: int, moves: int) -> list[int]:
+    """Return the cells in the bit mask moves, each as a bit mask, in the order they should be searched: the
+    moves that create the most winning cells for the player moving next first, from the center outwards on ties.
+
+    Preconditions:
+        - moves != 0
+    """
+    if moves & (moves - 1) == 0:
+        # There is only one move to search.
+        return [moves]
+
+    moves_with_threats = []
+    for mask in _ORDERED_COLUMN_MASKS:
+        move = moves & mask
+        if move:
+            moves_with_threats.append((compute_winning_cells(current | move, occupied).bit_count(), move))
+    # The sort is stable, so moves creating as many winning cells stay in the center-outwards order.
+    moves_with_threats.sort(key=lambda item: item[0], reverse=True)
+    return [item[1] for item in moves_with_threats]
+
+
+def _get_book_positions(seeds: list[ConnectFour], max_plies: int) -> list[dict[int, tuple[int, int]]]:
+    """Return the unfinished game states with at most max_plies discs that can be reached from the game states
+    in seeds, as a list whose element at index k maps the canonical key of every game state with k discs to
+    its (current, occupied) bitboards (see get_position).
+
+    Preconditions:
+        - max_plies >= 0
+        - all(seed.get_winner() is None for seed in seeds)
+
+    >>> [len(level) for level in _get_book_positions([ConnectFour()], 2)]
+    [1, 4, 25]
+    """
+    levels = [{} for _ in range(max_plies + 1)]
+    for seed in seeds:
+        current, occupied, num_moves = get_position(seed)
+        if num_moves <= max_plies:
+            levels[num_moves][get_book_key(current, occupied)] = (current, occupied)
+    for num_moves in range(max_plies):
+        for current, occupied in levels[num_moves].values():
+            playable = (occupied + BOTTOM_MASK) & BOARD_MASK
+            for mask in _ORDERED_COLUMN_MASKS:
+                move = playable & mask
+                if move and not has_four_connected(current | move):
+                    # After the move, the opponent moves next.
+                    child = (current ^ occupied, occupied | move)
+                    levels[num_moves + 1].setdefault(get_book_key(*child), child)
+    return levels
+
+
+def generate_solver_book(path: str, max_plies: int = DEFAULT_SOLVER_BOOK_MAX_PLIES,
+                         time_limit_ms: Optional[int] = None, seeds: Optional[list[ConnectFour]] = None,
+                         transposition_table: Optional[TranspositionTable] = None) -> int:
+    """Write a solver book of the exact scores of the unfinished game states with at most max_plies discs
+    that can be reached from the game states in seeds (or from the empty grid if seeds is None) to the file at
+    path, and return the number of game states written.
+
+    The game states are solved from the most discs to the fewest, by a Solver using the scores found so far
+    as its opening book, so every game state only has to be searched until it reaches game states solved
+    before it. Game states where the player moving next can win right away are left out, since the Solver
+    never looks them up.
+
+    If time_limit_ms is not None, a game state that is not solved within about time_limit_ms milliseconds is
+    left out of the book, so the book only holds the game states that could be solved in time.
+
+    Preconditions:
+        - 0 <= max_plies < 256
+        - time_limit_ms is None or time_limit_ms >= 0
+        - seeds is None or all(seed.get_winner() is None for seed in seeds)
+    """
+    if seeds is None:
+        seeds = [ConnectFour()]
+    if transposition_table is None:
+        transposition_table = TranspositionTable(1 << 26, ALWAYS_REPLACE)
+    levels = _get_book_positions(seeds, max_plies)
+
+    # The scores found so far, under both the key of each game state and the key of its mirror image.
+    scores = {}
+    solver = Solver(transposition_table, opening_book=scores, use_default_book=False)
+    records = []
+    for num_moves in range(max_plies, -1, -1):
+        for key, (current, occupied) in sorted(levels[num_moves].items()):
+            if compute_winning_cells(current, occupied) & (occupied + BOTTOM_MASK) & BOARD_MASK \
+                    or num_moves == NUM_CELLS:
+                continue
+            try:
+                score = solver.solve_position(current, occupied, num_moves, time_limit_ms=time_limit_ms)
+            except SolverTimeout:
+                continue
+            scores[key] = scores[mirror_mask(key)] = score
+            records.append((key, score))
+
+    _write_solver_book(path, max_plies, records)
+    return len(records)
+
+
+def _write_solver_book(path: str, max_plies: int, records: list[tuple[int, int]]) -> None:
+    """Write a solver book of game states with at most max_plies discs to the file at path, given the
+    (canonical key, score) pair of each game state in records.
+
+    Preconditions:
+        - 0 <= max_plies < 256
+        - every key in records is a canonical key (see get_book_key), and is there once
+    """
+    with open(path, 'wb') as file:
+        file.write(_BOOK_HEADER.pack(SOLVER_BOOK_MAGIC, SOLVER_BOOK_VERSION, max_plies, len(records)))
+        for record in sorted(records):
+            file.write(_BOOK_RECORD.pack(*record))
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'mmap', 'os', 'struct', 'time', 'connect_four', 'bitboard',
+                          'move_ordering', 'transposition', 'endgame', 'constant', 'tempfile'],
+        'allowed-io': ['SolverBook.__init__', '_write_solver_book', 'load_default_solver_book'],
+        # A SolverBook keeps its file open until it is closed
+        'disable': ['consider-using-with']
+    })
+
+    # Generate the solver book used by default. This takes a very long time: a game state with 12 discs takes
+    # 10 to 30 seconds to solve, and one with 10 discs more than a minute, so run it on a fast machine.
+    generate_solver_book(DEFAULT_SOLVER_BOOK_PATH)
@@ -0,0 +1,490 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Tournament)
+
+Module Description
+==================
+
+This module contains a headless tournament engine, which plays many games between two AI players on a pool of
+worker processes and reports the results with confidence intervals.
+
+Players are given by player specs: strings such as 'greedy:depth=4', 'alphabeta:depth=6,time=200' or
+'mcts:time=500', made of a player type followed by options (see parse_player_spec). A match alternates the
+colors of the two players, so each of them plays first in half of the games, and every game can be started
+from a few random moves, so that players choosing their moves deterministically do not play the same game
+again and again. The games of a match are reproducible from its seed, as long as no player has a time limit.
+
+play_games yields the result of each game as soon as it is finished, run_match adds them up into a
+MatchResult, and the same can be done from the command line, for example:
+
+    python tournament.py greedy:depth=4 mcts:time=200 --games 1000 --workers 8
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Callable, Iterator, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import math
+import os
+import random
+import time
+from connect_four import ConnectFour
+from player import Player, RandomPlayer, ScoringPlayer, GreedyPlayer, LAZY_TREE
+from search_player import AlphaBetaPlayer, SolverPlayer, MCTSPlayer
+from mcts import MonteCarloTreeSearch
+from opening_book import load_default_opening_book
+from constant import PLAYER_ONE, PLAYER_TWO, UNOCCUPIED
+
+# The options each type of player accepts in a player spec, with their default values.
+PLAYER_OPTIONS = {
+    'random': {},
+    'scoring': {},
+    'greedy': {'depth': 4, 'book': 0},
+    'alphabeta': {'depth': 6, 'time': 0, 'book': 0},
+    'solver': {'time': 1000, 'book': 0},
+    'mcts': {'time': 1000, 'iterations': 0, 'book': 0}
+}
+
+# The score of a game for a player who won, drew or lost it.
+WIN_SCORE, DRAW_SCORE, LOSS_SCORE = 1.0, 0.5, 0.0
+
+# The z-score of a 95% confidence interval.
+DEFAULT_Z = 1.96
+
+
+def parse_player_spec(spec: str) -> tuple[str, dict[str, int]]:
+    """Return the player type and the options of the player spec spec, with the default value of every option
+    it does not give.
+
+    A player spec is a player type from PLAYER_OPTIONS, optionally followed by a colon and a comma-separated
+    list of options of the form name=value, where every value is an integer:
+        - depth: the search depth of a GreedyPlayer or an AlphaBetaPlayer.
+        - time: the time limit of each move in milliseconds, or 0 for none. An AlphaBetaPlayer with a time
+        limit searches by iterative deepening to at most its depth. A GreedyPlayer has no time limit, since it
+        always searches its game tree to its depth.
+        - iterations: the maximum number of iterations of each move of an MCTSPlayer, or 0 for none.
+        - book: 1 to choose moves from the default opening book while the game is in it, or 0 not to. A
+        SolverPlayer only does so when it cannot solve the game in time, through its fallback player.
+
+    Raise a ValueError if spec is not a valid player spec.
+
+    >>> parse_player_spec('alphabeta:depth=8,time=200')
+    ('alphabeta', {'depth': 8, 'time': 200, 'book': 0})
+    >>> parse_player_spec('random')
+    ('random', {})
+    >>> parse_player_spec('greedy:speed=4')
+    Traceback (most recent call last):
+    ValueError: invalid player spec 'greedy:speed=4': greedy has no option speed
+    """
+    player_type, _, option_text = spec.partition(':')
+    if player_type not in PLAYER_OPTIONS:
+        raise ValueError(f'invalid player spec {spec!r}: the player type must be one of '
+                         f'{", ".join(PLAYER_OPTIONS)}')
+
+    options = dict(PLAYER_OPTIONS[player_type])
+    for option in option_text.split(',') if option_text else []:
+        name, _, value = option.partition('=')
+        if name not in options:
+            raise ValueError(f'invalid player spec {spec!r}: {player_type} has no option {name}')
+        try:
+            options[name] = int(value)
+        except ValueError:
+            raise ValueError(f'invalid player spec {spec!r}: {name} must be an integer') from None
+        if options[name] < 0 or (name == 'depth' and options[name] == 0):
+            raise ValueError(f'invalid player spec {spec!r}: {name} must be positive')
+
+    if player_type == 'greedy' and options['depth'] < 2:
+        raise ValueError(f'invalid player spec {spec!r}: the depth of greedy must be at least 2')
+    if player_type == 'mcts' and options['time'] == 0 and options['iterations'] == 0:
+        raise ValueError(f'invalid player spec {spec!r}: mcts needs a time or a number of iterations')
+    return (player_type, options)
+
+
+def create_player(spec: str, player_num: int, seed: Optional[int] = None) -> Player:
+    """Return a new player with player number player_num given by the player spec spec (see parse_player_spec).
+
+    A GreedyPlayer expands its game tree lazily, which gives the same moves as a complete game tree. seed is
+    the seed of the MonteCarloTreeSearch of an MCTSPlayer, and it is ignored by other players.
+
+    Raise a ValueError if spec is not a valid player spec.
+
+    Preconditions:
+        - player_num in {PLAYER_ONE, PLAYER_TWO}
+
+    >>> player = create_player('alphabeta:depth=4', PLAYER_TWO)
+    >>> isinstance(player, AlphaBetaPlayer) and player.player_num == PLAYER_TWO
+    True
+    """
+    player_type, options = parse_player_spec(spec)
+    time_limit_ms = options.get('time') or None
+    opening_book = load_default_opening_book() if options.get('book') else None
+
+    if player_type == 'random':
+        return RandomPlayer(player_num)
+    elif player_type == 'scoring':
+        return ScoringPlayer(player_num)
+    elif player_type == 'greedy':
+        return GreedyPlayer(player_num, options['depth'], None, LAZY_TREE, opening_book=opening_book)
+    elif player_type == 'alphabeta':
+        return AlphaBetaPlayer(player_num, options['depth'], time_limit_ms=time_limit_ms,
+                               opening_book=opening_book)
+    elif player_type == 'solver':
+        # The opening book holds heuristic scores, so only the fallback player of a SolverPlayer plays from it.
+        fallback = AlphaBetaPlayer(player_num, 8, time_limit_ms=time_limit_ms, opening_book=opening_book)
+        return SolverPlayer(player_num, time_limit_ms=time_limit_ms, fallback=fallback)
+    else:
+        return MCTSPlayer(player_num, MonteCarloTreeSearch(seed=seed), max_iterations=options['iterations'] or None,
+                          time_limit_ms=time_limit_ms, opening_book=opening_book)
+
+
+def play_game(first_spec: str, second_spec: str, seed: Optional[int] = None,
+              random_opening_moves: int = 0) -> tuple[int, str]:
+    """Play a game between a new player given by first_spec, who plays first, and a new player given by
+    second_spec, and return the winner (PLAYER_ONE, PLAYER_TWO, or UNOCCUPIED for a draw) and the move string
+    of the game.
+
+    The game starts from random_opening_moves random moves, unless it is finished before. The random moves
+    and the random choices of the players are made from seed, so the game can be played again the same way as
+    long as no player has a time limit. The players make their random choices from the random module, which is
+    seeded for the game and then given back the state it had before, so the game does not change the random
+    numbers of the caller.
+
+    Preconditions:
+        - first_spec and second_spec are valid player specs
+        - random_opening_moves >= 0
+
+    >>> play_game('random', 'alphabeta:depth=4', seed=111, random_opening_moves=2)
+    (1, '6122121232')
+    >>> random_state = random.getstate()
+    >>> _ = play_game('random', 'random', seed=111)
+    >>> random.getstate() == random_state
+    True
+    """
+    rng = random.Random(seed)
+    game = ConnectFour()
+    for _ in range(random_opening_moves):
+        if game.get_winner() is not None:
+            break
+        game.record_player_move(rng.choice(game.get_possible_columns()))
+
+    random_state = random.getstate()
+    random.seed(rng.random())
+    try:
+        players = (create_player(first_spec, PLAYER_ONE, rng.randrange(1 << 30)),
+                   create_player(second_spec, PLAYER_TWO, rng.randrange(1 << 30)))
+        while game.get_winner() is None:
+            game.record_player_move(players[game.get_current_player()].choose_column(game))
+    finally:
+        random.setstate(random_state)
+
+    return (game.get_winner(), game.get_move_string())
+
+
+class GameRecord:
+    """The result of a game of a match between two players, A and B.
+
+    Instance Attributes:
+        - index: The index of the game in the match.
+        - a_first: Whether player A played first.
+        - score: The score of player A for the game: WIN_SCORE, DRAW_SCORE or LOSS_SCORE.
+        - moves: The move string of the game.
+
+    Representation Invariants:
+        - self.index >= 0
+        - self.score in {WIN_SCORE, DRAW_SCORE, LOSS_SCORE}
+    """
+    index: int
+    a_first: bool
+    score: float
+    moves: str
+
+    def __init__(self, index: int, a_first: bool, score: float, moves: str) -> None:
+        """Initialize the record of a game."""
+        self.index = index
+        self.a_first = a_first
+        self.score = score
+        self.moves = moves
+
+    def __str__(self) -> str:
+        """Return a line describing the result of this game for player A.
+
+        >>> print(GameRecord(4, False, DRAW_SCORE, '3333'))
+        game 5: A draws as second player (3333)
+        """
+        result = {WIN_SCORE: 'wins', DRAW_SCORE: 'draws', LOSS_SCORE: 'loses'}[self.score]
+        color = 'first' if self.a_first else 'second'
+        return f'game {self.index + 1}: A {result} as {color} player ({self.moves})'
+
+
+def play_match_game(spec_a: str, spec_b: str, index: int, seed: int, random_opening_moves: int) -> GameRecord:
+    """Play the game with index index of a match between players A and B given by spec_a and spec_b, and return
+    its record.
+
+    Player A plays first in the games with an even index, and each game is played from its own seed, derived
+    from seed and index.
+
+    Preconditions:
+        - spec_a and spec_b are valid player specs
+        - index >= 0
+        - random_opening_moves >= 0
+    """
+    a_first = index % 2 == 0
+    first_spec, second_spec = (spec_a, spec_b) if a_first else (spec_b, spec_a)
+    winner, moves = play_game(first_spec, second_spec, seed * 1_000_003 + index, random_opening_moves)
+
+    if winner == UNOCCUPIED:
+        score = DRAW_SCORE
+    elif (winner == PLAYER_ONE) == a_first:
+        score = WIN_SCORE
+    else:
+        score = LOSS_SCORE
+    return GameRecord(index, a_first, score, moves)
+
+
+def play_games(spec_a: str, spec_b: str, num_games: int, num_workers: Optional[int] = None, seed: int = 0,
+               random_opening_moves: int = 0) -> Iterator[GameRecord]:
+    """Play num_games games between players A and B given by spec_a and spec_b on num_workers worker processes,
+    or one per core if num_workers is None, and yield the record of each game as soon as it is finished.
+
+    Player A plays first in every other game. With one worker, the games are played in this process, in order.
+    Games that have not started are cancelled if the generator is closed before it is exhausted.
+
+    Raise a ValueError if spec_a or spec_b is not a valid player spec.
+
+    Preconditions:
+        - num_games >= 0
+        - num_workers is None or num_workers >= 1
+        - random_opening_moves >= 0
+
+    >>> [record.score for record in play_games('scoring', 'random', 4, num_workers=2, seed=111)]
+    [1.0, 1.0, 1.0, 1.0]
+    """
+    parse_player_spec(spec_a)
+    parse_player_spec(spec_b)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    if num_workers == 1:
+        for index in range(num_games):
+            yield play_match_game(spec_a, spec_b, index, seed, random_opening_moves)
+    else:
+        executor = ProcessPoolExecutor(num_workers)
+        try:
+            futures = [executor.submit(play_match_game, spec_a, spec_b, game_index, seed, random_opening_moves)
+                       for game_index in range(num_games)]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+
+class MatchResult:
+    """The results of a match between two players, A and B, from the point of view of player A.
+
+    Instance Attributes:
+        - spec_a: The player spec of player A.
+        - spec_b: The player spec of player B.
+        - wins: The number of games won by player A.
+        - draws: The number of drawn games.
+        - losses: The number of games lost by player A.
+        - seconds: The number of seconds the match took.
+
+    Representation Invariants:
+        - self.wins >= 0 and self.draws >= 0 and self.losses >= 0
+        - self.seconds >= 0
+    """
+    spec_a: str
+    spec_b: str
+    wins: int
+    draws: int
+    losses: int
+    seconds: float
+
+    def __init__(self, spec_a: str, spec_b: str, wins: int = 0, draws: int = 0, losses: int = 0,
+                 seconds: float = 0.0) -> None:
+        """Initialize the results of a match."""
+        self.spec_a = spec_a
+        self.spec_b = spec_b
+        self.wins = wins
+        self.draws = draws
+        self.losses = losses
+        self.seconds = seconds
+
+    def add_game(self, record: GameRecord) -> None:
+        """Add the result of the game of record to these results."""
+        if record.score == WIN_SCORE:
+            self.wins += 1
+        elif record.score == DRAW_SCORE:
+            self.draws += 1
+        else:
+            self.losses += 1
+
+    def get_num_games(self) -> int:
+        """Return the number of games of the match."""
+        return self.wins + self.draws + self.losses
+
+    def get_score(self) -> float:
+        """Return the average score of player A, counting a draw as half a win.
+
+        Preconditions:
+            - self.get_num_games() > 0
+
+        >>> MatchResult('scoring', 'random', 6, 2, 2).get_score()
+        0.7
+        """
+        return (self.wins + self.draws / 2) / self.get_num_games()
+
+    def get_score_interval(self, z: float = DEFAULT_Z) -> tuple[float, float]:
+        """Return the confidence interval of the expected score of player A with z-score z, by the normal
+        approximation with the variance of the scores of the games.
+
+        Preconditions:
+            - self.get_num_games() > 0
+
+        >>> low, high = MatchResult('scoring', 'random', 6, 2, 2).get_score_interval()
+        >>> round(low, 3), round(high, 3)
+        (0.452, 0.948)
+        """
+        n = self.get_num_games()
+        score = self.get_score()
+        variance = (self.wins * (WIN_SCORE - score) ** 2 + self.draws * (DRAW_SCORE - score) ** 2
+                    + self.losses * (LOSS_SCORE - score) ** 2) / n
+        margin = z * math.sqrt(variance / n)
+        return (max(score - margin, 0.0), min(score + margin, 1.0))
+
+    def get_games_per_second(self) -> float:
+        """Return the number of games played per second, or 0.0 if the match took no time."""
+        return self.get_num_games() / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        """Return a report of these results with 95% confidence intervals.
+
+        >>> print(MatchResult('scoring', 'random', 6, 2, 2, 4.0))
+        A = scoring, B = random: 10 games in 4.0 s (2.50 games/s)
+        A wins:    6 (60.0%, 95% CI 31.3% to 83.2%)
+        Draws:     2 (20.0%, 95% CI 5.7% to 51.0%)
+        A losses:  2 (20.0%, 95% CI 5.7% to 51.0%)
+        A score:   0.700 (95% CI 0.452 to 0.948)
+        """
+        n = self.get_num_games()
+        lines = [f'A = {self.spec_a}, B = {self.spec_b}: {n} games in {self.seconds:.1f} s '
+                 f'({self.get_games_per_second():.2f} games/s)']
+        if n == 0:
+            return lines[0]
+
+        for label, count in (('A wins:', self.wins), ('Draws:', self.draws), ('A losses:', self.losses)):
+            low, high = get_wilson_interval(count, n)
+            lines.append(f'{label:<10} {count} ({count / n:.1%}, 95% CI {low:.1%} to {high:.1%})')
+        low, high = self.get_score_interval()
+        lines.append(f'{"A score:":<10} {self.get_score():.3f} (95% CI {low:.3f} to {high:.3f})')
+        return '\n'.join(lines)
+
+
+def get_wilson_interval(successes: int, trials: int, z: float = DEFAULT_Z) -> tuple[float, float]:
+    """Return the Wilson score interval of the probability of a success with z-score z, given successes
+    successes out of trials trials.
+
+    Preconditions:
+        - 0 <= successes <= trials
+        - trials > 0
+
+    >>> low, high = get_wilson_interval(6, 10)
+    >>> round(low, 3), round(high, 3)
+    (0.313, 0.832)
+    >>> get_wilson_interval(0, 10)[0]
+    0.0
+    """
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(center - margin, 0.0), min(center + margin, 1.0))
+
+
+def run_match(spec_a: str, spec_b: str, num_games: int, num_workers: Optional[int] = None, seed: int = 0,
+              random_opening_moves: int = 0,
+              on_game_finished: Optional[Callable[[GameRecord], None]] = None) -> MatchResult:
+    """Play num_games games between players A and B given by spec_a and spec_b like play_games, and return
+    their results. If on_game_finished is not None, it is called with the record of each game as soon as
+    that game is finished.
+
+    Raise a ValueError if spec_a or spec_b is not a valid player spec.
+
+    Preconditions:
+        - num_games >= 0
+        - num_workers is None or num_workers >= 1
+        - random_opening_moves >= 0
+
+    >>> result = run_match('alphabeta:depth=2', 'random', 6, num_workers=1, seed=111, random_opening_moves=2)
+    >>> (result.wins, result.draws, result.losses)
+    (6, 0, 0)
+    """
+    result = MatchResult(spec_a, spec_b)
+    start = time.perf_counter()
+    for record in play_games(spec_a, spec_b, num_games, num_workers, seed, random_opening_moves):
+        result.add_game(record)
+        if on_game_finished is not None:
+            on_game_finished(record)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def main(args: Optional[list[str]] = None) -> MatchResult:
+    """Run a match given by the command line arguments args (or sys.argv if args is None), print the result
+    of each game as it is finished unless --quiet is given, print the report of the match, and return its
+    results.
+    """
+    parser = argparse.ArgumentParser(description='Play a match between two AI players on several processes.',
+                                     epilog=f'A player spec is a player type ({", ".join(PLAYER_OPTIONS)}), '
+                                            'optionally followed by options, e.g. alphabeta:depth=6,time=200.')
+    parser.add_argument('spec_a', help='the player spec of player A')
+    parser.add_argument('spec_b', help='the player spec of player B')
+    parser.add_argument('-n', '--games', type=int, default=100, help='the number of games (default: 100)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='the number of worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the match (default: 0)')
+    parser.add_argument('--random-opening-moves', type=int, default=0,
+                        help='the number of random moves each game starts from (default: 0)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only print the report of the match')
+    options = parser.parse_args(args)
+
+    for spec in (options.spec_a, options.spec_b):
+        try:
+            parse_player_spec(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    if options.games < 0 or (options.workers is not None and options.workers < 1) \
+            or options.random_opening_moves < 0:
+        parser.error('the number of games and of random opening moves must not be negative, and there must be '
+                     'at least one worker')
+
+    result = run_match(options.spec_a, options.spec_b, options.games, options.workers, options.seed,
+                       options.random_opening_moves, None if options.quiet else print)
+    print(result)
+    return result
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    # We disabled python_ta's 'too-many-arguments' error, because the functions playing a match take one
+    # argument for each option of the command line. python_ta also reports the generator play_games as missing
+    # a return statement, so we disabled 'missing-return-statement' as well.
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['typing', 'concurrent.futures', 'argparse', 'math', 'os', 'random', 'time',
+                          'connect_four', 'player', 'search_player', 'mcts', 'opening_book', 'constant'],
+        'allowed-io': ['main'],
+        'disable': ['too-many-arguments', 'missing-return-statement'],
+    })
+
+    main()
@@ -0,0 +1,298 @@
+"""CSC111 Winter 2023 Project: Connect 4 (Transposition Table)
+
+Module Description
+==================
+
+This module contains a TranspositionTable class that remembers the results of searching game states,
+so that a search engine does not search the same game state twice when it is reached through different
+orders of moves (for example, playing 3 then 4 then 2 gives the same game state as playing 2 then 4 then 3).
+
+Each entry stores the depth the game state was searched to, the score found, whether the score is exact
+or only a lower/upper bound (because of alpha-beta pruning), and the best column found.
+The table has a fixed number of entries computed from a memory budget, so an entry may have to replace
+another one. How this is decided is given by the replacement policy:
+
+    - DEPTH_PREFERRED: keep the entry searched deeper, unless it was stored by an older search.
+    - ALWAYS_REPLACE: always keep the newest entry.
+    - TWO_TIER: each position in the table holds two entries, a depth-preferred one and an
+      always-replace one.
+
+Every entry takes two 64-bit words. The first word is the key XOR the second word, and the second word
+packs the rest of the entry. When probing, an entry only matches if XOR-ing its two words gives back the
+key, so a half-written entry is never mistaken for a valid one.
+
+This also lets several processes share one table without any locks: a table can store its entries in a
+given buffer, such as the memory of a multiprocessing.shared_memory.SharedMemory, and tables in different
+processes built on the same memory see each other's entries. If two processes write the same slot at
+the same time, or one reads a slot while another writes it, the words of the slot may come from
+different entries, but then they do not match any key and the slot is simply treated as empty.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the
+Teaching Stream of CSC111 at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2023 Yige (Amanda) Wu, Sunyi (Alysa) Liu, Lecheng (Joyce) Qu, and Xi (Olivia) Yan.
+"""
+from __future__ import annotations
+from typing import Any, Optional
+from array import array
+
+# Replacement policies
+DEPTH_PREFERRED, ALWAYS_REPLACE, TWO_TIER = 'depth-preferred', 'always-replace', 'two-tier'
+
+# Number of bytes used by one entry
+ENTRY_SIZE = 16
+
+# Layout of the packed data word: 32 bits of score, 8 bits of depth, 2 bits of bound type,
+# 4 bits of best column (plus one, so that 0 means no column), and 8 bits of search generation.
+_SCORE_OFFSET = 1 << 31
+_DEPTH_SHIFT, _BOUND_SHIFT, _MOVE_SHIFT, _GENERATION_SHIFT = 32, 40, 42, 46
+_WORD_MASK = (1 << 64) - 1
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def get_table_bytes(memory_bytes: int, policy: str = DEPTH_PREFERRED) -> int:
+    """Return the number of bytes used by the entries of TranspositionTable(memory_bytes, policy).
+
+    This is the size of the buffer to give to a table that stores its entries in a buffer.
+
+    >>> get_table_bytes(1000)
+    512
+    >>> get_table_bytes(1 << 10, TWO_TIER)
+    1024
+
+    Preconditions:
+        - memory_bytes >= 2 * ENTRY_SIZE
+        - policy in {DEPTH_PREFERRED, ALWAYS_REPLACE, TWO_TIER}
+    """
+    return _count_buckets(memory_bytes, policy) * _get_bucket_size(policy) * ENTRY_SIZE
+
+
+def _get_bucket_size(policy: str) -> int:
+    """Return the number of slots in each bucket of a table with the replacement policy policy."""
+    return 2 if policy == TWO_TIER else 1
+
+
+def _count_buckets(memory_bytes: int, policy: str) -> int:
+    """Return the number of buckets of a table using at most memory_bytes bytes with the replacement
+    policy policy: the largest power of two that fits.
+    """
+    num_buckets = 1
+    while num_buckets * 2 * _get_bucket_size(policy) * ENTRY_SIZE <= memory_bytes:
+        num_buckets *= 2
+    return num_buckets
+
+
+class TranspositionTable:
+    """A fixed-size hash table of searched game states.
+
+    Keys are non-zero integers below 2 ** 64 that uniquely identify a game state (and anything else the
+    stored score depends on), such as the key of a Bitboard.
+
+    Instance Attributes:
+        - policy: The replacement policy, one of DEPTH_PREFERRED, ALWAYS_REPLACE and TWO_TIER.
+        - hits: The number of probes that found an entry for the key.
+        - misses: The number of probes that found no entry for the key.
+        - collisions: The number of probes that found the slot taken by an entry for a different key.
+
+    Private Instance Attributes:
+        - _keys: The key XOR the data word of each slot, or 0 for an empty slot.
+        - _data: The packed data word of each slot.
+        - _index_shift: The number of bits to drop from a 64-bit hash to get a bucket index.
+        - _bucket_size: The number of slots in each bucket (2 for TWO_TIER, 1 otherwise).
+        - _generation: The generation of the current search, between 0 and 255.
+        - _buffer_views: The views of the buffer the entries are stored in, or an empty list if the entries
+        are stored in arrays of the table's own.
+
+    Representation Invariants:
+        - self.policy in {DEPTH_PREFERRED, ALWAYS_REPLACE, TWO_TIER}
+        - len(self._keys) == len(self._data)
+        - len(self._keys) == self._bucket_size * 2 ** (64 - self._index_shift)
+
+    >>> from constant import EXACT
+    >>> table = TranspositionTable(1 << 10)
+    >>> table.get_capacity()
+    64
+    >>> table.store(12345, 3, EXACT, 42, 3)
+    >>> table.probe(12345)
+    (3, 0, 42, 3)
+    >>> table.probe(54321) is None
+    True
+    >>> table.hits, table.misses
+    (1, 1)
+    """
+    policy: str
+    hits: int
+    misses: int
+    collisions: int
+    _keys: array | memoryview
+    _data: array | memoryview
+    _index_shift: int
+    _bucket_size: int
+    _generation: int
+    _buffer_views: list[memoryview]
+
+    def __init__(self, memory_bytes: int = 1 << 24, policy: str = DEPTH_PREFERRED, buffer: Any = None) -> None:
+        """Initialize a table using at most memory_bytes bytes for its entries.
+
+        The number of entries is the largest power of two that fits in memory_bytes.
+
+        If buffer is None, the table starts empty. Otherwise, the entries are stored in the first
+        get_table_bytes(memory_bytes, policy) bytes of buffer, which must be a writable buffer (such as the
+        buf of a SharedMemory) filled with zeros or shared with other tables of the same memory_bytes and
+        policy. release must be called before buffer is freed.
+
+        Preconditions:
+            - memory_bytes >= 2 * ENTRY_SIZE
+            - policy in {DEPTH_PREFERRED, ALWAYS_REPLACE, TWO_TIER}
+            - buffer is None or len(memoryview(buffer).cast('B')) >= get_table_bytes(memory_bytes, policy)
+        """
+        self.policy = policy
+        self._bucket_size = _get_bucket_size(policy)
+
+        num_buckets = _count_buckets(memory_bytes, policy)
+        self._index_shift = 64 - (num_buckets.bit_length() - 1)
+
+        num_slots = num_buckets * self._bucket_size
+        if buffer is None:
+            self._keys = array('Q', [0]) * num_slots
+            self._data = array('Q', [0]) * num_slots
+            self._buffer_views = []
+        else:
+            byte_view = memoryview(buffer).cast('B')
+            words = byte_view[:num_slots * ENTRY_SIZE].cast('Q')
+            self._keys = words[:num_slots]
+            self._data = words[num_slots:]
+            self._buffer_views = [self._keys, self._data, words, byte_view]
+        self._generation = 0
+        self.hits, self.misses, self.collisions = 0, 0, 0
+
+    def release(self) -> None:
+        """Stop using the buffer the entries are stored in, so that it can be freed.
+
+        The table must not be used afterwards. Nothing happens if the table does not use a given buffer.
+
+        >>> from constant import LOWER_BOUND
+        >>> buffer = bytearray(get_table_bytes(1 << 10))
+        >>> first = TranspositionTable(1 << 10, buffer=buffer)
+        >>> second = TranspositionTable(1 << 10, buffer=buffer)
+        >>> first.store(777, 2, LOWER_BOUND, -5, 0)
+        >>> second.probe(777)
+        (2, 1, -5, 0)
+        >>> first.release()
+        >>> second.release()
+        """
+        for view in self._buffer_views:
+            view.release()
+        self._buffer_views = []
+
+    def get_capacity(self) -> int:
+        """Return the number of entries the table can hold."""
+        return len(self._keys)
+
+    def new_search(self) -> None:
+        """Start a new search, so that the entries stored so far can be replaced more easily.
+
+        The entries are kept, since they are still valid for later searches.
+        """
+        self._generation = (self._generation + 1) % 256
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters.
+
+        If the entries are stored in a shared buffer, they are removed for all the tables sharing it.
+        """
+        for i in range(len(self._keys)):
+            self._keys[i] = 0
+            self._data[i] = 0
+        self.hits, self.misses, self.collisions = 0, 0, 0
+
+    def _bucket_start(self, key: int) -> int:
+        """Return the index of the first slot of the bucket of key."""
+        return (((key * _HASH_MULTIPLIER) & _WORD_MASK) >> self._index_shift) * self._bucket_size
+
+    def probe(self, key: int) -> Optional[tuple[int, int, int, int]]:
+        """Return the entry stored for key as a tuple (depth, bound, score, column), or None if there is none.
+
+        column is -1 if no best column was stored.
+
+        Preconditions:
+            - 0 < key < 2 ** 64
+        """
+        start = self._bucket_start(key)
+        for i in range(start, start + self._bucket_size):
+            data = self._data[i]
+            if self._keys[i] ^ data == key:
+                self.hits += 1
+                return ((data >> _DEPTH_SHIFT) & 0xFF,
+                        (data >> _BOUND_SHIFT) & 0x3,
+                        (data & 0xFFFFFFFF) - _SCORE_OFFSET,
+                        ((data >> _MOVE_SHIFT) & 0xF) - 1)
+
+        self.misses += 1
+        if self._keys[start] != 0:
+            self.collisions += 1
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: int, column: int) -> None:
+        """Store the result of searching the game state of key to depth.
+
+        Depending on the replacement policy, the entry may not be stored if its slot holds a more
+        valuable entry for a different key.
+
+        Preconditions:
+            - 0 < key < 2 ** 64
+            - 0 <= depth < 256
+            - bound in {EXACT, LOWER_BOUND, UPPER_BOUND}
+            - -2 ** 31 <= score < 2 ** 31
+            - -1 <= column < 15
+        """
+        data = (score + _SCORE_OFFSET) | (depth << _DEPTH_SHIFT) | (bound << _BOUND_SHIFT) \
+            | ((column + 1) << _MOVE_SHIFT) | (self._generation << _GENERATION_SHIFT)
+        start = self._bucket_start(key)
+
+        if self.policy == ALWAYS_REPLACE:
+            slot = start
+        elif self.policy == DEPTH_PREFERRED:
+            if not self._should_replace(start, key, depth):
+                return
+            slot = start
+        elif self._should_replace(start, key, depth):
+            # Two-tier: the first slot is depth-preferred and the second slot is always-replace.
+            slot = start
+        else:
+            slot = start + 1
+
+        self._keys[slot] = key ^ data
+        self._data[slot] = data
+
+    def _should_replace(self, slot: int, key: int, depth: int) -> bool:
+        """Return whether a new entry for key searched to depth should replace the entry in slot under
+        the depth-preferred policy.
+        """
+        old_data = self._data[slot]
+        if self._keys[slot] == 0 or self._keys[slot] ^ old_data == key:
+            # The slot is empty or holds the same game state.
+            return True
+        if (old_data >> _GENERATION_SHIFT) & 0xFF != self._generation:
+            # The old entry was stored by an earlier search.
+            return True
+        return depth >= (old_data >> _DEPTH_SHIFT) & 0xFF
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'max-nested-blocks': 4,
+        'extra-imports': ['__future__', 'typing', 'array', 'constant'],
+        # The hit, miss and collision counters are part of the table's statistics, next to its storage
+        'disable': ['too-many-instance-attributes']
+    })